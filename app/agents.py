@@ -1,72 +1,144 @@
 ## Importing libraries and files
 import os
+import time
+import threading
+from datetime import datetime
 from dotenv import load_dotenv
 load_dotenv()
 
 from crewai import Agent
-from langchain_google_genai import ChatGoogleGenerativeAI
+from app.llm_backends import build_llm, model_name
+from app.llm_scheduler import ScheduledChatModel, ScheduledLLM
+from app.metrics import llm_metrics_handler
 
 # Set dummy OpenAI key to prevent CrewAI from looking for it
 os.environ["OPENAI_API_KEY"] = "sk-dummy-value-for-crewai"
 
-print("=" * 50)
-print("🚀 Initializing Financial Document Analyzer")
-print("=" * 50)
+# Model identifier (also part of the analysis cache key); the backend is picked by LLM_BACKEND
+MODEL_NAME = model_name()
 
-# Load API key
-print("\n🔍 Looking for API key...")
-google_api_key = os.getenv("GOOGLE_API_KEY")
+# How long /health reuses the last connectivity check
+CONNECTIVITY_CHECK_TTL = int(os.getenv("CONNECTIVITY_CHECK_TTL", "300"))
 
-if not google_api_key:
-    print("❌ ERROR: GOOGLE_API_KEY not found in environment variables")
-    print("Please create a .env file with: GOOGLE_API_KEY=your_key_here")
-    exit(1)
+# Nothing below talks to the model at import time: the LLM and agents are
+# created on first use (or by warm_up() in the background).
+_llm = None
+_verifier = None
+_financial_analyst = None
+_lock = threading.RLock()
+_connectivity = None
+_connectivity_lock = threading.Lock()
 
-print(f"✅ API key found (starts with: {google_api_key[:10]}...)")
+def get_llm():
+    """Shared chat model for the configured LLM_BACKEND, created on first use
 
-# Initialize Gemini model
-try:
-    print("\n🔄 Initializing Gemini 2.5 Flash model...")
-    llm = ChatGoogleGenerativeAI(
-        model="models/gemma-3-27b-it",
-        google_api_key=google_api_key,
-        temperature=0.7
-    )
-    
-    # Test the model
-    test_response = llm.invoke("Say 'connected' in one word")
-    print(f"✅ Model connected: {test_response.content}")
-    
-except Exception as e:
-    print(f"❌ Error: {e}")
-    exit(1)
+    The backend model is wrapped so every call is admitted by the LLM
+    scheduler (rate budgets, priority, retries); get_llm().llm is the
+    backend model itself.
+    """
+    global _llm
+    with _lock:
+        if _llm is None:
+            # Times and counts tokens for every call, whichever crew or endpoint makes it
+            _llm = ScheduledChatModel(llm=build_llm(), callbacks=[llm_metrics_handler])
+        return _llm
 
-print("\n🤖 Creating agents...")
+def build_agent_llm():
+    """A crewai LLM for one agent; its calls go through get_llm() and so through the scheduler"""
+    return ScheduledLLM(model=MODEL_NAME, chat_model=get_llm())
 
 # Document Verifier Agent
-verifier = Agent(
-    role="Senior Financial Document Verifier",
-    goal="Accurately verify and extract financial data from documents",
-    backstory=(
-        "You are a certified financial document specialist with 15 years of experience "
-        "at top accounting firms. You have verified thousands of financial reports."
-    ),
-    llm=llm,
-    verbose=True,
-    allow_delegation=False
-)
+def build_verifier():
+    return Agent(
+        role="Senior Financial Document Verifier",
+        goal="Accurately verify and extract financial data from documents",
+        backstory=(
+            "You are a certified financial document specialist with 15 years of experience "
+            "at top accounting firms. You have verified thousands of financial reports."
+        ),
+        llm=build_agent_llm(),
+        verbose=True,
+        allow_delegation=False
+    )
 
 # Financial Analyst Agent
-financial_analyst = Agent(
-    role="Chartered Financial Analyst",
-    goal="Provide comprehensive financial analysis based on verified document data",
-    backstory=(
-        "You are a Chartered Financial Analyst (CFA) with 20 years of experience "
-        "at leading investment banks."
-    ),
-    llm=llm,
-    verbose=True,
-    allow_delegation=False
-)
-
-print("✅ Agents created successfully")
\ No newline at end of file
+def build_financial_analyst():
+    """Create a new analyst agent (agents keep per-run state, so concurrent crews need their own)"""
+    return Agent(
+        role="Chartered Financial Analyst",
+        goal="Provide comprehensive financial analysis based on verified document data",
+        backstory=(
+            "You are a Chartered Financial Analyst (CFA) with 20 years of experience "
+            "at leading investment banks."
+        ),
+        llm=build_agent_llm(),
+        verbose=True,
+        allow_delegation=False
+    )
+
+def get_verifier():
+    global _verifier
+    with _lock:
+        if _verifier is None:
+            _verifier = build_verifier()
+        return _verifier
+
+def get_financial_analyst():
+    global _financial_analyst
+    with _lock:
+        if _financial_analyst is None:
+            _financial_analyst = build_financial_analyst()
+            print("✅ Agents created successfully")
+        return _financial_analyst
+
+def check_connectivity(max_age: float = CONNECTIVITY_CHECK_TTL, force: bool = False):
+    """Ping the model, reusing the previous answer for max_age seconds"""
+    global _connectivity
+    with _connectivity_lock:
+        if not force and _connectivity is not None and time.monotonic() - _connectivity["_checked"] < max_age:
+            return {k: v for k, v in _connectivity.items() if not k.startswith("_")}
+
+        started = time.perf_counter()
+        try:
+            response = get_llm().invoke("Say 'connected' in one word")
+            status = {"connected": True, "response": str(response.content).strip()[:50]}
+        except Exception as e:
+            status = {"connected": False, "error": str(e)[:300]}
+        status.update({
+            "model": MODEL_NAME,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "checked_at": datetime.now().isoformat(),
+            "_checked": time.monotonic()
+        })
+        _connectivity = status
+        return {k: v for k, v in status.items() if not k.startswith("_")}
+
+def warm_up(background: bool = True):
+    """Build the LLM client and agents and check connectivity, optionally on a daemon thread"""
+    def _warm():
+        try:
+            get_financial_analyst()
+            status = check_connectivity(force=True)
+            if status["connected"]:
+                print(f"✅ Model connected: {status['response']} ({status['latency_ms']} ms)")
+            else:
+                print(f"❌ Model warm-up failed: {status['error']}")
+        except Exception as e:
+            print(f"❌ Model warm-up failed: {e}")
+
+    if not background:
+        _warm()
+        return None
+    thread = threading.Thread(target=_warm, name="llm-warmup", daemon=True)
+    thread.start()
+    return thread
+
+def __getattr__(name):
+    # Backwards compatible lazy module attributes: app.agents.llm / verifier / financial_analyst
+    if name == "llm":
+        return get_llm()
+    if name == "verifier":
+        return get_verifier()
+    if name == "financial_analyst":
+        return get_financial_analyst()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -0,0 +1,200 @@
+import os
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+import zipfile
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Tuple
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from app.tools import get_document_extraction
+from app.uploads import UPLOAD_CHUNK_SIZE, MAX_UPLOAD_BYTES, too_large_error
+from app.executors import get_parse_pool, LLM_POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Batch limits; by default a batch may use at most half of the LLM pool
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", str(max(1, LLM_POOL_SIZE // 2))))
+BATCH_MAX_DOCUMENTS = int(os.getenv("BATCH_MAX_DOCUMENTS", "1000"))
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "20"))
+MAX_BATCH_UPLOAD_BYTES = int(os.getenv("MAX_BATCH_UPLOAD_MB", "4096")) * 1024 * 1024
+# Total bytes a batch may inflate to on disk, across every member of its archives
+MAX_BATCH_INFLATE_BYTES = int(os.getenv("MAX_BATCH_INFLATE_MB", "4096")) * 1024 * 1024
+
+# analyze(extraction, query) -> (result, cached)
+Analyzer = Callable[[Dict[str, Any], str], Awaitable[Tuple[Dict[str, Any], bool]]]
+
+def expand_zip(zip_path: str, dest_dir: str, max_documents: int = BATCH_MAX_DOCUMENTS,
+               max_bytes: int = MAX_BATCH_INFLATE_BYTES) -> List[Dict[str, Any]]:
+    """Stream every PDF in a zip archive to its own file in dest_dir, hashing it on the way
+
+    Members are copied in UPLOAD_CHUNK_SIZE pieces; each is held to
+    MAX_UPLOAD_BYTES and all of them together to max_bytes (checked against
+    the bytes actually inflated, not the sizes the archive claims).
+    Returns [{document_id, filename, path, bytes}].
+    """
+    documents = []
+    total = 0
+    try:
+        with zipfile.ZipFile(zip_path) as archive:
+            for info in archive.infolist():
+                name = os.path.basename(info.filename)
+                if info.is_dir() or not name.lower().endswith(".pdf") or name.startswith("._"):
+                    continue
+                if len(documents) >= max_documents:
+                    raise HTTPException(status_code=413, detail=f"Batch exceeds {max_documents} documents")
+                if info.file_size > MAX_UPLOAD_BYTES:
+                    raise too_large_error(info.file_size)
+                if total + info.file_size > max_bytes:
+                    raise too_large_error(total + info.file_size, max_bytes)
+
+                path = os.path.join(dest_dir, f"{uuid.uuid4()}.pdf")
+                documents.append({"document_id": None, "filename": name, "path": path, "bytes": 0})
+                hasher = hashlib.sha256()
+                size = 0
+                with archive.open(info) as src, open(path, "wb") as out:
+                    while True:
+                        chunk = src.read(UPLOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        size += len(chunk)
+                        total += len(chunk)
+                        if size > MAX_UPLOAD_BYTES:
+                            raise too_large_error(size)
+                        if total > max_bytes:
+                            raise too_large_error(total, max_bytes)
+                        hasher.update(chunk)
+                        out.write(chunk)
+                documents[-1].update({"document_id": hasher.hexdigest(), "bytes": size})
+    except zipfile.BadZipFile as e:
+        remove_files(documents)
+        raise HTTPException(status_code=400, detail=f"Invalid zip archive: {e}")
+    except BaseException:
+        remove_files(documents)
+        raise
+
+    logger.info(f"🗜️ Expanded {len(documents)} PDFs from {os.path.basename(zip_path)}")
+    return documents
+
+def remove_files(documents: List[Dict[str, Any]]):
+    for document in documents:
+        path = document.get("path")
+        if path and os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"⚠️ Cleanup failed: {e}")
+        document["path"] = None
+
+def dedupe_documents(documents: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Split documents into (unique by content, duplicates); duplicate files are removed"""
+    unique, duplicates, seen = [], [], set()
+    for document in documents:
+        if document["document_id"] in seen:
+            duplicates.append(document)
+        else:
+            seen.add(document["document_id"])
+            unique.append(document)
+    remove_files(duplicates)
+    return unique, duplicates
+
+async def run_batch(documents: List[Dict[str, Any]], queries: List[str], analyze: Analyzer,
+                    concurrency: int = BATCH_CONCURRENCY) -> AsyncIterator[Dict[str, Any]]:
+    """Extract each document once and analyze it against every query
+
+    Yields one "item" dict per (document, query) pair in completion order,
+    then a "summary". At most `concurrency` analyses run at a time, and at
+    most 2 * concurrency documents are extracted and held in memory ahead of
+    them. A failed extraction or analysis becomes an error item; it never
+    stops the rest of the batch.
+    """
+    started = time.perf_counter()
+    analysis_slots = asyncio.Semaphore(concurrency)
+    document_slots = asyncio.Semaphore(concurrency * 2)
+    finished: asyncio.Queue = asyncio.Queue()
+
+    def item_for(document, query_index):
+        return {
+            "type": "item",
+            "document_id": document["document_id"],
+            "filename": document["filename"],
+            "query_index": query_index,
+            "query": queries[query_index]
+        }
+
+    async def analyze_one(document, extraction, query_index):
+        item = item_for(document, query_index)
+        item_started = time.perf_counter()
+        try:
+            async with analysis_slots:
+                result, cached = await analyze(extraction, queries[query_index])
+            item.update({
+                "status": "success",
+                "cached": cached,
+                "page_count": result["page_count"],
+                "mode": result["mode"],
+                "analysis": result["analysis"],
+                "timings": result.get("timings")
+            })
+        except Exception as e:
+            logger.error(f"❌ Batch item failed ({document['filename']}, query {query_index}): {e}")
+            item.update({"status": "error", "stage": "analyze", "error": str(e)})
+        item["elapsed_ms"] = round((time.perf_counter() - item_started) * 1000, 2)
+        await finished.put(item)
+
+    async def process_document(document):
+        async with document_slots:
+            try:
+                extraction = await run_in_threadpool(
+                    get_document_extraction, document["document_id"], document.get("path"),
+                    document["filename"], executor=get_parse_pool()
+                )
+                if extraction is None:
+                    raise ValueError(f"Unknown document_id: {document['document_id']}")
+            except Exception as e:
+                logger.error(f"❌ Batch extraction failed for {document['filename']}: {e}")
+                for query_index in range(len(queries)):
+                    await finished.put({**item_for(document, query_index), "status": "error",
+                                        "stage": "extract", "error": f"Error reading PDF: {e}"})
+                return
+            finally:
+                remove_files([document])
+
+            await asyncio.gather(*(
+                analyze_one(document, extraction, query_index) for query_index in range(len(queries))
+            ))
+
+    workers = [asyncio.ensure_future(process_document(document)) for document in documents]
+    counts = {"succeeded": 0, "failed": 0, "cached": 0}
+    try:
+        for _ in range(len(documents) * len(queries)):
+            item = await finished.get()
+            if item["status"] == "success":
+                counts["succeeded"] += 1
+                counts["cached"] += int(item["cached"])
+            else:
+                counts["failed"] += 1
+            yield item
+    finally:
+        # Client went away or the batch finished: stop scheduling new work
+        for worker in workers:
+            worker.cancel()
+        remove_files(documents)
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"📦 Batch done: {len(documents)} documents × {len(queries)} queries, "
+        f"{counts['succeeded']} ok, {counts['failed']} failed in {elapsed:.1f}s"
+    )
+    yield {
+        "type": "summary",
+        "documents": len(documents),
+        "queries": len(queries),
+        "items": len(documents) * len(queries),
+        **counts,
+        "concurrency": concurrency,
+        "elapsed_ms": round(elapsed * 1000, 2)
+    }
@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Cache configuration
+CACHE_DIR = os.getenv("CACHE_DIR", "cache")
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256"))
+RESULT_CACHE_MAX_DISK_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_DISK_ENTRIES", "10000"))
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", str(7 * 24 * 3600)))
+EXTRACTION_CACHE_MAX_ENTRIES = int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", "32"))
+EXTRACTION_CACHE_MAX_DISK_ENTRIES = int(os.getenv("EXTRACTION_CACHE_MAX_DISK_ENTRIES", "5000"))
+EXTRACTION_CACHE_TTL = int(os.getenv("EXTRACTION_CACHE_TTL", str(30 * 24 * 3600)))
+SEGMENT_CACHE_MAX_ENTRIES = int(os.getenv("SEGMENT_CACHE_MAX_ENTRIES", "1024"))
+SEGMENT_CACHE_MAX_DISK_ENTRIES = int(os.getenv("SEGMENT_CACHE_MAX_DISK_ENTRIES", "50000"))
+SEGMENT_CACHE_TTL = int(os.getenv("SEGMENT_CACHE_TTL", str(90 * 24 * 3600)))
+
+def hash_bytes(data: bytes) -> str:
+    """Content hash used to identify an uploaded document"""
+    return hashlib.sha256(data).hexdigest()
+
+def normalize_query(query: str) -> str:
+    """Normalize a query so trivially different phrasings share a cache entry"""
+    return " ".join(query.lower().split()).rstrip("?.! ")
+
+def make_result_key(document_hash: str, query: str, model: str, prompt_version: str) -> str:
+    """Build the cache key for one analysis result"""
+    parts = [document_hash, normalize_query(query), model, prompt_version]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+class TieredCache:
+    """Two-tier (memory LRU + local disk) JSON cache with TTL and size limits"""
+
+    def __init__(self, directory: str, max_entries: int, max_disk_entries: int, ttl: int):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes_since_prune = 0
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl > 0 and time.time() - created_at > self.ttl
+
+    def _remember(self, key: str, created_at: float, value: Dict[str, Any]):
+        # Caller must hold the lock
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a cached value or None"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if not self._expired(created_at):
+                    self._memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+                self.counters["expired"] += 1
+
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.counters["misses"] += 1
+            return None
+
+        if self._expired(entry["created_at"]):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            with self._lock:
+                self.counters["expired"] += 1
+                self.counters["misses"] += 1
+            return None
+
+        with self._lock:
+            self._remember(key, entry["created_at"], entry["value"])
+            self.counters["disk_hits"] += 1
+        return entry["value"]
+
+    def set(self, key: str, value: Dict[str, Any]):
+        """Store a value in both tiers"""
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, value)
+            self.counters["sets"] += 1
+            self._writes_since_prune += 1
+            prune = self._writes_since_prune >= 100
+            if prune:
+                self._writes_since_prune = 0
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"created_at": created_at, "value": value}, f)
+        os.replace(tmp_path, path)
+
+        if prune:
+            self.prune_disk()
+
+    def invalidate(self, key: str):
+        """Drop a key from both tiers"""
+        with self._lock:
+            self._memory.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def prune_disk(self):
+        """Remove expired entries and enforce the disk size limit (oldest first)"""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    continue
+
+        entries.sort()
+        now = time.time()
+        excess = len(entries) - self.max_disk_entries
+        removed = 0
+        for i, (mtime, path) in enumerate(entries):
+            if i < excess or (self.ttl > 0 and now - mtime > self.ttl):
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+
+        with self._lock:
+            self.counters["evictions"] += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+            memory_entries = len(self._memory)
+        lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        return {
+            **counters,
+            "memory_entries": memory_entries,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+# Final analysis results, keyed by make_result_key()
+result_cache = TieredCache(
+    directory=os.path.join(CACHE_DIR, "results"),
+    max_entries=RESULT_CACHE_MAX_ENTRIES,
+    max_disk_entries=RESULT_CACHE_MAX_DISK_ENTRIES,
+    ttl=RESULT_CACHE_TTL,
+)
+
+# Per-page text extractions, keyed by document hash (the document_id)
+extraction_cache = TieredCache(
+    directory=os.path.join(CACHE_DIR, "extractions"),
+    max_entries=EXTRACTION_CACHE_MAX_ENTRIES,
+    max_disk_entries=EXTRACTION_CACHE_MAX_DISK_ENTRIES,
+    ttl=EXTRACTION_CACHE_TTL,
+)
+
+# Map notes for runs of identical pages, keyed by page fingerprints + query (see app/incremental.py)
+segment_cache = TieredCache(
+    directory=os.path.join(CACHE_DIR, "segments"),
+    max_entries=SEGMENT_CACHE_MAX_ENTRIES,
+    max_disk_entries=SEGMENT_CACHE_MAX_DISK_ENTRIES,
+    ttl=SEGMENT_CACHE_TTL,
+)
@@ -0,0 +1,152 @@
+import os
+import time
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from crewai import Crew, Process
+from app.agents import build_financial_analyst
+from app.metrics import record_crewai_usage
+from app.tasks import build_analysis_task, build_chunk_task, build_reduce_task, build_multi_query_task
+
+logger = logging.getLogger(__name__)
+
+# Crews per task kind; match the LLM thread pool so every LLM thread can hold one
+CREW_POOL_SIZE = int(os.getenv("CREW_POOL_SIZE", os.getenv("LLM_POOL_SIZE", "8")))
+CREW_POOL_PREWARM = int(os.getenv("CREW_POOL_PREWARM", "2"))
+CREW_VERBOSE = os.getenv("CREW_VERBOSE", "true").lower() in ("1", "true", "yes")
+
+class CrewPool:
+    """Fixed-size pool of request-isolated single-task crews
+
+    Each crew owns its own Agent and Task, so two requests never share
+    crewai state, while all crews share the one LLM client from get_llm()
+    (and with it the model endpoint's HTTP/gRPC connection pool). Crews are
+    built lazily up to `size` and reused afterwards; kickoff() re-interpolates
+    the task from its original template on every run.
+    """
+
+    def __init__(self, name: str, task_builder: Callable, size: int = CREW_POOL_SIZE, verbose: bool = CREW_VERBOSE):
+        self.name = name
+        self.task_builder = task_builder
+        self.size = size
+        self.verbose = verbose
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.in_use = 0
+        self.acquired = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.build_seconds = 0.0
+
+    def _build(self) -> Crew:
+        started = time.perf_counter()
+        agent = build_financial_analyst()
+        crew = Crew(
+            agents=[agent],
+            tasks=[self.task_builder(agent)],
+            process=Process.sequential,
+            verbose=self.verbose
+        )
+        with self._lock:
+            self.build_seconds += time.perf_counter() - started
+        return crew
+
+    def prewarm(self, count: Optional[int] = None):
+        """Build up to `count` idle crews ahead of the first requests"""
+        count = self.size if count is None else min(count, self.size)
+        while True:
+            with self._lock:
+                if self.created >= count:
+                    return
+                self.created += 1
+            try:
+                self._idle.put(self._build())
+            except Exception:
+                with self._lock:
+                    self.created -= 1
+                raise
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None):
+        """Borrow a crew for one kickoff; blocks while all `size` crews are busy"""
+        crew = None
+        try:
+            crew = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_build = self.created < self.size
+                if can_build:
+                    self.created += 1
+            if can_build:
+                try:
+                    crew = self._build()
+                except Exception:
+                    with self._lock:
+                        self.created -= 1
+                    raise
+            else:
+                started = time.perf_counter()
+                crew = self._idle.get(timeout=timeout)
+                with self._lock:
+                    self.waits += 1
+                    self.wait_seconds += time.perf_counter() - started
+
+        with self._lock:
+            self.in_use += 1
+            self.acquired += 1
+        try:
+            yield crew
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._idle.put(crew)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "created": self.created,
+                "idle": self._idle.qsize(),
+                "in_use": self.in_use,
+                "acquired": self.acquired,
+                "waits": self.waits,
+                "wait_seconds": round(self.wait_seconds, 3),
+                "build_seconds": round(self.build_seconds, 3)
+            }
+
+analysis_crews = CrewPool("analysis", build_analysis_task)
+chunk_crews = CrewPool("chunk", build_chunk_task, verbose=False)
+reduce_crews = CrewPool("reduce", build_reduce_task, verbose=False)
+multi_query_crews = CrewPool("multi_query", build_multi_query_task)
+
+def _usage_metrics(crew: Crew) -> Optional[dict]:
+    # A dict in older CrewAI releases, a UsageMetrics model in newer ones
+    usage = getattr(crew, "usage_metrics", None)
+    return usage.model_dump() if hasattr(usage, "model_dump") else usage
+
+def kickoff(pool: CrewPool, inputs, timeout: Optional[float] = None):
+    """Run one pooled kickoff; returns (result, usage metrics reported by CrewAI for this run or None)"""
+    with pool.acquire(timeout=timeout) as crew:
+        # CrewAI's usage_metrics accumulate over the life of the (reused) agents
+        before = _usage_metrics(crew) or {}
+        result = crew.kickoff(inputs)
+        after = _usage_metrics(crew)
+        if after is None:
+            return result, None
+        usage = {key: value - before.get(key, 0) for key, value in after.items()}
+        record_crewai_usage(usage)
+        return result, usage
+
+def prewarm_pools(count: int = CREW_POOL_PREWARM):
+    try:
+        analysis_crews.prewarm(count)
+        logger.info(f"✅ Pre-built {analysis_crews.created} analysis crews")
+    except Exception as e:
+        logger.warning(f"⚠️ Crew pre-build failed: {e}")
+
+def crew_pool_stats():
+    return {pool.name: pool.stats() for pool in (analysis_crews, chunk_crews, reduce_crews, multi_query_crews)}
\ No newline at end of file
@@ -1,39 +1,75 @@
 import os
+import logging
+import threading
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING, DESCENDING
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # MongoDB connection
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "financial_analyzer")
+# Connect at API startup and persist documents/analyses (see app/persistence.py)
+MONGO_ENABLED = os.getenv("MONGO_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Connection pool: enough sockets for the write-behind flushes plus /results reads,
+# with short timeouts so an unreachable server fails fast instead of stalling requests
+MONGO_POOL_OPTIONS = {
+    "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "20")),
+    "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "2")),
+    "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000")),
+    "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000")),
+    "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "2000")),
+    "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "2000")),
+    "retryWrites": True,
+}
 
 # Async client for FastAPI
 class MongoDB:
     client: AsyncIOMotorClient = None
     database = None
+    available: bool = False
 
 db = MongoDB()
 
 async def connect_to_mongo():
-    """Connect to MongoDB"""
+    """Connect to MongoDB and make sure the indexes exist; the API keeps running if it is down"""
     print("🔌 Connecting to MongoDB...")
-    db.client = AsyncIOMotorClient(MONGODB_URL)
+    db.client = AsyncIOMotorClient(MONGODB_URL, **MONGO_POOL_OPTIONS)
     db.database = db.client[DATABASE_NAME]
-    
-    # Create indexes
-    await db.database.documents.create_index("upload_date")
-    await db.database.documents.create_index("status")
-    await db.database.analysis_results.create_index("document_id")
-    await db.database.analysis_results.create_index("created_at")
-    
-    print("✅ Connected to MongoDB")
+
+    try:
+        await db.client.admin.command("ping")
+        # Create indexes
+        await db.database.documents.create_index("document_id", unique=True)
+        await db.database.documents.create_index("upload_date")
+        await db.database.documents.create_index("status")
+        await db.database.analysis_results.create_index("document_id")
+        await db.database.analysis_results.create_index("created_at")
+        # Keyset pagination (app/result_store.py) sorts on (created_at, _id), overall and per document
+        await db.database.analysis_results.create_index([("created_at", DESCENDING), ("_id", DESCENDING)])
+        await db.database.analysis_results.create_index(
+            [("document_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]
+        )
+        await db.database.users.create_index("user_id", unique=True)
+        await db.database.user_usage.create_index([("user_id", ASCENDING), ("day", ASCENDING)], unique=True)
+        db.available = True
+        print("✅ Connected to MongoDB")
+    except Exception as e:
+        # The driver reconnects by itself; buffered writes are retried until it does
+        db.available = False
+        logger.warning(f"⚠️ MongoDB unavailable at startup, continuing without it: {e}")
 
 async def close_mongo_connection():
     """Close MongoDB connection"""
     if db.client:
         db.client.close()
+        db.client = None
+        db.database = None
+        db.available = False
         print("🔌 MongoDB connection closed")
 
 # Collection getters
@@ -46,7 +82,45 @@ def get_analysis_collection():
 def get_users_collection():
     return db.database.users
 
-# Sync client for Celery
+# Sync client for Celery workers and the sync result store. One client (and so
+# one connection pool) per process: PyMongo clients must not be used across a
+# fork, so a child that inherits one builds its own on first use.
+MONGO_SYNC_POOL_OPTIONS = {
+    **MONGO_POOL_OPTIONS,
+    "maxPoolSize": int(os.getenv("MONGO_SYNC_MAX_POOL_SIZE", "10")),
+    "minPoolSize": 0,
+}
+
+_sync_client = None
+_sync_client_pid = None
+_sync_client_lock = threading.Lock()
+
+def init_sync_client() -> MongoClient:
+    """Create this process's client; Celery calls it in each child via worker_process_init"""
+    global _sync_client, _sync_client_pid
+    with _sync_client_lock:
+        if _sync_client is not None and _sync_client_pid == os.getpid():
+            return _sync_client
+        # An inherited client belongs to the parent: drop it without closing the parent's sockets
+        # connect=False: no monitor threads or sockets until the first operation
+        _sync_client = MongoClient(MONGODB_URL, connect=False, **MONGO_SYNC_POOL_OPTIONS)
+        _sync_client_pid = os.getpid()
+        return _sync_client
+
+def get_sync_client() -> MongoClient:
+    client = _sync_client
+    if client is None or _sync_client_pid != os.getpid():
+        client = init_sync_client()
+    return client
+
+def close_sync_client():
+    global _sync_client, _sync_client_pid
+    with _sync_client_lock:
+        if _sync_client is not None and _sync_client_pid == os.getpid():
+            _sync_client.close()
+        _sync_client = None
+        _sync_client_pid = None
+
 def get_sync_db():
-    client = MongoClient(MONGODB_URL)
-    return client[DATABASE_NAME]
\ No newline at end of file
+    """Database handle on the shared per-process client (never close it per task)"""
+    return get_sync_client()[DATABASE_NAME]
@@ -0,0 +1,174 @@
+import os
+import math
+import asyncio
+import logging
+import threading
+import contextvars
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# Pool sizes and admission limits
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "8"))
+PARSE_POOL_SIZE = int(os.getenv("PARSE_POOL_SIZE", str(os.cpu_count() or 1)))
+MAX_CONCURRENT_ANALYSES = int(os.getenv("MAX_CONCURRENT_ANALYSES", str(LLM_POOL_SIZE * 2)))
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "5"))
+# Share of the analysis slots kept free for users still below their fair share
+FAIR_SHARE_RESERVE = float(os.getenv("FAIR_SHARE_RESERVE", "0.25"))
+
+ANONYMOUS_USER = "anonymous"
+
+# Thread pool for blocking LLM I/O (Crew.kickoff)
+llm_pool = ThreadPoolExecutor(max_workers=LLM_POOL_SIZE, thread_name_prefix="llm")
+
+# Process pool for CPU-bound PDF parsing, created on first use
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_lock = threading.Lock()
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ProcessPoolExecutor(max_workers=PARSE_POOL_SIZE)
+        return _parse_pool
+
+class AdmissionLimiter:
+    """Non-blocking counter that caps how many requests may hold pool capacity"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.in_flight >= self.limit:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self):
+        with self._lock:
+            return {"limit": self.limit, "in_flight": self.in_flight, "rejected": self.rejected}
+
+class FairShareLimiter(AdmissionLimiter):
+    """AdmissionLimiter that divides its slots between users
+
+    Each user with work in flight is entitled to limit / active users slots
+    (at least one). A user past that share is only admitted while more than
+    `reserve` of the slots are free, so a user arriving during another
+    tenant's burst still finds room.
+    """
+
+    def __init__(self, limit: int, reserve: float = FAIR_SHARE_RESERVE):
+        super().__init__(limit)
+        self.reserve = math.ceil(limit * reserve)
+        self.rejected_over_share = 0
+        self._by_user: Dict[str, int] = {}
+
+    def _fair_share(self, user: str) -> int:
+        # Caller must hold the lock
+        active = len(self._by_user) + (0 if user in self._by_user else 1)
+        return max(1, self.limit // active)
+
+    def try_acquire(self, user: str = ANONYMOUS_USER) -> bool:
+        with self._lock:
+            if self.in_flight >= self.limit:
+                self.rejected += 1
+                return False
+            held = self._by_user.get(user, 0)
+            if held >= self._fair_share(user) and self.limit - self.in_flight <= self.reserve:
+                self.rejected += 1
+                self.rejected_over_share += 1
+                return False
+            self.in_flight += 1
+            self._by_user[user] = held + 1
+            return True
+
+    def release(self, user: str = ANONYMOUS_USER):
+        with self._lock:
+            self.in_flight -= 1
+            held = self._by_user.get(user, 0) - 1
+            if held > 0:
+                self._by_user[user] = held
+            else:
+                self._by_user.pop(user, None)
+
+    def over_share(self, user: str) -> bool:
+        with self._lock:
+            return self._by_user.get(user, 0) >= self._fair_share(user)
+
+    def held(self, user: str) -> int:
+        with self._lock:
+            return self._by_user.get(user, 0)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "rejected": self.rejected,
+                "rejected_over_share": self.rejected_over_share,
+                "reserve": self.reserve,
+                "active_users": len(self._by_user),
+                "max_user_in_flight": max(self._by_user.values(), default=0)
+            }
+
+analysis_slots = FairShareLimiter(MAX_CONCURRENT_ANALYSES)
+
+def saturated_error() -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="Server is busy with other analyses, please retry shortly",
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+    )
+
+def admission_error(limiter: FairShareLimiter, user: str) -> HTTPException:
+    """429 for a rejected try_acquire(user): the user's fair share, or the whole server, is busy"""
+    if limiter.over_share(user) and limiter.held(user):
+        return HTTPException(
+            status_code=429,
+            detail=f"User '{user}' already has {limiter.held(user)} requests in flight, more than its fair share; "
+                   f"please retry shortly",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+    return saturated_error()
+
+def quota_exhausted_error(error: Exception) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=f"Model provider quota exhausted, please retry shortly: {error}",
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+    )
+
+async def run_in_llm_pool(func, *args, **kwargs):
+    """Run a blocking LLM call on the LLM thread pool, in a copy of the caller's context (LLM priority, timings)"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(llm_pool, partial(context.run, func, *args, **kwargs))
+
+def shutdown_pools():
+    global _parse_pool
+    llm_pool.shutdown(wait=False, cancel_futures=True)
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(wait=False, cancel_futures=True)
+            _parse_pool = None
+    logger.info("🧹 Executor pools shut down")
+
+def pool_stats():
+    return {
+        "llm_pool_size": LLM_POOL_SIZE,
+        "parse_pool_size": PARSE_POOL_SIZE,
+        "analyses": analysis_slots.stats()
+    }
@@ -0,0 +1,177 @@
+import re
+import math
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+# Line items read from statement tables. Alternatives are tried left to right at each
+# position, so longer labels ("cost of revenue") win over the shorter ones they contain.
+LINE_ITEMS = [
+    ("cost_of_revenue", r"cost of (?:revenues?|sales|goods sold)"),
+    ("gross_profit", r"gross (?:profit|margin)"),
+    ("operating_income", r"(?:operating (?:income|profit)|income from operations)"),
+    ("net_income", r"net (?:income|profit|earnings)(?: attributable to [a-z ]{3,40}?)?"),
+    ("revenue", r"(?:total )?(?:net )?(?:revenues?|sales|turnover)"),
+    ("current_assets", r"total current assets"),
+    ("current_liabilities", r"total current liabilities"),
+    ("total_assets", r"total assets"),
+    ("total_liabilities", r"total liabilities"),
+    ("total_equity", r"total (?:shareholders|stockholders)['’]? equity|total equity"),
+    ("total_debt", r"total debt|total borrowings|long-term debt"),
+    ("cash", r"cash and (?:cash )?equivalents"),
+    ("operating_cash_flow", r"net cash (?:provided by|from|generated (?:by|from)) operating activities"),
+    ("capital_expenditure", r"capital expenditures?|purchases? of property,? plant and equipment"),
+    ("eps", r"diluted (?:earnings|net income) per (?:common )?share|earnings per share"),
+]
+# Ratios and growth computed from the line items of the same document and period
+DERIVED_METRICS = [
+    "gross_margin", "operating_margin", "net_margin", "current_ratio", "debt_to_equity",
+    "return_on_equity", "free_cash_flow", "revenue_growth", "net_income_growth",
+]
+METRICS = [name for name, _ in LINE_ITEMS] + DERIVED_METRICS
+# Per-share and ratio values are not multiplied by the table's "(in millions)" scale
+UNSCALED = {"eps"}
+
+NUMBER = r"\(?-?\$?\s?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?\)?"
+LINE_ITEM_PATTERN = re.compile(
+    r"\b(?:" + "|".join(f"(?P<{name}>{pattern})" for name, pattern in LINE_ITEMS) + r")\b[\s:$]*"
+    r"(?P<values>" + NUMBER + r"(?:\s+" + NUMBER + r"){0,5})(?![\d,.%])",
+    re.IGNORECASE
+)
+# Column headers: two or more years in a row ("2024 2023", "FY2024 FY2023")
+YEAR_HEADER_PATTERN = re.compile(r"\b(?:FY)?((?:19|20)\d{2})(?:\s+(?:FY)?(?:19|20)\d{2}){1,4}\b")
+YEAR_PATTERN = re.compile(r"(?:19|20)\d{2}")
+FISCAL_YEAR_PATTERN = re.compile(
+    r"(?:fiscal(?: year)?|annual report|year ended [a-z]+ \d{1,2},?)\s+((?:19|20)\d{2})", re.IGNORECASE
+)
+SCALE_PATTERN = re.compile(r"\bin (thousands|millions|billions)\b", re.IGNORECASE)
+SCALES = {"thousands": 1e3, "millions": 1e6, "billions": 1e9}
+# Figures on the primary statements are preferred over the same item quoted in the narrative
+STATEMENT_PAGE_PATTERN = re.compile(
+    r"balance sheets?|statements? of (?:financial position|income|operations|earnings|cash flows?)",
+    re.IGNORECASE
+)
+
+def parse_number(text: str) -> Optional[float]:
+    """'1,234.5' -> 1234.5, '(12)' -> -12.0, '$ 7' -> 7.0"""
+    negative = text.startswith("(") and text.endswith(")") or text.lstrip("($ ").startswith("-")
+    digits = text.strip("()$ -").replace(",", "").replace("$", "").strip()
+    try:
+        value = float(digits)
+    except ValueError:
+        return None
+    return -value if negative else value
+
+def document_year(pages: List[str]) -> Optional[int]:
+    """The fiscal year a document reports on, for figures outside a dated table"""
+    years = Counter(int(match) for page in pages for match in FISCAL_YEAR_PATTERN.findall(page))
+    return years.most_common(1)[0][0] if years else None
+
+def page_scales(pages: List[str]) -> List[float]:
+    """The "(in millions)" multiplier in force on each page
+
+    A scale line heads a statement and holds for the pages after it until
+    another one appears; pages before the first marker take the document's
+    most common scale, so items from different pages share one unit.
+    """
+    found = [SCALE_PATTERN.search(page) for page in pages]
+    named = [SCALES[match.group(1).lower()] for match in found if match]
+    scale = Counter(named).most_common(1)[0][0] if named else 1.0
+    scales = []
+    for match in found:
+        if match:
+            scale = SCALES[match.group(1).lower()]
+        scales.append(scale)
+    return scales
+
+def _column_years(page: str) -> List[Tuple[int, List[int]]]:
+    """(position, [years]) of each year column header on a page"""
+    return [
+        (match.start(), [int(year) for year in YEAR_PATTERN.findall(match.group(0))])
+        for match in YEAR_HEADER_PATTERN.finditer(page)
+    ]
+
+def extract_line_items(pages: List[str]) -> Dict[int, Dict[str, Tuple[float, int]]]:
+    """{year: {metric: (value, page number)}} read from statement-style rows of the page text
+
+    A row is a known label immediately followed by its figures; the figures
+    are matched to the nearest preceding year header on the page (first
+    figure = first year column), or to the document's fiscal year when the
+    page has none, and scaled by the page's unit from page_scales. The
+    first value found for a metric and year wins, with statement pages read
+    before the rest.
+    """
+    fallback_year = document_year(pages)
+    scales = page_scales(pages)
+    order = sorted(range(len(pages)), key=lambda i: not STATEMENT_PAGE_PATTERN.search(pages[i]))
+    items: Dict[int, Dict[str, Tuple[float, int]]] = {}
+
+    for index in order:
+        page = pages[index]
+        headers = _column_years(page)
+        scale = scales[index]
+
+        for match in LINE_ITEM_PATTERN.finditer(page):
+            metric = next(name for name, _ in LINE_ITEMS if match.group(name))
+            preceding = [years for position, years in headers if position < match.start()]
+            years = preceding[-1] if preceding else ([fallback_year] if fallback_year else [])
+            values = [parse_number(token) for token in re.findall(NUMBER, match.group("values"))]
+            for year, value in zip(years, values):
+                if value is None:
+                    continue
+                if metric not in UNSCALED:
+                    value *= scale
+                items.setdefault(year, {}).setdefault(metric, (value, index + 1))
+    return items
+
+def _ratio(numerator: Optional[float], denominator: Optional[float]) -> Optional[float]:
+    if numerator is None or not denominator:
+        return None
+    return numerator / denominator
+
+def derive_metrics(values: Dict[int, Dict[str, float]]) -> Dict[int, Dict[str, float]]:
+    """Add ratios and year-over-year growth to {year: {line item: value}}
+
+    debt_to_equity uses total_debt, or total_liabilities when no debt line was
+    found; equity falls back to total_assets - total_liabilities.
+    """
+    derived = {}
+    for year, items in values.items():
+        get = items.get
+        revenue = get("revenue")
+        gross_profit = get("gross_profit")
+        if gross_profit is None and revenue is not None and get("cost_of_revenue") is not None:
+            gross_profit = revenue - abs(get("cost_of_revenue"))
+        equity = get("total_equity")
+        if equity is None and get("total_assets") is not None and get("total_liabilities") is not None:
+            equity = get("total_assets") - get("total_liabilities")
+        debt = get("total_debt") if get("total_debt") is not None else get("total_liabilities")
+        prior = values.get(year - 1, {})
+
+        metrics = {
+            **items,
+            "gross_margin": _ratio(gross_profit, revenue),
+            "operating_margin": _ratio(get("operating_income"), revenue),
+            "net_margin": _ratio(get("net_income"), revenue),
+            "current_ratio": _ratio(get("current_assets"), get("current_liabilities")),
+            "debt_to_equity": _ratio(debt, equity) if equity and equity > 0 else None,
+            "return_on_equity": _ratio(get("net_income"), equity) if equity and equity > 0 else None,
+            "free_cash_flow": (
+                get("operating_cash_flow") - abs(get("capital_expenditure"))
+                if get("operating_cash_flow") is not None and get("capital_expenditure") is not None else None
+            ),
+            "revenue_growth": _ratio(revenue, prior.get("revenue")) - 1
+            if _ratio(revenue, prior.get("revenue")) is not None else None,
+            "net_income_growth": _ratio(get("net_income"), abs(prior.get("net_income") or 0)) - 1
+            if get("net_income") is not None and prior.get("net_income") and prior.get("net_income") > 0 else None,
+        }
+        derived[year] = {k: v for k, v in metrics.items() if v is not None and math.isfinite(v)}
+    return derived
+
+def extract_metrics(pages: List[str]) -> Dict[str, Any]:
+    """Typed metrics per fiscal year for a document's per-page text, with the page each figure came from"""
+    items = extract_line_items(pages)
+    values = {year: {metric: value for metric, (value, _) in metrics.items()} for year, metrics in items.items()}
+    return {
+        "periods": derive_metrics(values),
+        "sources": {year: {metric: page for metric, (_, page) in metrics.items()} for year, metrics in items.items()},
+    }
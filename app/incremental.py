@@ -0,0 +1,220 @@
+import os
+import re
+import time
+import hashlib
+import logging
+import difflib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from app.agents import MODEL_NAME
+from app.cache import segment_cache, normalize_query
+from app.crew_pool import chunk_crews, reduce_crews
+from app.mapreduce import run_task, reported_tokens, estimate_tokens, MAP_CHUNK_TOKENS, MAP_FANOUT, CHARS_PER_TOKEN
+from app.tasks import CHUNK_TASK_DESCRIPTION, REDUCE_TASK_DESCRIPTION, PROMPT_VERSION
+
+logger = logging.getLogger(__name__)
+
+# Segments end after a page whose fingerprint is 0 mod SEGMENT_TARGET_PAGES (so they
+# average about that many pages) or when the next page would exceed SEGMENT_MAX_TOKENS
+SEGMENT_TARGET_PAGES = int(os.getenv("SEGMENT_TARGET_PAGES", "6"))
+SEGMENT_MIN_PAGES = int(os.getenv("SEGMENT_MIN_PAGES", "2"))
+SEGMENT_MAX_TOKENS = int(os.getenv("SEGMENT_MAX_TOKENS", str(MAP_CHUNK_TOKENS)))
+
+# Page-number headers/footers change on every page after an insertion; leave them out of fingerprints
+PAGE_NUMBER_PATTERN = re.compile(r"\bpage \d+(?: of \d+)?\b|^\d{1,4}\s+|\s+\d{1,4}$", re.IGNORECASE)
+PAGE_REFERENCE = re.compile(r"\b(pages?|pp?\.)(\s*)(\d+)(?:(\s*[-–]\s*)(\d+))?", re.IGNORECASE)
+
+def page_fingerprint(content: str) -> str:
+    return hashlib.sha256(PAGE_NUMBER_PATTERN.sub("", content).encode("utf-8")).hexdigest()[:16]
+
+def page_fingerprints(pages: List[str]) -> List[str]:
+    return [page_fingerprint(content) for content in pages]
+
+def segment_pages(pages: List[str], fingerprints: List[str], max_tokens: int = SEGMENT_MAX_TOKENS,
+                  target_pages: int = SEGMENT_TARGET_PAGES, min_pages: int = SEGMENT_MIN_PAGES) -> List[Dict[str, Any]]:
+    """Group pages into runs whose boundaries depend on page content, not position
+
+    Unlike chunk_pages(), inserting or editing a page only changes the
+    segment(s) around it: later boundaries fall on the same pages as before,
+    so their notes can be reused. A page larger than max_tokens is a segment
+    of its own.
+    """
+    max_chars = max(max_tokens, 1) * CHARS_PER_TOKEN
+    segments = []
+    page_nums: List[int] = []
+    size = 0
+
+    def flush():
+        text = "\n\n".join(f"[Page {n}]\n{pages[n - 1]}" for n in page_nums if pages[n - 1])
+        segments.append({
+            "first_page": page_nums[0],
+            "last_page": page_nums[-1],
+            "fingerprints": [fingerprints[n - 1] for n in page_nums],
+            "text": text,
+            "tokens": estimate_tokens(text)
+        })
+
+    for page_num, (content, fingerprint) in enumerate(zip(pages, fingerprints), 1):
+        if page_nums and size + len(content) > max_chars:
+            flush()
+            page_nums, size = [], 0
+        page_nums.append(page_num)
+        size += len(content)
+        if len(page_nums) >= min_pages and int(fingerprint, 16) % max(target_pages, 1) == 0:
+            flush()
+            page_nums, size = [], 0
+    if page_nums:
+        flush()
+    return segments
+
+def segment_key(fingerprints: List[str], query: str) -> str:
+    parts = ["segment", ",".join(fingerprints), normalize_query(query), MODEL_NAME, PROMPT_VERSION]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+def shift_page_references(notes: str, first_page: int, last_page: int, offset: int) -> str:
+    """Renumber 'page N' mentions in reused notes when their pages moved by `offset`"""
+    if offset == 0:
+        return notes
+
+    def shift(number: str) -> str:
+        n = int(number)
+        return str(n + offset) if first_page <= n <= last_page else number
+
+    def replace(match):
+        text = match.group(1) + match.group(2) + shift(match.group(3))
+        if match.group(5):
+            text += match.group(4) + shift(match.group(5))
+        return text
+
+    return PAGE_REFERENCE.sub(replace, notes)
+
+def diff_pages(base_fingerprints: List[str], fingerprints: List[str]) -> Dict[str, Any]:
+    """Page-level diff of a new version against its base document"""
+    matcher = difflib.SequenceMatcher(a=base_fingerprints, b=fingerprints, autojunk=False)
+    unchanged = set()
+    for block in matcher.get_matching_blocks():
+        unchanged.update(range(block.b + 1, block.b + block.size + 1))
+    return {
+        "base_pages": len(base_fingerprints),
+        "unchanged_pages": len(unchanged),
+        "changed_pages": [n for n in range(1, len(fingerprints) + 1) if n not in unchanged],
+        "removed_pages": len(base_fingerprints) - len(unchanged),
+    }
+
+def run_incremental(query: str, pages: List[str], base_pages: Optional[List[str]] = None,
+                    fanout: int = MAP_FANOUT) -> Dict[str, Any]:
+    """Map-reduce over content-defined segments, reusing stored notes for segments seen before
+
+    Each segment's notes are cached under its page fingerprints and the
+    query, so a new version of a filing only sends its changed segments to
+    the model; the reduce step then merges reused and fresh notes into the
+    report (and is skipped too when no segment changed). `base_pages` is the
+    previous version, used only to report the page diff.
+    """
+    started = time.perf_counter()
+    fingerprints = page_fingerprints(pages)
+    segments = segment_pages(pages, fingerprints)
+    if not any(segment["text"] for segment in segments):
+        raise ValueError("No text could be extracted from the document. The file might be scanned or image-based.")
+
+    for segment in segments:
+        segment["key"] = segment_key(segment["fingerprints"], query)
+        segment["stored"] = segment_cache.get(segment["key"]) if segment["text"] else None
+    changed = [segment for segment in segments if segment["text"] and segment["stored"] is None]
+    logger.info(f"🧩 Incremental analysis: {len(changed)} of {len(segments)} segments need the model")
+
+    def analyze_segment(segment):
+        label = f"pages {segment['first_page']}-{segment['last_page']} of {len(pages)}"
+        segment_started = time.perf_counter()
+        notes, usage = run_task(chunk_crews, {"query": query, "chunk_text": segment["text"], "chunk_label": label})
+        stored = {
+            "notes": notes,
+            "first_page": segment["first_page"],
+            "last_page": segment["last_page"],
+            "seconds": round(time.perf_counter() - segment_started, 3),
+            "prompt_tokens": estimate_tokens(CHUNK_TASK_DESCRIPTION) + segment["tokens"] + estimate_tokens(query),
+            "reported_tokens": reported_tokens(usage)
+        }
+        segment_cache.set(segment["key"], stored)
+        return stored
+
+    map_started = time.perf_counter()
+    if changed:
+        with ThreadPoolExecutor(max_workers=max(1, min(fanout, len(changed))), thread_name_prefix="segment") as pool:
+            # Segment calls keep the caller's LLM priority
+            futures = [pool.submit(contextvars.copy_context().run, analyze_segment, segment) for segment in changed]
+            fresh = [future.result() for future in futures]
+    else:
+        fresh = []
+    map_seconds = time.perf_counter() - map_started
+    for segment, stored in zip(changed, fresh):
+        segment["fresh"] = stored
+
+    parts = []
+    for segment in segments:
+        if not segment["text"]:
+            continue
+        stored = segment.get("fresh") or segment["stored"]
+        notes = shift_page_references(
+            stored["notes"], stored["first_page"], stored["last_page"], segment["first_page"] - stored["first_page"]
+        )
+        parts.append(f"=== Part {len(parts) + 1} (pages {segment['first_page']}-{segment['last_page']}) ===\n{notes}")
+    chunk_notes = "\n\n".join(parts)
+
+    # Identical notes (e.g. only metadata or blank pages changed) give the identical report
+    reduce_key = hashlib.sha256(
+        "\x1f".join(["reduce", chunk_notes, normalize_query(query), MODEL_NAME, PROMPT_VERSION]).encode("utf-8")
+    ).hexdigest()
+    reduce_tokens = estimate_tokens(REDUCE_TASK_DESCRIPTION) + estimate_tokens(chunk_notes) + 2 * estimate_tokens(query)
+    reduce_started = time.perf_counter()
+    stored_reduce = segment_cache.get(reduce_key)
+    if stored_reduce is not None:
+        analysis = stored_reduce["analysis"]
+        reduce_usage = None
+    else:
+        analysis, reduce_usage = run_task(
+            reduce_crews, {"query": query, "chunk_notes": chunk_notes, "chunk_count": str(len(parts))}
+        )
+        stored_reduce = {"analysis": analysis, "seconds": round(time.perf_counter() - reduce_started, 3)}
+        segment_cache.set(reduce_key, stored_reduce)
+    reduce_seconds = time.perf_counter() - reduce_started
+
+    reused = [segment for segment in segments if segment["text"] and "fresh" not in segment]
+    pages_with_text = sum(1 for content in pages if content)
+    pages_reused = sum(
+        1 for segment in reused for n in range(segment["first_page"], segment["last_page"] + 1) if pages[n - 1]
+    )
+    map_tokens_sent = sum(stored["prompt_tokens"] for stored in fresh)
+    map_tokens_saved = sum(segment["stored"]["prompt_tokens"] for segment in reused)
+    reduce_reused = reduce_usage is None
+
+    stats = {
+        "segments": len(parts),
+        "segments_reused": len(reused),
+        "pages": pages_with_text,
+        "pages_reused": pages_reused,
+        "reused_fraction": round(pages_reused / pages_with_text, 4) if pages_with_text else 0.0,
+        "reduce_reused": reduce_reused,
+        # Estimated input tokens (chars / 4)
+        "map_prompt_tokens": map_tokens_sent,
+        "reduce_prompt_tokens": 0 if reduce_reused else reduce_tokens,
+        "prompt_tokens_saved": map_tokens_saved + (reduce_tokens if reduce_reused else 0),
+        "reported_tokens": sum(stored["reported_tokens"] for stored in fresh) + reported_tokens(reduce_usage),
+        "map_seconds": round(map_seconds, 3),
+        "reduce_seconds": round(reduce_seconds, 3),
+        # Model time the reused notes took when they were produced
+        "model_seconds_saved": round(
+            sum(segment["stored"]["seconds"] for segment in reused)
+            + (stored_reduce["seconds"] if reduce_reused else 0), 3
+        ),
+        "total_seconds": round(time.perf_counter() - started, 3)
+    }
+    if base_pages is not None:
+        stats["diff"] = diff_pages(page_fingerprints(base_pages), fingerprints)
+    logger.info(
+        f"✅ Incremental analysis done: {pages_reused}/{pages_with_text} pages reused, "
+        f"{stats['prompt_tokens_saved']} prompt tokens and ~{stats['model_seconds_saved']}s of model time saved"
+    )
+    return {"analysis": analysis, "stats": stats}
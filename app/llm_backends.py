@@ -0,0 +1,181 @@
+import os
+import re
+import time
+import random
+import hashlib
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# Backend selection
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")  # gemini or fake
+LLM_MODEL = os.getenv("LLM_MODEL", "models/gemma-3-27b-it")
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.7"))
+
+# Fake backend behaviour
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.5"))  # seconds before the first token
+FAKE_LLM_JITTER = float(os.getenv("FAKE_LLM_JITTER", "0.1"))  # up to this many extra seconds
+FAKE_LLM_TOKENS_PER_SEC = float(os.getenv("FAKE_LLM_TOKENS_PER_SEC", "50"))  # 0 = instant output
+FAKE_LLM_OUTPUT_TOKENS = int(os.getenv("FAKE_LLM_OUTPUT_TOKENS", "400"))
+FAKE_LLM_FAILURE_RATE = float(os.getenv("FAKE_LLM_FAILURE_RATE", "0"))
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "0"))
+
+# Section titles the model is asked for ("EXECUTIVE SUMMARY", "ANSWER TO USER QUERY 2", ...)
+HEADING_PATTERN = re.compile(r"^[ \t]*([A-Z][A-Z ]{2,}[A-Z](?: \d+)?)[ \t]*$", re.MULTILINE)
+FILLER_WORDS = (
+    "revenue increased year over year while operating margin remained stable and the company "
+    "reported net income growth supported by lower interest expense cash flow from operations "
+    "covered capital expenditure and the balance sheet shows moderate leverage with adequate liquidity"
+).split()
+
+_rng: Optional[random.Random] = None
+_rng_lock = threading.Lock()
+
+class FakeQuotaError(RuntimeError):
+    """Injected failure, worded like the Gemini API's quota error"""
+
+class FakeChatModel(BaseChatModel):
+    """Offline chat model that answers in the requested report format
+
+    Sleeps `latency` (+ up to `jitter`) seconds before the first token, then
+    emits `output_tokens` tokens at `tokens_per_second`, and raises
+    FakeQuotaError for a `failure_rate` fraction of calls. Text is derived
+    from the prompt, so the same prompt always yields the same answer; the
+    timing and failure draws are seeded by `seed`.
+    """
+
+    latency: float = FAKE_LLM_LATENCY
+    jitter: float = FAKE_LLM_JITTER
+    tokens_per_second: float = FAKE_LLM_TOKENS_PER_SEC
+    output_tokens: int = FAKE_LLM_OUTPUT_TOKENS
+    failure_rate: float = FAKE_LLM_FAILURE_RATE
+    seed: int = FAKE_LLM_SEED
+    model: str = "fake"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model": self.model, "latency": self.latency, "tokens_per_second": self.tokens_per_second}
+
+    def _draw(self) -> float:
+        # One shared, locked RNG per process keeps timing and failures reproducible for a given seed
+        global _rng
+        with _rng_lock:
+            if _rng is None:
+                _rng = random.Random(self.seed)
+            return _rng.random()
+
+    def _prompt(self, messages: List[BaseMessage]) -> str:
+        return "\n".join(str(message.content) for message in messages)
+
+    def _compose(self, prompt: str) -> List[str]:
+        """Deterministic answer tokens (words with their trailing whitespace) for a prompt"""
+        headings = list(dict.fromkeys(HEADING_PATTERN.findall(prompt))) or ["ANALYSIS"]
+        words = random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+        per_section = max(1, (self.output_tokens - 2 * len(headings)) // len(headings))
+
+        tokens = []
+        # CrewAI's ReAct-style agent only accepts output that carries a final answer marker
+        if "Final Answer:" in prompt:
+            tokens += ["Thought: ", "I now can give a great answer\n", "Final ", "Answer: "]
+        for heading in headings:
+            tokens.append(f"{heading}\n")
+            tokens += [f"{words.choice(FILLER_WORDS)} " for _ in range(per_section)]
+            tokens.append("\n\n")
+        return tokens
+
+    def _wait_first_token(self):
+        time.sleep(self.latency + self.jitter * self._draw())
+        if self.failure_rate and self._draw() < self.failure_rate:
+            raise FakeQuotaError("429 Resource has been exhausted (e.g. check quota). [fake backend]")
+
+    def _wait_token(self):
+        if self.tokens_per_second > 0:
+            time.sleep(1.0 / self.tokens_per_second)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        prompt = self._prompt(messages)
+        tokens = self._compose(prompt)
+        self._wait_first_token()
+        if self.tokens_per_second > 0:
+            time.sleep(len(tokens) / self.tokens_per_second)
+        usage = {
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": len(tokens),
+            "total_tokens": len(prompt) // 4 + len(tokens)
+        }
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(
+                content="".join(tokens),
+                usage_metadata={
+                    "input_tokens": usage["prompt_tokens"],
+                    "output_tokens": usage["completion_tokens"],
+                    "total_tokens": usage["total_tokens"]
+                }
+            ))],
+            llm_output={"token_usage": usage, "model_name": self.model}
+        )
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        tokens = self._compose(self._prompt(messages))
+        self._wait_first_token()
+        for token in tokens:
+            self._wait_token()
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+def build_gemini_llm():
+    # Load API key
+    google_api_key = os.getenv("GOOGLE_API_KEY")
+    if not google_api_key:
+        raise RuntimeError(
+            "GOOGLE_API_KEY not found in environment variables. "
+            "Please create a .env file with: GOOGLE_API_KEY=your_key_here"
+        )
+
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    print(f"🔄 Initializing {LLM_MODEL} (API key starts with: {google_api_key[:10]}...)")
+    return ChatGoogleGenerativeAI(
+        model=LLM_MODEL,
+        google_api_key=google_api_key,
+        temperature=LLM_TEMPERATURE,
+        # Quota errors are retried by the LLM scheduler, which spaces out every caller
+        max_retries=1
+    )
+
+def build_fake_llm():
+    print(
+        f"🔄 Initializing fake LLM ({FAKE_LLM_LATENCY}s + {FAKE_LLM_JITTER}s jitter, "
+        f"{FAKE_LLM_TOKENS_PER_SEC} tok/s, {FAKE_LLM_FAILURE_RATE:.0%} failures)"
+    )
+    return FakeChatModel(model=model_name())
+
+LLM_BACKENDS = {
+    "gemini": build_gemini_llm,
+    "fake": build_fake_llm,
+}
+
+def model_name() -> str:
+    """Model identifier reported in results and used in cache keys"""
+    if LLM_BACKEND == "gemini":
+        return LLM_MODEL
+    # Keep other backends' results apart from real model output in the cache
+    return f"{LLM_BACKEND}/{LLM_MODEL}"
+
+def build_llm():
+    """Create the chat model for the backend selected by LLM_BACKEND"""
+    if LLM_BACKEND not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND '{LLM_BACKEND}', expected one of {sorted(LLM_BACKENDS)}")
+    return LLM_BACKENDS[LLM_BACKEND]()
@@ -0,0 +1,397 @@
+import os
+import re
+import json
+import time
+import heapq
+import random
+import hashlib
+import logging
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import Future
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from crewai import BaseLLM
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage, convert_to_messages
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+from app.metrics import LLM_QUEUE_WAIT, LLM_RETRIES
+
+logger = logging.getLogger(__name__)
+
+# Provider budgets over a sliding minute; 0 disables a budget
+LLM_RPM = int(os.getenv("LLM_RPM", "0"))
+LLM_TPM = int(os.getenv("LLM_TPM", "0"))
+# Calls allowed at the provider at once, across every crew, stream and worker thread in the process
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", os.getenv("LLM_POOL_SIZE", "8")))
+# Quota errors are retried with jittered exponential backoff
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "1.0"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "30"))
+# Identical prompts in flight at the same time share one model call
+LLM_COALESCE = os.getenv("LLM_COALESCE", "true").lower() in ("1", "true", "yes")
+
+# Lower runs first: user-facing requests, then batch items, then Celery tasks
+PRIORITIES = {"interactive": 0, "batch": 1, "background": 2}
+
+WINDOW_SECONDS = 60.0
+QUOTA_ERROR_PATTERN = re.compile(r"\b429\b|resource.{0,3}exhausted|quota|rate.?limit", re.IGNORECASE)
+RETRY_DELAY_PATTERN = re.compile(r"retry in ([\d.]+)\s*s|retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE)
+
+_priority: ContextVar[str] = ContextVar("llm_priority", default="interactive")
+
+def set_llm_priority(priority: str):
+    """Queue model calls made from the current request, task or thread at this priority"""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown LLM priority '{priority}', expected one of {sorted(PRIORITIES)}")
+    return _priority.set(priority)
+
+def is_quota_error(error: BaseException) -> bool:
+    """Whether a provider error means 'slow down' (HTTP 429 / RESOURCE_EXHAUSTED) rather than a real failure"""
+    if 429 in (getattr(error, "code", None), getattr(error, "status_code", None)):
+        return True
+    return bool(QUOTA_ERROR_PATTERN.search(f"{type(error).__name__} {error}"))
+
+def retry_delay(attempt: int, error: Optional[BaseException] = None) -> float:
+    """Backoff before retry `attempt` (0-based): exponential with equal jitter, at least what the provider asked for"""
+    ceiling = min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt)
+    delay = ceiling / 2 + random.uniform(0, ceiling / 2)
+    match = RETRY_DELAY_PATTERN.search(str(error)) if error is not None else None
+    if match:
+        delay = max(delay, float(match.group(1) or match.group(2)))
+    return delay
+
+class _SharedStream:
+    """Chunks of one in-flight streamed call, replayed to identical callers as they arrive"""
+
+    def __init__(self):
+        self._chunks: List[Any] = []
+        self._done = False
+        self._error: Optional[BaseException] = None
+        self._cond = threading.Condition()
+
+    def append(self, chunk):
+        with self._cond:
+            self._chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, error: Optional[BaseException] = None):
+        with self._cond:
+            self._done, self._error = True, error
+            self._cond.notify_all()
+
+    def __iter__(self):
+        index = 0
+        while True:
+            with self._cond:
+                while index >= len(self._chunks) and not self._done:
+                    self._cond.wait()
+                if index == len(self._chunks):
+                    if self._error is not None:
+                        raise self._error
+                    return
+                chunk = self._chunks[index]
+            index += 1
+            yield chunk
+
+class LLMScheduler:
+    """Admits model calls in priority order within RPM/TPM budgets and an in-flight cap
+
+    Callers block in acquire() on a heap ordered by (priority, arrival); only
+    the head of the heap is considered, so a batch call never overtakes an
+    interactive one that is waiting for budget. A quota error pauses every
+    caller for the backoff delay, since the provider is refusing all of them.
+    """
+
+    def __init__(self, rpm: int = LLM_RPM, tpm: int = LLM_TPM, max_in_flight: int = LLM_MAX_IN_FLIGHT,
+                 max_retries: int = LLM_MAX_RETRIES):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max_retries
+        self._cond = threading.Condition()
+        self._waiting: List[tuple] = []
+        self._arrivals = itertools.count()
+        self._window: deque = deque()  # [admitted_at, tokens] per call admitted in the last minute
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._pending: Dict[str, Future] = {}
+        self._pending_streams: Dict[str, "_SharedStream"] = {}
+        self._counters = {"calls": 0, "retries": 0, "quota_errors": 0, "coalesced": 0}
+
+    def _delay(self, tokens: int, now: float) -> Optional[float]:
+        """Seconds until a call of `tokens` may start; None while it must wait for a release"""
+        while self._window and now - self._window[0][0] >= WINDOW_SECONDS:
+            self._window.popleft()
+        if self._in_flight >= self.max_in_flight:
+            return None
+        if now < self._paused_until:
+            return self._paused_until - now
+        expires = self._window[0][0] + WINDOW_SECONDS - now if self._window else 0.0
+        if self.rpm and len(self._window) >= self.rpm:
+            return expires
+        # A call larger than the whole budget still runs once the window is empty
+        if self.tpm and self._window and sum(entry[1] for entry in self._window) + tokens > self.tpm:
+            return expires
+        return 0.0
+
+    def acquire(self, tokens: int, priority: Optional[str] = None) -> list:
+        """Block until this call may start; returns the window entry to pass to release()"""
+        priority = priority or _priority.get()
+        ticket = (PRIORITIES[priority], next(self._arrivals))
+        started = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    delay = self._delay(tokens, time.monotonic()) if self._waiting[0] == ticket else None
+                    if delay == 0.0:
+                        break
+                    self._cond.wait(delay)
+            except BaseException:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+                raise
+            heapq.heappop(self._waiting)
+            entry = [time.monotonic(), tokens]
+            self._window.append(entry)
+            self._in_flight += 1
+            self._counters["calls"] += 1
+            # The next caller in line re-checks the budget
+            self._cond.notify_all()
+        LLM_QUEUE_WAIT.labels(priority).observe(time.monotonic() - started)
+        return entry
+
+    def release(self, entry: list, tokens: Optional[int] = None):
+        """Finish a call, replacing its estimated tokens with the actual count when known"""
+        with self._cond:
+            self._in_flight -= 1
+            if tokens is not None:
+                entry[1] = tokens
+            self._cond.notify_all()
+
+    def _backoff(self, attempt: int, error: BaseException):
+        """Pause every caller for the retry delay after a quota error"""
+        delay = retry_delay(attempt, error)
+        with self._cond:
+            self._counters["quota_errors"] += 1
+            self._counters["retries"] += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        LLM_RETRIES.inc()
+        logger.warning(f"⏳ Model quota error, retry {attempt + 1}/{self.max_retries} in {delay:.1f}s: {error}")
+
+    def run(self, call: Callable[[], Any], tokens: int, usage: Callable[[Any], Optional[int]] = lambda result: None,
+            key: Optional[str] = None):
+        """Run call() once admitted, retrying quota errors; returns (result, shared)
+
+        Callers passing the same key while a run is in flight wait for it and
+        get its result with shared=True instead of calling the model again.
+        """
+        if key is None:
+            return self._run(call, tokens, usage), False
+
+        with self._cond:
+            shared = self._pending.get(key)
+            if shared is None:
+                self._pending[key] = future = Future()
+            else:
+                self._counters["coalesced"] += 1
+        if shared is not None:
+            return shared.result(), True
+
+        try:
+            result = self._run(call, tokens, usage)
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._cond:
+                del self._pending[key]
+
+    def _run(self, call, tokens, usage):
+        attempt = 0
+        while True:
+            entry = self.acquire(tokens)
+            try:
+                result = call()
+            except Exception as e:
+                self.release(entry)
+                if not is_quota_error(e) or attempt >= self.max_retries:
+                    raise
+                self._backoff(attempt, e)
+                attempt += 1
+                continue
+            self.release(entry, usage(result))
+            return result
+
+    def stream(self, open_stream: Callable[[], Iterator[Any]], tokens: int,
+               key: Optional[str] = None) -> Iterator[Tuple[Any, bool]]:
+        """Admit a streaming call, yielding (chunk, shared); quota errors are retried until the first chunk
+
+        Callers passing the same key while a stream is in flight follow it,
+        receiving its chunks as they arrive with shared=True.
+        """
+        if key is None:
+            for chunk in self._stream(open_stream, tokens):
+                yield chunk, False
+            return
+
+        with self._cond:
+            shared = self._pending_streams.get(key)
+            if shared is None:
+                self._pending_streams[key] = own = _SharedStream()
+            else:
+                self._counters["coalesced"] += 1
+        if shared is not None:
+            for chunk in shared:
+                yield chunk, True
+            return
+
+        try:
+            for chunk in self._stream(open_stream, tokens):
+                own.append(chunk)
+                yield chunk, False
+            own.finish()
+        except Exception as e:
+            own.finish(e)
+            raise
+        except BaseException:
+            # Our consumer went away (GeneratorExit) before the stream finished
+            own.finish(RuntimeError("The identical in-flight model call this request shared was cancelled"))
+            raise
+        finally:
+            with self._cond:
+                del self._pending_streams[key]
+
+    def _stream(self, open_stream, tokens):
+        attempt = 0
+        while True:
+            entry = self.acquire(tokens)
+            received = False
+            completion_chars = 0
+            try:
+                for chunk in open_stream():
+                    received = True
+                    completion_chars += len(getattr(chunk, "text", "") or "")
+                    yield chunk
+                return
+            except Exception as e:
+                if received or not is_quota_error(e) or attempt >= self.max_retries:
+                    raise
+                self._backoff(attempt, e)
+                attempt += 1
+            finally:
+                # Streams report no usage; count the text that came back at 4 characters per token
+                self.release(entry, tokens + completion_chars // 4)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            now = time.monotonic()
+            window = [entry for entry in self._window if now - entry[0] < WINDOW_SECONDS]
+            return {
+                "rpm_limit": self.rpm or None,
+                "tpm_limit": self.tpm or None,
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self._in_flight,
+                "queued": len(self._waiting),
+                "requests_last_minute": len(window),
+                "tokens_last_minute": sum(entry[1] for entry in window),
+                "paused_seconds": round(max(0.0, self._paused_until - now), 2),
+                **self._counters
+            }
+
+llm_scheduler = LLMScheduler()
+
+def _prompt_tokens(messages: List[BaseMessage]) -> int:
+    # Same 4 characters per token estimate as the rest of the app
+    return sum(len(str(message.content)) for message in messages) // 4
+
+def _total_tokens(result: ChatResult) -> Optional[int]:
+    usage = (result.llm_output or {}).get("token_usage") or {}
+    return usage.get("total_tokens") or None
+
+def _request_key(llm: BaseChatModel, messages: List[BaseMessage], stop, kwargs) -> str:
+    payload = [llm._llm_type, llm._identifying_params, [(m.type, m.content) for m in messages], stop, kwargs]
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+class ScheduledChatModel(BaseChatModel):
+    """Wraps the backend chat model so every call, streamed or not, goes through an LLMScheduler"""
+
+    llm: BaseChatModel
+    # None means the process-wide llm_scheduler (a plain default would be deep-copied, locks and all)
+    scheduler: Any = None
+    coalesce: bool = LLM_COALESCE
+
+    @property
+    def _scheduler(self) -> "LLMScheduler":
+        return self.scheduler if self.scheduler is not None else llm_scheduler
+
+    @property
+    def _llm_type(self) -> str:
+        return self.llm._llm_type
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return self.llm._identifying_params
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        def call():
+            return self.llm._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+        key = _request_key(self.llm, messages, stop, kwargs) if self.coalesce else None
+        result, shared = self._scheduler.run(call, _prompt_tokens(messages), _total_tokens, key=key)
+        if shared:
+            # Flagged so token metrics are not counted twice for one provider call
+            return ChatResult(generations=result.generations, llm_output={**(result.llm_output or {}), "coalesced": True})
+        return result
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        key = _request_key(self.llm, messages, stop, {**kwargs, "stream": True}) if self.coalesce else None
+        for chunk, shared in self._scheduler.stream(
+            lambda: self.llm._stream(messages, stop=stop, run_manager=run_manager, **kwargs),
+            _prompt_tokens(messages), key=key
+        ):
+            if shared:
+                chunk = ChatGenerationChunk(
+                    message=chunk.message, generation_info={**(chunk.generation_info or {}), "coalesced": True}
+                )
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+class ScheduledLLM(BaseLLM):
+    """The scheduled chat model as a crewai LLM, for agents
+
+    crewai only accepts its own BaseLLM as Agent.llm, so crews call the model
+    through this adapter: each call is a ScheduledChatModel.invoke, admitted,
+    prioritised, retried and metered like every other model call. Give each
+    agent its own adapter, since crewai sums token usage per LLM instance.
+    """
+
+    llm_type: str = "scheduled"
+    chat_model: ScheduledChatModel
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, from_task=None,
+             from_agent=None, response_model=None, **kwargs) -> str:
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        response = self.chat_model.invoke(
+            convert_to_messages([(message["role"], message["content"]) for message in messages]),
+            stop=self.stop_sequences or None
+        )
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            self._track_token_usage_internal(dict(usage))
+        return self._apply_stop_words(str(response.content))
+
+    # The scheduler already retries quota errors, pausing every caller; skip crewai's own per-call retry loop
+    call._crewai_rate_limit_wrapped = True
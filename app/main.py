@@ -1,41 +1,166 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request, Query
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from fastapi.concurrency import run_in_threadpool
+from starlette.routing import Match
+from typing import List, Optional
 import os
+import json
 import uuid
+import asyncio
 import logging
+import time
 import traceback
 from datetime import datetime
 
-from crewai import Crew, Process
-from app.agents import financial_analyst
-from app.tasks import analyze_financial_document
-from app.tools import read_financial_document
+from app.agents import check_connectivity, warm_up, MODEL_NAME
+from app.tasks import PROMPT_VERSION
+from app.crew_pool import analysis_crews, kickoff, prewarm_pools, crew_pool_stats
+from app.tools import get_document_extraction, format_pages, prompt_pages, EXTRACTION_FORMAT
+from app.normalize import apply_token_budget, NORMALIZE_PAGES, PROMPT_TOKEN_BUDGET
+from app.cache import result_cache, extraction_cache, make_result_key
+from app.uploads import save_upload, UPLOAD_DIR, MAX_UPLOAD_BYTES
+from app.executors import (
+    analysis_slots, admission_error, quota_exhausted_error, run_in_llm_pool, get_parse_pool, shutdown_pools,
+    pool_stats, llm_pool
+)
+from app.mapreduce import run_map_reduce, estimate_tokens, MAP_REDUCE_THRESHOLD_TOKENS
+from app.incremental import run_incremental
+from app.multi_query import run_multi_query, extract_answer, estimate_prompt_tokens, MAX_QUERIES_PER_PROMPT
+from app.streaming import stream_llm, sse_event, build_analysis_prompt, SectionSplitter, EventStreamResponse
+from app.retrieval import prefilter_pages, PREFILTER_TOP_K, PREFILTER_MIN_PAGES
+from app.batch import (
+    run_batch, expand_zip, dedupe_documents, remove_files,
+    BATCH_CONCURRENCY, BATCH_MAX_DOCUMENTS, BATCH_MAX_QUERIES, MAX_BATCH_UPLOAD_BYTES, MAX_BATCH_INFLATE_BYTES
+)
+from app.worker import analyze_document_task, get_task_status, get_queue_stats, load_results, finished_tasks
+from app.database import connect_to_mongo, close_mongo_connection, MONGO_ENABLED
+from app.persistence import (
+    start_writers, stop_writers, persistence_stats, record_document, record_analysis
+)
+from app.metric_store import metric_store, SCREEN_MAX_RESULTS
+from app.pipeline import (
+    Stage, analysis_pipeline, pipeline_busy_error, PIPELINE_INGEST_WORKERS, PIPELINE_EXTRACT_WORKERS,
+    PIPELINE_PREPARE_WORKERS, PIPELINE_LLM_CONCURRENCY, PIPELINE_PERSIST_WORKERS
+)
+from app.financial_metrics import extract_metrics
+from app.llm_scheduler import llm_scheduler, set_llm_priority, is_quota_error
+from app.quotas import (
+    request_user, check_daily_quota, usage_accountant, queue_admission,
+    USER_ID_PATTERN, USER_DAILY_REQUESTS, USER_DAILY_PAGES, USER_DAILY_TOKENS
+)
+from app.metrics import span, observe_stage, start_timings, start_llm_usage, render_metrics, REQUEST_SECONDS, REQUESTS_IN_FLIGHT
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+ANALYSIS_MODES = ("auto", "single", "map_reduce", "incremental")
+
 app = FastAPI(
     title="Financial Document Analyzer",
     description="AI-powered financial document analysis using CrewAI and Gemini",
     version="1.0.0"
 )
 
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """Refuse oversized uploads from Content-Length before the body is read"""
+    content_length = request.headers.get("content-length")
+    limit = MAX_BATCH_UPLOAD_BYTES if request.url.path == "/analyze/batch" else MAX_UPLOAD_BYTES
+    # Allow some headroom for multipart boundaries and form fields
+    if content_length and content_length.isdigit() and int(content_length) > limit + 64 * 1024:
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"Request body exceeds the {limit} byte upload limit"}
+        )
+    return await call_next(request)
+
+def route_label(request: Request) -> str:
+    """The matched route template, so metric labels stay bounded (/documents/{document_id}, not every id)"""
+    for route in app.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "other"
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Per-route latency histogram and in-flight gauge; streamed responses are timed to their headers"""
+    route = route_label(request)
+    started = time.perf_counter()
+    status = 500
+    REQUESTS_IN_FLIGHT.labels(route).inc()
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        REQUESTS_IN_FLIGHT.labels(route).dec()
+        REQUEST_SECONDS.labels(route, request.method, str(status)).observe(time.perf_counter() - started)
+
+# Build the LLM client and agents in the background instead of at import time
+LLM_WARMUP = os.getenv("LLM_WARMUP", "true").lower() in ("1", "true", "yes")
+
+@app.on_event("startup")
+async def start_llm_warmup():
+    if LLM_WARMUP:
+        warm_up(background=True)
+        llm_pool.submit(prewarm_pools)
+
+@app.on_event("startup")
+async def start_persistence():
+    if MONGO_ENABLED:
+        await connect_to_mongo()
+    start_writers(mongo=MONGO_ENABLED)
+
+@app.on_event("startup")
+async def load_metric_store():
+    await run_in_threadpool(metric_store.open)
+
+@app.on_event("shutdown")
+async def save_metric_store():
+    await run_in_threadpool(metric_store.close)
+
+@app.on_event("startup")
+async def start_usage_accounting():
+    usage_accountant.start()
+
+@app.on_event("shutdown")
+async def stop_usage_accounting():
+    await run_in_threadpool(usage_accountant.stop)
+
+@app.on_event("startup")
+async def start_pipeline():
+    analysis_pipeline.start([
+        Stage("ingest", pipeline_ingest, PIPELINE_INGEST_WORKERS),
+        Stage("extract", pipeline_extract, PIPELINE_EXTRACT_WORKERS),
+        Stage("prepare", pipeline_prepare, PIPELINE_PREPARE_WORKERS),
+        Stage("llm", pipeline_llm, PIPELINE_LLM_CONCURRENCY),
+        Stage("persist", pipeline_persist, PIPELINE_PERSIST_WORKERS)
+    ])
+
+@app.on_event("shutdown")
+async def stop_pipeline():
+    # Before the pools go away: stages may still be waiting on them
+    await analysis_pipeline.stop()
+
+@app.on_event("shutdown")
+async def shutdown_executors():
+    shutdown_pools()
+
+@app.on_event("shutdown")
+async def stop_persistence():
+    await stop_writers()
+    await close_mongo_connection()
+
 def run_crew(query: str, document_text: str):
     """Run the CrewAI agent with document text"""
     
     logger.info(f"Starting analysis with query: {query[:50]}...")
     
     try:
-        # Create crew with single agent
-        financial_crew = Crew(
-            agents=[financial_analyst],
-            tasks=[analyze_financial_document],
-            process=Process.sequential,
-            verbose=True
-        )
-        
-        # Run analysis with document text and query
-        result = financial_crew.kickoff({
+        # Borrow a pre-built, request-isolated crew
+        result, usage = kickoff(analysis_crews, {
             'query': query,
             'document_text': document_text
         })
@@ -58,120 +183,978 @@ async def root():
         "endpoints": {
             "docs": "/docs",
             "health": "/health",
-            "analyze": "/analyze (POST)"
+            "analyze": "/analyze (POST)",
+            "stream": "/analyze/stream (POST, text/event-stream)",
+            "batch": "/analyze/batch (POST)",
+            "pipeline": "/analyze/pipeline (POST)",
+            "pipeline_stats": "/pipeline/stats",
+            "documents": "/documents (POST)",
+            "queue": "/analyze/queue (POST)",
+            "queue_status": "/queue/status/{task_id}",
+            "queue_stats": "/queue/stats",
+            "results": "/results",
+            "cache_stats": "/cache/stats",
+            "usage": "/users/{user_id}/usage",
+            "screen": "/screen?expression=...",
+            "document_metrics": "/documents/{document_id}/metrics",
+            "metrics": "/metrics"
         }
     }
 
 @app.get("/health")
-async def health():
-    """Health check endpoint"""
+async def health(check_llm: bool = True):
+    """Health check endpoint (the model connectivity check is cached for CONNECTIVITY_CHECK_TTL seconds)"""
     return {
         "status": "healthy",
+        "llm": await run_in_threadpool(check_connectivity) if check_llm else None,
         "timestamp": datetime.now().isoformat(),
         "api_key_configured": os.getenv("GOOGLE_API_KEY") is not None,
-        "server_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        "server_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "pools": pool_stats(),
+        "crews": crew_pool_stats(),
+        "llm_scheduler": llm_scheduler.stats(),
+        "persistence": persistence_stats(),
+        "metric_store": metric_store.stats(),
+        "usage": usage_accountant.stats(),
+        "queue_admission": queue_admission.stats(),
+        "pipeline": analysis_pipeline.stats()
     }
 
-@app.post("/analyze")
-async def analyze_document(
-    file: UploadFile = File(...),
-    query: str = Form("Analyze this financial document for investment insights")
-):
-    """Upload and analyze a financial document"""
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint (stage latencies, LLM calls and tokens, caches, pools)"""
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
+async def ingest_upload(file: UploadFile) -> dict:
+    """Stream an upload to disk, hash it and make sure its extraction is cached"""
     
     # Create unique file ID
     file_id = str(uuid.uuid4())
     file_extension = os.path.splitext(file.filename)[1]
-    file_path = f"data/{file_id}{file_extension}"
+    file_path = os.path.join(UPLOAD_DIR, f"{file_id}{file_extension}")
     
     try:
         # Create data directory if it doesn't exist
-        os.makedirs("data", exist_ok=True)
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
         
-        # Save uploaded file
         logger.info(f"📤 Uploading file: {file.filename}")
-        content = await file.read()
-        file_size = len(content)
+        upload = await save_upload(file, file_path)
+        document_id = upload["document_id"]
+        logger.info(f"✅ File saved: {file_path} ({upload['bytes']} bytes)")
         
-        with open(file_path, "wb") as f:
-            f.write(content)
+        extraction = await run_in_threadpool(extraction_cache.get, document_id)
+        if extraction is None:
+            # Read and extract text from document on the parsing process pool
+            logger.info("📄 Extracting text from document...")
+            try:
+                extraction = await run_in_threadpool(
+                    get_document_extraction, document_id, file_path, file.filename, executor=get_parse_pool()
+                )
+            except Exception as e:
+                raise HTTPException(status_code=422, detail=f"Error reading PDF: {str(e)}")
         
-        logger.info(f"✅ File saved: {file_path} ({file_size} bytes)")
+        await run_in_threadpool(metric_store.index, extraction)
+        record_document(extraction, upload["bytes"])
+        return {**extraction, "file_size": upload["bytes"], "upload": upload}
+    
+    finally:
+        # Clean up uploaded file
+        if os.path.exists(file_path):
+            try:
+                os.remove(file_path)
+                logger.info(f"🧹 Cleaned up: {file_path}")
+            except Exception as e:
+                logger.warning(f"⚠️ Cleanup failed: {e}")
+
+@app.post("/documents")
+async def ingest_document(request: Request, file: UploadFile = File(...)):
+    """Upload and extract a document once so it can be analyzed later by document_id"""
+    user = request_user(request)
+    await run_in_threadpool(check_daily_quota, user)
+    if not analysis_slots.try_acquire(user):
+        raise admission_error(analysis_slots, user)
+    try:
+        extraction = await ingest_upload(file)
+    finally:
+        analysis_slots.release(user)
+        usage_accountant.record(user, requests=1)
+    return {
+        "document_id": extraction["document_id"],
+        "filename": extraction["filename"],
+        "file_size": extraction["file_size"],
+        "page_count": extraction["page_count"],
+        "timings": extraction["timings"],
+        "normalization": extraction.get("normalization"),
+        "upload": extraction["upload"]
+    }
+
+@app.get("/documents/{document_id}")
+async def get_document(document_id: str):
+    """Metadata for a previously ingested document"""
+    extraction = await run_in_threadpool(get_document_extraction, document_id)
+    if extraction is None:
+        raise HTTPException(status_code=404, detail=f"Unknown document_id: {document_id}")
+    return {
+        "document_id": document_id,
+        "filename": extraction["filename"],
+        "page_count": extraction["page_count"],
+        "timings": extraction["timings"],
+        "normalization": extraction.get("normalization"),
+        "extracted_at": extraction["extracted_at"]
+    }
+
+@app.get("/documents/{document_id}/metrics")
+async def get_document_metrics(document_id: str):
+    """Financial metrics read from the document's statement tables, per fiscal year, with source pages"""
+    extraction = await run_in_threadpool(get_document_extraction, document_id)
+    if extraction is None:
+        raise HTTPException(status_code=404, detail=f"Unknown document_id: {document_id}")
+    metrics = await run_in_threadpool(extract_metrics, extraction["pages"])
+    return {
+        "document_id": document_id,
+        "filename": extraction["filename"],
+        "periods": metrics["periods"],
+        "sources": metrics["sources"]
+    }
+
+@app.get("/screen")
+async def screen_documents(expression: str, period: str = "latest", limit: int = 100):
+    """Filter every indexed document by metric conditions, e.g. "net margin > 15% and debt/equity < 1"
+
+    Runs on the columnar metric store only (no model call). `period` is
+    "latest", "all" or a fiscal year.
+    """
+    try:
+        return metric_store.screen(expression, period=period, limit=max(1, min(limit, SCREEN_MAX_RESULTS)))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def result_cache_key(document_id: str, query, mode: str, prefilter: bool, top_k: int,
+                     base_document_id: Optional[str] = None) -> str:
+    # "auto" resolves deterministically per document, so it can be cached as-is. The
+    # prompt text also depends on page normalization and the token budget, and an
+    # incremental report (with its page diff) on the version it is compared against.
+    variant = (
+        f"{PROMPT_VERSION}/{mode}/prefilter={top_k if prefilter else 'off'}"
+        f"/normalize={EXTRACTION_FORMAT if NORMALIZE_PAGES else 'off'}/budget={PROMPT_TOKEN_BUDGET}"
+    )
+    if base_document_id:
+        variant += f"/base={base_document_id}"
+    if isinstance(query, list):
+        # Multi-query reports are keyed on the ordered query list
+        query = "\n".join(query)
+        variant += "/multi"
+    return make_result_key(document_id, query, MODEL_NAME, variant)
+
+async def run_analysis(extraction: dict, query: str, mode: str = "auto",
+                       prefilter: bool = True, top_k: int = PREFILTER_TOP_K,
+                       base_extraction: Optional[dict] = None) -> dict:
+    """Pre-filter, pick single-pass or map-reduce and run the analysis for one extracted document"""
+    if mode == "incremental":
+        return await run_incremental_analysis(extraction, query, base_extraction)
+    plan = await prepare_analysis(extraction, query, mode, prefilter, top_k)
+    return await run_prepared_analysis(extraction, query, plan)
+
+async def prepare_analysis(extraction: dict, query: str, mode: str = "auto",
+                           prefilter: bool = True, top_k: int = PREFILTER_TOP_K) -> dict:
+    """Everything before the model call: pre-filter, pick single-pass or map-reduce, apply the token budget"""
+    pages = prompt_pages(extraction)
+    prefilter_stats = None
+    if prefilter and extraction["page_count"] >= PREFILTER_MIN_PAGES:
+        with span("prefilter"):
+            pages, prefilter_stats = await run_in_threadpool(prefilter_pages, pages, query, top_k)
+    
+    document_text = format_pages(pages)
+    logger.info(f"✅ Text ready: {len(document_text)} characters from {extraction['page_count']} pages")
+    
+    if mode == "auto":
+        use_map_reduce = estimate_tokens(document_text) > MAP_REDUCE_THRESHOLD_TOKENS
+    else:
+        use_map_reduce = mode == "map_reduce"
+    
+    budget_stats = None
+    if not use_map_reduce:
+        pages, budget_stats = apply_token_budget(pages)
+        if budget_stats:
+            document_text = format_pages(pages)
+    return {
+        "map_reduce": use_map_reduce,
+        "pages": pages,
+        "document_text": document_text,
+        "prefilter": prefilter_stats,
+        "token_budget": budget_stats
+    }
+
+async def run_prepared_analysis(extraction: dict, query: str, plan: dict) -> dict:
+    """The model call(s) for a prepare_analysis() plan"""
+    map_reduce_stats = None
+    if plan["map_reduce"]:
+        logger.info("🤖 Running map-reduce AI analysis...")
+        with span("llm"):
+            outcome = await run_in_llm_pool(run_map_reduce, query, plan["pages"])
+        analysis = outcome["analysis"]
+        map_reduce_stats = outcome["stats"]
+    else:
+        logger.info("🤖 Running AI analysis...")
+        with span("llm"):
+            analysis = str(await run_in_llm_pool(run_crew, query, plan["document_text"]))
+    
+    return {
+        "status": "success",
+        "document_id": extraction["document_id"],
+        "filename": extraction["filename"],
+        "page_count": extraction["page_count"],
+        "analysis": analysis,
+        "mode": "map_reduce" if plan["map_reduce"] else "single",
+        "map_reduce": map_reduce_stats,
+        "prefilter": plan["prefilter"],
+        "normalization": extraction.get("normalization"),
+        "token_budget": plan["token_budget"],
+        "model": MODEL_NAME
+    }
+
+async def run_incremental_analysis(extraction: dict, query: str, base_extraction: Optional[dict] = None) -> dict:
+    """Analyze every page, sending only segments whose notes are not stored yet (no pre-filter:
+    the selected pages would change with each version and defeat reuse)"""
+    logger.info("🤖 Running incremental AI analysis...")
+    base_pages = prompt_pages(base_extraction) if base_extraction else None
+    with span("llm"):
+        outcome = await run_in_llm_pool(run_incremental, query, prompt_pages(extraction), base_pages)
+    return {
+        "status": "success",
+        "document_id": extraction["document_id"],
+        "filename": extraction["filename"],
+        "page_count": extraction["page_count"],
+        "analysis": outcome["analysis"],
+        "mode": "incremental",
+        "incremental": {
+            **outcome["stats"],
+            "base_document_id": base_extraction["document_id"] if base_extraction else None
+        },
+        "prefilter": None,
+        "normalization": extraction.get("normalization"),
+        "model": MODEL_NAME
+    }
+
+async def run_multi_query_analysis(extraction: dict, queries: List[str], mode: str = "auto",
+                                   prefilter: bool = True, top_k: int = PREFILTER_TOP_K) -> dict:
+    """Answer several queries with one single-pass prompt, falling back to one call per unanswered query"""
+    pages = prompt_pages(extraction)
+    prefilter_stats = None
+    if prefilter and extraction["page_count"] >= PREFILTER_MIN_PAGES:
+        with span("prefilter"):
+            pages, prefilter_stats = await run_in_threadpool(prefilter_pages, pages, " ".join(queries), top_k)
+    
+    document_text = format_pages(pages)
+    
+    # Documents that need map-reduce are answered per query
+    if mode == "auto":
+        combined = estimate_tokens(document_text) <= MAP_REDUCE_THRESHOLD_TOKENS
+    else:
+        combined = mode == "single"
+    budget_stats = None
+    if combined:
+        pages, budget_stats = apply_token_budget(pages)
+        if budget_stats:
+            document_text = format_pages(pages)
+    tokens = estimate_prompt_tokens(queries, document_text)
+    
+    analysis = None
+    answers = [None] * len(queries)
+    if combined:
+        logger.info(f"🤖 Answering {len(queries)} queries in one prompt...")
+        with span("llm"):
+            outcome = await run_in_llm_pool(run_multi_query, queries, document_text)
+        analysis = outcome["analysis"]
+        answers = outcome["answers"]
+    
+    missing = [i for i, answer in enumerate(answers) if answer is None]
+    if missing:
+        logger.info(f"🤖 Falling back to {len(missing)} individual analyses...")
+        individual = await asyncio.gather(*(
+            run_analysis(extraction, queries[i], mode, prefilter, top_k) for i in missing
+        ))
+        for i, result in zip(missing, individual):
+            answers[i] = extract_answer(result["analysis"])
+            await run_in_threadpool(
+                result_cache.set, result_cache_key(extraction["document_id"], queries[i], mode, prefilter, top_k), result
+            )
+    
+    if analysis is None:
+        analysis = "\n\n".join(f"ANSWER TO USER QUERY {n}\n{answer}" for n, answer in enumerate(answers, 1))
+    
+    individual_tokens = sum(tokens["individual_prompt_tokens"])
+    sent_tokens = (tokens["combined_prompt_tokens"] if combined else 0) + sum(
+        tokens["individual_prompt_tokens"][i] for i in missing
+    )
+    return {
+        "status": "success",
+        "document_id": extraction["document_id"],
+        "filename": extraction["filename"],
+        "page_count": extraction["page_count"],
+        "analysis": analysis,
+        "answers": [
+            {"query": query, "answer": answer, "source": "individual" if i in missing else "combined"}
+            for i, (query, answer) in enumerate(zip(queries, answers))
+        ],
+        "mode": "multi_query" if combined else "individual",
+        "multi_query": {
+            "queries": len(queries),
+            "combined": combined,
+            "parsed": len(queries) - len(missing) if combined else 0,
+            "fallback_calls": len(missing),
+            # Estimated input tokens (chars / 4)
+            "combined_prompt_tokens": tokens["combined_prompt_tokens"] if combined else None,
+            "individual_prompt_tokens": individual_tokens,
+            "input_tokens_saved": individual_tokens - sent_tokens
+        },
+        "prefilter": prefilter_stats,
+        "normalization": extraction.get("normalization"),
+        "token_budget": budget_stats,
+        "model": MODEL_NAME
+    }
+
+@app.post("/analyze")
+async def analyze_document(
+    request: Request,
+    file: Optional[UploadFile] = File(None),
+    document_id: Optional[str] = Form(None),
+    query: str = Form("Analyze this financial document for investment insights"),
+    queries: List[str] = Form([]),
+    use_cache: bool = Form(True),
+    mode: str = Form("auto"),
+    prefilter: bool = Form(True),
+    top_k: int = Form(PREFILTER_TOP_K),
+    base_document_id: Optional[str] = Form(None)
+):
+    """Upload and analyze a financial document, or analyze a previously ingested document_id
+
+    mode: "single" sends the whole document in one prompt, "map_reduce" analyzes
+    token-budgeted chunks in parallel and merges them, "auto" picks map_reduce
+    for documents above MAP_REDUCE_THRESHOLD_TOKENS. "incremental" reuses the
+    stored notes of page segments analyzed before (e.g. in an earlier version
+    of the same filing) and only sends changed pages to the model.
+    base_document_id: the previous version of this document; implies
+    "incremental" in auto mode and adds a page diff to the response.
+    prefilter: for documents of PREFILTER_MIN_PAGES or more, only the top_k
+    query-relevant pages plus financial statement pages are sent to the model.
+    queries: several questions (repeat the form field) answered together in one
+    prompt; the response carries one entry per query in "answers".
+    Requests are accounted to the X-User-Id header (daily limits, fair share
+    of the analysis slots).
+    """
+    
+    started = time.perf_counter()
+    timings = start_timings()
+    user = request_user(request)
+    
+    if file is None and not document_id:
+        raise HTTPException(status_code=400, detail="Provide either a file upload or a document_id")
+    if mode not in ANALYSIS_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(ANALYSIS_MODES)}")
+    queries = [q.strip() for q in queries if q.strip()]
+    if len(queries) > MAX_QUERIES_PER_PROMPT:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_QUERIES_PER_PROMPT} queries per request")
+    if len(queries) == 1:
+        query = queries[0]
+    multi = len(queries) > 1
+    if base_document_id and mode == "auto":
+        mode = "incremental"
+    
+    await run_in_threadpool(check_daily_quota, user)
+    # Backpressure: refuse work instead of queueing without bound behind the pools
+    if not analysis_slots.try_acquire(user):
+        raise admission_error(analysis_slots, user)
+    
+    llm_usage = start_llm_usage()
+    analyzed_pages = 0
+    try:
+        extraction = None
+        upload = None
+        if file is not None:
+            extraction = await ingest_upload(file)
+            document_id = extraction["document_id"]
+            upload = extraction["upload"]
         
-        # Read and extract text from document
-        logger.info("📄 Extracting text from document...")
-        document_text = read_financial_document(file_path)
-        logger.info(f"✅ Text extracted: {len(document_text)} characters")
+        cache_key = result_cache_key(
+            document_id, queries if multi else query, mode, prefilter, top_k, base_document_id
+        )
+        if use_cache:
+            cached = await run_in_threadpool(result_cache.get, cache_key)
+            if cached is not None:
+                logger.info(f"⚡ Cache hit for document {document_id[:12]}")
+                return {
+                    **cached,
+                    **({"queries": queries} if multi else {"query": query}),
+                    "cached": True,
+                    "upload": upload,
+                    "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+                    "processing_time": round(time.perf_counter() - started, 4),
+                    "timings": timings,
+                    "timestamp": datetime.now().isoformat()
+                }
         
-        # Run analysis
-        logger.info("🤖 Running AI analysis...")
-        response = run_crew(query, document_text)
+        if extraction is None:
+            extraction = await run_in_threadpool(get_document_extraction, document_id)
+            if extraction is None:
+                raise HTTPException(status_code=404, detail=f"Unknown document_id: {document_id}")
+        
+        base_extraction = None
+        if base_document_id:
+            base_extraction = await run_in_threadpool(get_document_extraction, base_document_id)
+            if base_extraction is None:
+                raise HTTPException(status_code=404, detail=f"Unknown base_document_id: {base_document_id}")
+        
+        analyzed_pages = extraction["page_count"]
+        if multi:
+            result = await run_multi_query_analysis(extraction, queries, mode, prefilter, top_k)
+        else:
+            result = await run_analysis(extraction, query, mode, prefilter, top_k, base_extraction)
+        with span("persist"):
+            await run_in_threadpool(result_cache.set, cache_key, result)
+        record_analysis(result, query, time.perf_counter() - started, timings)
         
         return {
-            "status": "success",
-            "filename": file.filename,
-            "file_size": file_size,
-            "query": query,
-            "analysis": str(response),
+            **result,
+            **({"queries": queries} if multi else {"query": query}),
+            "cached": False,
+            "upload": upload,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            "processing_time": round(time.perf_counter() - started, 4),
+            "timings": timings,
             "timestamp": datetime.now().isoformat()
         }
-        
+    
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ Error: {str(e)}")
+        if is_quota_error(e):
+            # Still over quota after the scheduler's retries
+            raise quota_exhausted_error(e)
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
     
     finally:
-        # Clean up uploaded file
-        if os.path.exists(file_path):
+        analysis_slots.release(user)
+        # Tokens spent on a failed analysis still count
+        usage_accountant.record(
+            user, requests=1, analyses=1 if analyzed_pages else 0, pages=analyzed_pages, llm_usage=llm_usage
+        )
+
+@app.post("/analyze/stream")
+async def analyze_stream(
+    request: Request,
+    file: Optional[UploadFile] = File(None),
+    document_id: Optional[str] = Form(None),
+    query: str = Form("Analyze this financial document for investment insights"),
+    use_cache: bool = Form(True),
+    prefilter: bool = Form(True),
+    top_k: int = Form(PREFILTER_TOP_K)
+):
+    """Analyze a document and stream progress and model output as Server-Sent Events
+
+    Events: "progress" (stage: accepted, extracted, prefiltered, prompt),
+    "section" when a report section title is generated, "token" for each
+    chunk of model text, then "done" with timings, or "error". The analysis
+    is a single pass (after pre-filtering) prompted straight through the
+    LLM's stream() rather than crew.kickoff, so text is forwarded as it is
+    generated.
+    """
+    
+    started = time.perf_counter()
+    timings = start_timings()
+    user = request_user(request)
+    
+    if file is None and not document_id:
+        raise HTTPException(status_code=400, detail="Provide either a file upload or a document_id")
+    await run_in_threadpool(check_daily_quota, user)
+    if not analysis_slots.try_acquire(user):
+        raise admission_error(analysis_slots, user)
+    llm_usage = start_llm_usage()
+    
+    file_path = None
+    upload = None
+    filename = file.filename if file is not None else None
+    analyzed_pages = 0
+    cleaned_up = False
+    
+    def cleanup():
+        # Runs once the response is over, whether or not the stream ever started
+        nonlocal cleaned_up
+        if cleaned_up:
+            return
+        cleaned_up = True
+        if file_path and os.path.exists(file_path):
             try:
                 os.remove(file_path)
-                logger.info(f"🧹 Cleaned up: {file_path}")
-            except Exception as e:
+            except OSError as e:
                 logger.warning(f"⚠️ Cleanup failed: {e}")
+        analysis_slots.release(user)
+        usage_accountant.record(
+            user, requests=1, analyses=1 if analyzed_pages else 0, pages=analyzed_pages, llm_usage=llm_usage
+        )
+    
+    try:
+        if file is not None:
+            # Spool the upload before the response starts; extraction is reported as progress
+            file_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}{os.path.splitext(file.filename)[1]}")
+            os.makedirs(UPLOAD_DIR, exist_ok=True)
+            upload = await save_upload(file, file_path)
+            document_id = upload["document_id"]
+    except BaseException:
+        cleanup()
+        raise
+    
+    def elapsed_ms():
+        return round((time.perf_counter() - started) * 1000, 2)
+    
+    async def events():
+        nonlocal analyzed_pages
+        first_token_ms = None
+        chunks = []
+        try:
+            yield sse_event("progress", {
+                "stage": "accepted", "document_id": document_id, "upload": upload, "elapsed_ms": elapsed_ms()
+            })
+            
+            cache_key = result_cache_key(document_id, query, "stream", prefilter, top_k)
+            cached = await run_in_threadpool(result_cache.get, cache_key) if use_cache else None
+            if cached is not None:
+                yield sse_event("token", {"text": cached["analysis"]})
+                yield sse_event("done", {
+                    **{k: v for k, v in cached.items() if k != "analysis"},
+                    "query": query, "cached": True, "first_token_ms": elapsed_ms(), "elapsed_ms": elapsed_ms()
+                })
+                return
+            
+            extraction = await run_in_threadpool(
+                get_document_extraction, document_id, file_path, filename, executor=get_parse_pool()
+            )
+            if extraction is None:
+                yield sse_event("error", {"status_code": 404, "detail": f"Unknown document_id: {document_id}"})
+                return
+            yield sse_event("progress", {
+                "stage": "extracted", "page_count": extraction["page_count"],
+                "timings": extraction["timings"], "elapsed_ms": elapsed_ms()
+            })
+            
+            analyzed_pages = extraction["page_count"]
+            pages = prompt_pages(extraction)
+            prefilter_stats = None
+            if prefilter and extraction["page_count"] >= PREFILTER_MIN_PAGES:
+                with span("prefilter"):
+                    pages, prefilter_stats = await run_in_threadpool(prefilter_pages, pages, query, top_k)
+                yield sse_event("progress", {"stage": "prefiltered", **prefilter_stats, "elapsed_ms": elapsed_ms()})
+            pages, budget_stats = apply_token_budget(pages)
+            
+            prompt = build_analysis_prompt(query, format_pages(pages))
+            yield sse_event("progress", {
+                "stage": "prompt", "prompt_tokens": estimate_tokens(prompt), "elapsed_ms": elapsed_ms()
+            })
+            
+            sections = SectionSplitter()
+            llm_started = time.perf_counter()
+            async for text in stream_llm(prompt):
+                if first_token_ms is None:
+                    first_token_ms = elapsed_ms()
+                chunks.append(text)
+                for name in sections.feed(text):
+                    yield sse_event("section", {"name": name})
+                yield sse_event("token", {"text": text})
+            # Not a span: the generator is suspended while the client reads each event
+            observe_stage("llm", time.perf_counter() - llm_started)
+            
+            result = {
+                "status": "success",
+                "document_id": document_id,
+                "filename": extraction["filename"],
+                "page_count": extraction["page_count"],
+                "analysis": "".join(chunks),
+                "mode": "stream",
+                "map_reduce": None,
+                "prefilter": prefilter_stats,
+                "normalization": extraction.get("normalization"),
+                "token_budget": budget_stats,
+                "model": MODEL_NAME
+            }
+            with span("persist"):
+                await run_in_threadpool(result_cache.set, cache_key, result)
+            record_analysis(result, query, time.perf_counter() - started, timings)
+            yield sse_event("done", {
+                **{k: v for k, v in result.items() if k != "analysis"},
+                "query": query,
+                "cached": False,
+                "chunks": len(chunks),
+                "characters": len(result["analysis"]),
+                "first_token_ms": first_token_ms,
+                "elapsed_ms": elapsed_ms(),
+                "processing_time": round(time.perf_counter() - started, 4),
+                "timings": timings
+            })
+        
+        except Exception as e:
+            logger.error(f"❌ Stream error: {str(e)}")
+            yield sse_event("error", {"status_code": 429 if is_quota_error(e) else 500, "detail": str(e)})
+    
+    return EventStreamResponse(events(), cleanup)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters for the analysis result and extraction caches"""
+    return {
+        "results": result_cache.stats(),
+        "extractions": extraction_cache.stats()
+    }
+
+@app.get("/users/{user_id}/usage")
+async def user_usage(user_id: str):
+    """Today's usage for a user against the daily limits, plus its work in flight"""
+    if not USER_ID_PATTERN.match(user_id):
+        raise HTTPException(status_code=400, detail="Invalid user id")
+    usage = await run_in_threadpool(usage_accountant.usage, user_id)
+    return {
+        "user_id": user_id,
+        "day": datetime.now().date().isoformat(),
+        "usage": usage,
+        # 0 = unlimited
+        "limits": {"requests": USER_DAILY_REQUESTS, "pages": USER_DAILY_PAGES, "tokens": USER_DAILY_TOKENS},
+        "analyses_in_flight": analysis_slots.held(user_id),
+        "queued_tasks": queue_admission.slots.held(user_id)
+    }
+
+@app.post("/analyze/batch")
+async def analyze_batch(
+    request: Request,
+    files: List[UploadFile] = File([]),
+    document_ids: List[str] = Form([]),
+    queries: List[str] = Form(...),
+    use_cache: bool = Form(True),
+    mode: str = Form("auto"),
+    prefilter: bool = Form(True),
+    top_k: int = Form(PREFILTER_TOP_K),
+    concurrency: int = Form(BATCH_CONCURRENCY)
+):
+    """Analyze many documents against many queries, streaming one NDJSON line per result
+
+    files: PDFs and/or zip archives of PDFs; document_ids: previously ingested
+    documents. Each document is extracted once and analyzed against every
+    query, with at most `concurrency` (capped at BATCH_CONCURRENCY) analyses
+    in flight. Lines are {"type": "batch"} first, then {"type": "item"} in
+    completion order (failed items carry "status": "error"), then
+    {"type": "summary"}.
+    """
+    queries = [q.strip() for q in queries if q.strip()]
+    if not queries:
+        raise HTTPException(status_code=400, detail="Provide at least one query")
+    if len(queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_QUERIES} queries per batch")
+    if not files and not document_ids:
+        raise HTTPException(status_code=400, detail="Provide files, a zip archive or document_ids")
+    if mode not in ANALYSIS_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(ANALYSIS_MODES)}")
+    concurrency = max(1, min(concurrency, BATCH_CONCURRENCY))
+    user = request_user(request)
+    await run_in_threadpool(check_daily_quota, user)
+    
+    # A whole batch holds one admission slot; its own cap bounds its share of the LLM pool
+    if not analysis_slots.try_acquire(user):
+        raise admission_error(analysis_slots, user)
+    
+    documents = [{"document_id": d, "filename": d, "path": None} for d in document_ids]
+    try:
+        # Uploads only live for the request, so spool them all to disk before streaming
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        for file in files:
+            extension = os.path.splitext(file.filename)[1].lower()
+            file_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}{extension}")
+            if extension == ".zip":
+                await save_upload(file, file_path, max_bytes=MAX_BATCH_UPLOAD_BYTES)
+                # The inflate budget covers everything the batch has already put on disk
+                spooled = sum(document.get("bytes") or 0 for document in documents)
+                try:
+                    documents.extend(await run_in_threadpool(
+                        expand_zip, file_path, UPLOAD_DIR, BATCH_MAX_DOCUMENTS - len(documents),
+                        MAX_BATCH_INFLATE_BYTES - spooled
+                    ))
+                finally:
+                    os.remove(file_path)
+            else:
+                if len(documents) >= BATCH_MAX_DOCUMENTS:
+                    raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_DOCUMENTS} documents")
+                upload = await save_upload(file, file_path)
+                documents.append({
+                    "document_id": upload["document_id"], "filename": file.filename,
+                    "path": file_path, "bytes": upload["bytes"]
+                })
+        documents, duplicates = dedupe_documents(documents)
+    except BaseException:
+        remove_files(documents)
+        analysis_slots.release(user)
+        raise
+    
+    async def analyze(extraction, query):
+        cache_key = result_cache_key(extraction["document_id"], query, mode, prefilter, top_k)
+        if use_cache:
+            cached = await run_in_threadpool(result_cache.get, cache_key)
+            if cached is not None:
+                return cached, True
+        # Each item runs in its own task, so its timings and priority are its own
+        started = time.perf_counter()
+        timings = start_timings()
+        set_llm_priority("batch")
+        llm_usage = start_llm_usage()
+        try:
+            result = await run_analysis(extraction, query, mode, prefilter, top_k)
+        finally:
+            usage_accountant.record(user, analyses=1, pages=extraction["page_count"], llm_usage=llm_usage)
+        with span("persist"):
+            await run_in_threadpool(result_cache.set, cache_key, result)
+        record_analysis(result, query, time.perf_counter() - started, timings)
+        return {**result, "timings": timings}, False
+    
+    async def stream():
+        try:
+            yield json.dumps({
+                "type": "batch",
+                "documents": [{"document_id": d["document_id"], "filename": d["filename"]} for d in documents],
+                "duplicates": [{"document_id": d["document_id"], "filename": d["filename"]} for d in duplicates],
+                "queries": queries,
+                "items": len(documents) * len(queries),
+                "mode": mode,
+                "concurrency": concurrency,
+                "timestamp": datetime.now().isoformat()
+            }) + "\n"
+            async for item in run_batch(documents, queries, analyze, concurrency):
+                yield json.dumps(item) + "\n"
+        finally:
+            remove_files(documents)
+            analysis_slots.release(user)
+            usage_accountant.record(user, requests=1)
+    
+    logger.info(f"📦 Batch of {len(documents)} documents × {len(queries)} queries (concurrency {concurrency})")
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+# In-process pipeline: ingest → extract → prepare → llm → persist, each stage
+# with its own workers and a bounded queue in front of it (see app/pipeline.py)
+async def pipeline_ingest(job: dict) -> bool:
+    """Stream the upload to disk, then answer from the result cache when possible"""
+    file = job.pop("file", None)
+    if file is not None:
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        job["path"] = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}{os.path.splitext(file.filename)[1]}")
+        upload = await save_upload(file, job["path"])
+        job.update({"document_id": upload["document_id"], "filename": file.filename, "upload": upload})
+    job["cache_key"] = result_cache_key(job["document_id"], job["query"], job["mode"], job["prefilter"], job["top_k"])
+    if job["use_cache"]:
+        cached = await run_in_threadpool(result_cache.get, job["cache_key"])
+        if cached is not None:
+            logger.info(f"⚡ Cache hit for document {job['document_id'][:12]}")
+            job.update({"result": cached, "cached": True})
+            return False
+    return True
+
+async def pipeline_extract(job: dict) -> bool:
+    """Parse the PDF on the process pool (or load its cached extraction) and delete the upload"""
+    try:
+        extraction = await run_in_threadpool(
+            get_document_extraction, job["document_id"], job.get("path"), job.get("filename"),
+            executor=get_parse_pool()
+        )
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Error reading PDF: {str(e)}")
+    finally:
+        remove_files([job])
+    if extraction is None:
+        raise HTTPException(status_code=404, detail=f"Unknown document_id: {job['document_id']}")
+    if job.get("upload"):
+        record_document(extraction, job["upload"]["bytes"])
+    job["extraction"] = extraction
+    return True
+
+async def pipeline_prepare(job: dict) -> bool:
+    """Pre-filter and budget the normalized pages (incremental runs take every page as is)"""
+    if job["mode"] != "incremental":
+        job["plan"] = await prepare_analysis(job["extraction"], job["query"], job["mode"], job["prefilter"], job["top_k"])
+    return True
+
+async def pipeline_llm(job: dict) -> bool:
+    """The model call; the caller gets its answer here, before persistence"""
+    if "plan" in job:
+        result = await run_prepared_analysis(job["extraction"], job["query"], job["plan"])
+    else:
+        result = await run_incremental_analysis(job["extraction"], job["query"])
+    job.update({"result": result, "cached": False})
+    return True
+
+async def pipeline_persist(job: dict) -> bool:
+    with span("persist"):
+        await run_in_threadpool(result_cache.set, job["cache_key"], job["result"])
+    record_analysis(job["result"], job["query"], time.perf_counter() - job["started"], job["timings"])
+    return True
+
+@app.post("/analyze/pipeline")
+async def analyze_pipelined(
+    request: Request,
+    file: Optional[UploadFile] = File(None),
+    document_id: Optional[str] = Form(None),
+    query: str = Form("Analyze this financial document for investment insights"),
+    use_cache: bool = Form(True),
+    mode: str = Form("auto"),
+    prefilter: bool = Form(True),
+    top_k: int = Form(PREFILTER_TOP_K)
+):
+    """Analyze a document through the staged in-process pipeline
+
+    Same inputs and response as /analyze (one query, no base_document_id),
+    but the request becomes a job that moves through ingest, extract,
+    prepare, llm and persist stages shared by all requests, so stages
+    overlap across documents and each has its own concurrency. When the
+    pipeline is full the request waits up to PIPELINE_SUBMIT_TIMEOUT seconds
+    for room, then gets 429. "pipeline_waits" gives the seconds the job
+    queued in front of each stage. Like /analyze, each job holds one of the
+    user's fair-share analysis slots, so one user cannot fill the queues.
+    """
+    started = time.perf_counter()
+    timings = start_timings()
+    user = request_user(request)
+    
+    if file is None and not document_id:
+        raise HTTPException(status_code=400, detail="Provide either a file upload or a document_id")
+    if mode not in ANALYSIS_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(ANALYSIS_MODES)}")
+    await run_in_threadpool(check_daily_quota, user)
+    if not analysis_slots.try_acquire(user):
+        raise admission_error(analysis_slots, user)
+    
+    llm_usage = start_llm_usage()
+    job = {
+        "file": file, "document_id": document_id, "filename": None, "query": query, "use_cache": use_cache,
+        "mode": mode, "prefilter": prefilter, "top_k": top_k, "started": started, "timings": timings
+    }
+    try:
+        result = await analysis_pipeline.run(job)
+    except asyncio.TimeoutError:
+        raise pipeline_busy_error(analysis_pipeline)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error: {str(e)}")
+        if is_quota_error(e):
+            raise quota_exhausted_error(e)
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        analysis_slots.release(user)
+        analyzed_pages = job["extraction"]["page_count"] if "extraction" in job else 0
+        usage_accountant.record(
+            user, requests=1, analyses=1 if analyzed_pages else 0, pages=analyzed_pages, llm_usage=llm_usage
+        )
+    
+    return {
+        **result,
+        "query": query,
+        "cached": job.get("cached", False),
+        "upload": job.get("upload"),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        "processing_time": round(time.perf_counter() - started, 4),
+        "timings": timings,
+        "pipeline_waits": job["waits"],
+        "timestamp": datetime.now().isoformat()
+    }
 
-# Simple bonus endpoints (optional)
+@app.get("/pipeline/stats")
+async def pipeline_stats():
+    """Queue depth, busy workers and throughput of each pipeline stage"""
+    return analysis_pipeline.stats()
+
+# Background queue (Celery)
 @app.post("/analyze/queue")
 async def analyze_with_queue(
+    request: Request,
     file: UploadFile = File(...),
     query: str = Form("Analyze this financial document")
 ):
-    """Queue document for background processing (bonus feature)"""
+    """Queue document for background processing; poll /queue/status/{task_id} for progress"""
+    
+    user = request_user(request)
+    await run_in_threadpool(check_daily_quota, user)
+    # Outstanding tasks are shared fairly too, so one user cannot fill the queue
+    if not await run_in_threadpool(queue_admission.try_acquire, user, finished_tasks):
+        raise admission_error(queue_admission.slots, user)
+    
+    # The worker deletes the file once it has been read
+    file_id = str(uuid.uuid4())
+    file_extension = os.path.splitext(file.filename)[1]
+    file_path = os.path.join(UPLOAD_DIR, f"{file_id}{file_extension}")
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    
+    try:
+        upload = await save_upload(file, file_path)
+        # Publishing talks to the broker (and runs the task inline in eager mode)
+        task = await run_in_threadpool(
+            analyze_document_task.apply_async,
+            args=[upload["document_id"], file_path, file.filename, query, user]
+        )
+    except HTTPException:
+        queue_admission.release(user)
+        raise
+    except Exception as e:
+        queue_admission.release(user)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        logger.error(f"❌ Could not queue task: {e}")
+        raise HTTPException(status_code=503, detail=f"Task queue unavailable: {e}")
+    
+    queue_admission.track(user, task.id)
+    usage_accountant.record(user, requests=1)
+    logger.info(f"📬 Queued {file.filename} as task {task.id}")
     return {
-        "message": "Queue feature - simplified version",
-        "status": "pending",
+        "task_id": task.id,
+        "status": "queued",
+        "document_id": upload["document_id"],
         "filename": file.filename,
         "query": query,
-        "note": "This is a placeholder. Full queue implementation would use Celery + Redis."
+        "status_url": f"/queue/status/{task.id}"
     }
 
 @app.get("/queue/status/{task_id}")
 async def get_queue_status(task_id: str):
     """Check status of a queued task"""
-    return {
-        "task_id": task_id,
-        "status": "pending",
-        "message": "Queue status endpoint"
-    }
+    try:
+        return await run_in_threadpool(get_task_status, task_id)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Result backend unavailable: {e}")
 
 @app.get("/queue/stats")
 async def queue_stats():
     """Get queue statistics"""
-    return {
-        "message": "Queue stats",
-        "active_workers": 0,
-        "queued_tasks": 0,
-        "note": "Full queue stats would show Celery worker information"
-    }
+    try:
+        return await run_in_threadpool(get_queue_stats)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Broker unavailable: {e}")
 
 @app.get("/results")
-async def list_results():
-    """List all analysis results"""
+async def list_results(limit: int = Query(50, ge=1, le=500), cursor: Optional[str] = None,
+                       document_id: Optional[str] = None):
+    """List saved analysis results, newest first (optionally only for one document)
+
+    Results from the API and from Celery tasks both go to the configured
+    result store (RESULT_STORE), so it is the one source for this listing
+    whether or not MongoDB is up. Pages are keyset ranges on (created_at, _id):
+    pass the previous page's next_cursor as `cursor` to get the next one.
+    """
+    try:
+        total, results, next_cursor = await run_in_threadpool(load_results, limit, cursor, document_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {
-        "message": "Results feature",
-        "total": 0,
-        "results": [],
-        "note": "Full results would show data from database"
+        "source": "result_store",
+        "total": total,
+        "limit": limit,
+        "cursor": cursor,
+        "next_cursor": next_cursor,
+        "results": results
     }
 
 if __name__ == "__main__":
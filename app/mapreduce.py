@@ -0,0 +1,157 @@
+import os
+import time
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from app.crew_pool import chunk_crews, reduce_crews, kickoff
+from app.tasks import ANALYSIS_TASK_DESCRIPTION, CHUNK_TASK_DESCRIPTION, REDUCE_TASK_DESCRIPTION
+from app.tools import format_pages
+
+logger = logging.getLogger(__name__)
+
+# Map-reduce configuration
+MAP_CHUNK_TOKENS = int(os.getenv("MAP_CHUNK_TOKENS", "6000"))
+MAP_CHUNK_OVERLAP_TOKENS = int(os.getenv("MAP_CHUNK_OVERLAP_TOKENS", "200"))
+MAP_FANOUT = int(os.getenv("MAP_FANOUT", "4"))
+# In "auto" mode, documents above this size are analyzed with map-reduce
+MAP_REDUCE_THRESHOLD_TOKENS = int(os.getenv("MAP_REDUCE_THRESHOLD_TOKENS", "24000"))
+
+# Rough heuristic for English prose; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def chunk_pages(pages: List[str], chunk_tokens: int = MAP_CHUNK_TOKENS,
+                overlap_tokens: int = MAP_CHUNK_OVERLAP_TOKENS) -> List[Dict[str, Any]]:
+    """Pack '[Page N]' sections into chunks of at most ~chunk_tokens tokens
+
+    Pages that are larger than a chunk are split. Each chunk after the first
+    starts with the last overlap_tokens of the previous one so figures that
+    straddle a boundary are seen in full at least once.
+    """
+    max_chars = max(chunk_tokens, 1) * CHARS_PER_TOKEN
+    overlap_chars = min(overlap_tokens, chunk_tokens // 2) * CHARS_PER_TOKEN
+    piece_chars = max_chars - overlap_chars
+
+    chunks = []
+    parts, size, page_nums = [], 0, []
+
+    def flush():
+        text = "\n\n".join(parts)
+        chunks.append({
+            "index": len(chunks) + 1,
+            "first_page": page_nums[0],
+            "last_page": page_nums[-1],
+            "text": text,
+            "tokens": estimate_tokens(text)
+        })
+
+    for page_num, content in enumerate(pages, 1):
+        if not content:
+            continue
+        section = f"[Page {page_num}]\n{content}"
+        for start in range(0, len(section), piece_chars):
+            piece = section[start:start + piece_chars]
+            if parts and size + len(piece) > max_chars:
+                flush()
+                tail = chunks[-1]["text"][-overlap_chars:] if overlap_chars else ""
+                parts = [tail] if tail else []
+                size = len(tail)
+                page_nums = [page_nums[-1]] if tail else []
+            parts.append(piece)
+            size += len(piece) + 2
+            if not page_nums or page_nums[-1] != page_num:
+                page_nums.append(page_num)
+
+    if parts:
+        flush()
+    return chunks
+
+def run_task(pool, inputs: Dict[str, str]):
+    """Kick off a pooled single-task crew; returns (output text, usage metrics or None)"""
+    result, usage = kickoff(pool, inputs)
+    return str(result), usage
+
+def reported_tokens(usage) -> int:
+    if isinstance(usage, dict):
+        return int(usage.get("total_tokens", 0) or 0)
+    return int(getattr(usage, "total_tokens", 0) or 0)
+
+def run_map_reduce(query: str, pages: List[str], chunk_tokens: int = MAP_CHUNK_TOKENS,
+                   overlap_tokens: int = MAP_CHUNK_OVERLAP_TOKENS, fanout: int = MAP_FANOUT) -> Dict[str, Any]:
+    """Analyze token-budgeted chunks concurrently, then reduce the notes into the standard report"""
+    started = time.perf_counter()
+    chunks = chunk_pages(pages, chunk_tokens, overlap_tokens)
+    if not chunks:
+        raise ValueError("No text could be extracted from the document. The file might be scanned or image-based.")
+
+    logger.info(f"🧩 Map-reduce over {len(chunks)} chunks (fan-out {fanout})")
+
+    def analyze_chunk(chunk):
+        # Each chunk borrows its own crew: crewai objects are not safe to share across threads
+        label = f"part {chunk['index']} of {len(chunks)}, pages {chunk['first_page']}-{chunk['last_page']}"
+        chunk_started = time.perf_counter()
+        notes, usage = run_task(chunk_crews, {"query": query, "chunk_text": chunk["text"], "chunk_label": label})
+        return {
+            "notes": notes,
+            "usage": usage,
+            "seconds": time.perf_counter() - chunk_started,
+            "prompt_tokens": estimate_tokens(CHUNK_TASK_DESCRIPTION) + chunk["tokens"] + estimate_tokens(query)
+        }
+
+    map_started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(fanout, len(chunks))), thread_name_prefix="map") as pool:
+        # Chunk calls keep the caller's LLM priority
+        futures = [pool.submit(contextvars.copy_context().run, analyze_chunk, chunk) for chunk in chunks]
+        mapped = [future.result() for future in futures]
+    map_seconds = time.perf_counter() - map_started
+
+    chunk_notes = "\n\n".join(
+        f"=== Part {chunk['index']} (pages {chunk['first_page']}-{chunk['last_page']}) ===\n{result['notes']}"
+        for chunk, result in zip(chunks, mapped)
+    )
+
+    reduce_started = time.perf_counter()
+    analysis, reduce_usage = run_task(
+        reduce_crews, {"query": query, "chunk_notes": chunk_notes, "chunk_count": str(len(chunks))}
+    )
+    reduce_seconds = time.perf_counter() - reduce_started
+
+    single_pass_tokens = (
+        estimate_tokens(ANALYSIS_TASK_DESCRIPTION)
+        + estimate_tokens(format_pages(pages))
+        + 2 * estimate_tokens(query)
+    )
+    map_tokens = sum(result["prompt_tokens"] for result in mapped)
+    reduce_tokens = estimate_tokens(REDUCE_TASK_DESCRIPTION) + estimate_tokens(chunk_notes) + 2 * estimate_tokens(query)
+    largest_prompt = max(max(result["prompt_tokens"] for result in mapped), reduce_tokens)
+    map_call_seconds = sum(result["seconds"] for result in mapped)
+
+    stats = {
+        "chunks": len(chunks),
+        "chunk_tokens": chunk_tokens,
+        "overlap_tokens": overlap_tokens,
+        "fanout": fanout,
+        # Estimated input tokens (chars / 4)
+        "single_pass_prompt_tokens": single_pass_tokens,
+        "map_prompt_tokens": map_tokens,
+        "reduce_prompt_tokens": reduce_tokens,
+        "largest_prompt_tokens": largest_prompt,
+        "largest_prompt_tokens_saved": single_pass_tokens - largest_prompt,
+        "total_input_tokens_delta": map_tokens + reduce_tokens - single_pass_tokens,
+        # Tokens reported by CrewAI, when available
+        "reported_tokens": sum(reported_tokens(r["usage"]) for r in mapped) + reported_tokens(reduce_usage),
+        "map_seconds": round(map_seconds, 3),
+        "map_call_seconds": round(map_call_seconds, 3),
+        "reduce_seconds": round(reduce_seconds, 3),
+        "wall_clock_saved_seconds": round(map_call_seconds - map_seconds, 3),
+        "total_seconds": round(time.perf_counter() - started, 3)
+    }
+    logger.info(
+        f"✅ Map-reduce done: {stats['chunks']} chunks, largest prompt {largest_prompt} tokens "
+        f"(single pass {single_pass_tokens}), {stats['wall_clock_saved_seconds']}s saved by fan-out"
+    )
+    return {"analysis": analysis, "stats": stats}
\ No newline at end of file
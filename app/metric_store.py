@@ -0,0 +1,351 @@
+import os
+import re
+import ast
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from app.cache import CACHE_DIR
+from app.financial_metrics import METRICS, extract_metrics
+
+logger = logging.getLogger(__name__)
+
+METRIC_STORE_PATH = os.getenv("METRIC_STORE_PATH", os.path.join(CACHE_DIR, "metric_store.npz"))
+SCREEN_MAX_RESULTS = int(os.getenv("SCREEN_MAX_RESULTS", "500"))
+# Newly indexed documents are written to disk within this many seconds (0 = only at shutdown)
+METRIC_STORE_FLUSH_INTERVAL = float(os.getenv("METRIC_STORE_FLUSH_INTERVAL", "10"))
+
+METRIC_COLUMNS = {name: i for i, name in enumerate(METRICS)}
+# Plain-language names accepted in screening expressions
+METRIC_ALIASES = {
+    **{name.replace("_", " "): name for name in METRICS},
+    "debt/equity": "debt_to_equity",
+    "debt to equity": "debt_to_equity",
+    "d/e": "debt_to_equity",
+    "roe": "return_on_equity",
+    "fcf": "free_cash_flow",
+    "capex": "capital_expenditure",
+    "sales": "revenue",
+    "net sales": "revenue",
+    "total revenue": "revenue",
+    "equity": "total_equity",
+    "debt": "total_debt",
+}
+ALIAS_PATTERN = re.compile(
+    r"(?<![\w/])(" + "|".join(re.escape(alias) for alias in sorted(METRIC_ALIASES, key=len, reverse=True)) + r")(?![\w/])",
+    re.IGNORECASE
+)
+PERCENT_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*%")
+MAGNITUDE_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(k|m|mn|b|bn)\b", re.IGNORECASE)
+MAGNITUDES = {"k": 1e3, "m": 1e6, "mn": 1e6, "b": 1e9, "bn": 1e9}
+SINGLE_EQUALS = re.compile(r"(?<![<>=!])=(?!=)")
+
+COMPARISONS = {
+    ast.Gt: np.greater, ast.GtE: np.greater_equal, ast.Lt: np.less,
+    ast.LtE: np.less_equal, ast.Eq: np.equal, ast.NotEq: np.not_equal,
+}
+ARITHMETIC = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.divide}
+
+def parse_screen(expression: str) -> ast.Expression:
+    """Parse 'net margin > 15% and debt/equity < 1' into a restricted expression tree
+
+    Metric names (or their aliases) are compared against numbers or each
+    other with and/or/not, parentheses and + - * /. "15%" means 0.15, "2b"
+    means 2e9. Anything else is rejected with ValueError.
+    """
+    text = ALIAS_PATTERN.sub(lambda m: METRIC_ALIASES[m.group(1).lower()], expression.strip())
+    text = PERCENT_PATTERN.sub(lambda m: repr(float(m.group(1)) / 100), text)
+    text = MAGNITUDE_PATTERN.sub(lambda m: repr(float(m.group(1)) * MAGNITUDES[m.group(2).lower()]), text)
+    text = SINGLE_EQUALS.sub("==", text)
+    text = re.sub(r"\b(AND|OR|NOT)\b", lambda m: m.group(1).lower(), text)
+    try:
+        tree = ast.parse(text, mode="eval")
+    except SyntaxError:
+        raise ValueError(f"Cannot parse screen expression: {expression}")
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id not in METRIC_COLUMNS:
+            raise ValueError(f"Unknown metric '{node.id}'; available: {', '.join(METRICS)}")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError(f"Unsupported value in screen expression: {node.value!r}")
+        if not isinstance(node, (
+            ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.Compare,
+            ast.BinOp, ast.Name, ast.Load, ast.Constant, *COMPARISONS, *ARITHMETIC
+        )):
+            raise ValueError(f"Unsupported syntax in screen expression: {type(node).__name__}")
+    return tree
+
+def screen_metrics(tree: ast.Expression) -> List[str]:
+    """Metric names an expression reads, in order of appearance"""
+    return list(dict.fromkeys(node.id for node in ast.walk(tree) if isinstance(node, ast.Name)))
+
+def _evaluate(node: ast.AST, values: np.ndarray):
+    """Vectorized evaluation over the metric columns; comparisons with a missing value are False"""
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body, values)
+    if isinstance(node, ast.Name):
+        return values[METRIC_COLUMNS[node.id]]
+    if isinstance(node, ast.Constant):
+        return float(node.value)
+    if isinstance(node, ast.BinOp):
+        return ARITHMETIC[type(node.op)](_evaluate(node.left, values), _evaluate(node.right, values))
+    if isinstance(node, ast.UnaryOp):
+        operand = _evaluate(node.operand, values)
+        return np.logical_not(_as_mask(operand)) if isinstance(node.op, ast.Not) else np.negative(operand)
+    if isinstance(node, ast.Compare):
+        mask = None
+        left = _evaluate(node.left, values)
+        for op, comparator in zip(node.ops, node.comparators):
+            right = _evaluate(comparator, values)
+            result = COMPARISONS[type(op)](left, right)
+            mask = result if mask is None else np.logical_and(mask, result)
+            left = right
+        return mask
+    if isinstance(node, ast.BoolOp):
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        masks = [_as_mask(_evaluate(value, values)) for value in node.values]
+        result = masks[0]
+        for mask in masks[1:]:
+            result = combine(result, mask)
+        return result
+    raise ValueError(f"Unsupported syntax in screen expression: {type(node).__name__}")
+
+def _as_mask(result) -> np.ndarray:
+    if not isinstance(result, np.ndarray) or result.dtype != np.bool_:
+        raise ValueError("Screen expression must be a comparison, e.g. 'net_margin > 15%'")
+    return result
+
+class MetricStore:
+    """Columnar store of per-document, per-fiscal-year metrics
+
+    One float64 array per metric (NaN where a document does not report it)
+    alongside document and year index arrays, so a screen over every
+    document is a handful of vectorized comparisons. Rows are appended with
+    amortized doubling; re-indexing a document overwrites its rows in place.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.path: Optional[str] = None
+        self._lock = threading.Lock()
+        self._documents: List[str] = []
+        self._filenames: List[str] = []
+        self._document_index: Dict[str, int] = {}
+        self._row_index: Dict[Tuple[int, int], int] = {}
+        self._rows = 0
+        self._document = np.zeros(capacity, dtype=np.int32)
+        self._year = np.zeros(capacity, dtype=np.int32)
+        self._values = np.full((len(METRICS), capacity), np.nan)
+        self._dirty = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _grow(self):
+        capacity = self._document.shape[0] * 2
+        self._document = np.resize(self._document, capacity)
+        self._year = np.resize(self._year, capacity)
+        values = np.full((len(METRICS), capacity), np.nan)
+        values[:, :self._rows] = self._values[:, :self._rows]
+        self._values = values
+
+    def __contains__(self, document_id: str) -> bool:
+        return document_id in self._document_index
+
+    def add(self, document_id: str, filename: str, periods: Dict[int, Dict[str, float]]):
+        """Store (or replace) a document's metrics, {year: {metric: value}}"""
+        with self._lock:
+            doc = self._document_index.get(document_id)
+            if doc is None:
+                doc = self._document_index[document_id] = len(self._documents)
+                self._documents.append(document_id)
+                self._filenames.append(filename or "")
+            for year, metrics in periods.items():
+                row = self._row_index.get((doc, year))
+                if row is None:
+                    if self._rows == self._document.shape[0]:
+                        self._grow()
+                    row = self._row_index[(doc, year)] = self._rows
+                    self._document[row] = doc
+                    self._year[row] = year
+                    self._rows += 1
+                self._values[:, row] = np.nan
+                for metric, value in metrics.items():
+                    self._values[METRIC_COLUMNS[metric], row] = value
+            self._dirty = True
+
+    def index(self, extraction: Dict[str, Any]) -> bool:
+        """Extract and store metrics for an extraction not indexed yet; returns True if it was added"""
+        if extraction["document_id"] in self:
+            return False
+        metrics = extract_metrics(extraction["pages"])
+        self.add(extraction["document_id"], extraction.get("filename"), metrics["periods"])
+        return True
+
+    def document_metrics(self, document_id: str) -> Dict[int, Dict[str, float]]:
+        with self._lock:
+            doc = self._document_index.get(document_id)
+            rows = [row for (d, _), row in self._row_index.items() if d == doc]
+            return {
+                int(self._year[row]): {
+                    metric: float(self._values[column, row])
+                    for metric, column in METRIC_COLUMNS.items() if not np.isnan(self._values[column, row])
+                }
+                for row in sorted(rows, key=lambda row: -self._year[row])
+            }
+
+    def screen(self, expression: str, period: str = "latest", limit: int = 100) -> Dict[str, Any]:
+        """Documents whose metrics satisfy `expression`
+
+        `period` is "latest" (each document's most recent fiscal year), "all",
+        or a year such as "2024".
+        """
+        tree = parse_screen(expression)
+        referenced = screen_metrics(tree)
+        started = time.perf_counter()
+        with self._lock:
+            rows = self._rows
+            values = self._values[:, :rows]
+            documents = self._document[:rows]
+            years = self._year[:rows]
+
+            if period == "latest":
+                order = np.lexsort((years, documents))
+                last = np.ones(rows, dtype=bool)
+                last[:-1] = documents[order][1:] != documents[order][:-1]
+                candidates = np.zeros(rows, dtype=bool)
+                candidates[order[last]] = True
+            elif period == "all":
+                candidates = np.ones(rows, dtype=bool)
+            elif period.isdigit():
+                candidates = years == int(period)
+            else:
+                raise ValueError(f"Invalid period '{period}': use 'latest', 'all' or a fiscal year")
+
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mask = np.logical_and(candidates, _as_mask(_evaluate(tree, values)))
+            matched = np.flatnonzero(mask)
+            matches = [
+                {
+                    "document_id": self._documents[documents[row]],
+                    "filename": self._filenames[documents[row]],
+                    "period": int(years[row]),
+                    "metrics": {metric: float(values[METRIC_COLUMNS[metric], row]) for metric in referenced},
+                }
+                for row in matched[:limit]
+            ]
+        return {
+            "expression": expression,
+            "period": period,
+            "metrics": referenced,
+            "count": int(matched.size),
+            "matches": matches,
+            "scanned_rows": int(candidates.sum()),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+
+    @staticmethod
+    def _read(path: str) -> List[Tuple[str, str, Dict[int, Dict[str, float]]]]:
+        """(document_id, filename, periods) for every document in a saved store; [] if there is none"""
+        if not os.path.exists(path):
+            return []
+        with np.load(path, allow_pickle=False) as data:
+            columns = [str(metric) for metric in data["metrics"]]
+            stored = data["values"]
+            periods: Dict[int, Dict[int, Dict[str, float]]] = {}
+            for row in range(stored.shape[1]):
+                periods.setdefault(int(data["document"][row]), {})[int(data["year"][row])] = {
+                    metric: float(stored[i, row])
+                    for i, metric in enumerate(columns)
+                    if metric in METRIC_COLUMNS and not np.isnan(stored[i, row])
+                }
+            return [
+                (str(document_id), str(filename), periods.get(doc, {}))
+                for doc, (document_id, filename) in enumerate(zip(data["documents"], data["filenames"]))
+            ]
+
+    def open(self, path: str = METRIC_STORE_PATH, flush_interval: float = METRIC_STORE_FLUSH_INTERVAL):
+        """Load the persisted store and keep saving back to `path`; processes that never open it stay in memory"""
+        self.path = path
+        try:
+            for document_id, filename, periods in self._read(path):
+                self.add(document_id, filename, periods)
+            self._dirty = False
+            if self._documents:
+                logger.info(f"📊 Loaded metrics for {len(self._documents)} documents from {path}")
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load metric store from {path}, starting empty: {e}")
+        if flush_interval > 0 and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(flush_interval,), name="metric-store-flush", daemon=True)
+            self._thread.start()
+
+    def _run(self, flush_interval: float):
+        while not self._stop.wait(flush_interval):
+            try:
+                self.save()
+            except Exception as e:
+                logger.warning(f"⚠️ Could not save metric store to {self.path}: {e}")
+
+    def close(self):
+        """Stop the flush thread and save what is left"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.save()
+
+    def save(self):
+        """Write the store to `path` if anything was indexed since the last save
+
+        Several processes (uvicorn workers, Celery) share the file: under an
+        exclusive lock, documents saved by others are merged in first, then
+        the union is written to a temp file and swapped in with os.replace,
+        so readers never see a partial file and no process drops another's
+        documents.
+        """
+        if self.path is None or not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                on_disk = self._read(self.path)
+            except Exception as e:
+                logger.warning(f"⚠️ Unreadable metric store at {self.path}, overwriting it: {e}")
+                on_disk = []
+            for document_id, filename, periods in on_disk:
+                if document_id not in self:
+                    self.add(document_id, filename, periods)
+            with self._lock:
+                # Anything indexed after this snapshot marks the store dirty again
+                self._dirty = False
+                snapshot = {
+                    "metrics": np.array(METRICS),
+                    "documents": np.array(self._documents, dtype=str),
+                    "filenames": np.array(self._filenames, dtype=str),
+                    "document": self._document[:self._rows].copy(),
+                    "year": self._year[:self._rows].copy(),
+                    "values": self._values[:, :self._rows].copy(),
+                }
+            temp_path = f"{self.path}.{os.getpid()}.tmp.npz"
+            try:
+                np.savez(temp_path, **snapshot)
+                os.replace(temp_path, self.path)
+            except BaseException:
+                self._dirty = True
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+
+    def stats(self) -> Dict[str, Any]:
+        return {"documents": len(self._documents), "rows": self._rows, "metrics": len(METRICS)}
+
+metric_store = MetricStore()
@@ -0,0 +1,209 @@
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Seconds; spans range from sub-millisecond cache writes to multi-minute model calls
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+STAGE_SECONDS = Histogram(
+    "analyzer_stage_seconds", "Time spent in each pipeline stage", ["stage"], buckets=LATENCY_BUCKETS
+)
+STAGE_ERRORS = Counter("analyzer_stage_errors_total", "Pipeline stage failures", ["stage"])
+REQUEST_SECONDS = Histogram(
+    "analyzer_request_seconds", "HTTP request latency", ["route", "method", "status"], buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge("analyzer_requests_in_flight", "HTTP requests being handled", ["route"])
+PAGES_EXTRACTED = Counter("analyzer_pages_extracted_total", "PDF pages extracted")
+EXTRACT_PAGES_PER_SECOND = Histogram(
+    "analyzer_extract_pages_per_second", "Extraction throughput per document",
+    buckets=(10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+)
+LLM_CALL_SECONDS = Histogram(
+    "analyzer_llm_call_seconds", "Latency of individual model calls", ["outcome"], buckets=LATENCY_BUCKETS
+)
+LLM_TOKENS = Counter(
+    "analyzer_llm_tokens_total",
+    "Model tokens per call; source is 'reported' by the provider or 'estimated' at 4 characters per token",
+    ["kind", "source"]
+)
+LLM_QUEUE_WAIT = Histogram(
+    "analyzer_llm_queue_wait_seconds", "Time model calls waited in the LLM scheduler", ["priority"],
+    buckets=LATENCY_BUCKETS
+)
+LLM_RETRIES = Counter("analyzer_llm_retries_total", "Model calls retried after a quota error")
+CREWAI_TOKENS = Counter("analyzer_crewai_tokens_total", "Token usage reported by CrewAI usage_metrics", ["kind"])
+
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+def start_timings() -> Dict[str, float]:
+    """Start collecting span durations (seconds per stage) for the current request or task"""
+    timings: Dict[str, float] = {}
+    _timings.set(timings)
+    return timings
+
+_llm_usage: ContextVar[Optional[Dict[str, int]]] = ContextVar("llm_usage", default=None)
+_llm_usage_lock = threading.Lock()
+
+def start_llm_usage() -> Dict[str, int]:
+    """Start counting model tokens spent by the current request or task (map-reduce threads included)"""
+    usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    _llm_usage.set(usage)
+    return usage
+
+def _add_llm_usage(prompt_tokens: int, completion_tokens: int):
+    usage = _llm_usage.get()
+    if usage is not None:
+        # Fan-out threads share the request's dict
+        with _llm_usage_lock:
+            usage["calls"] += 1
+            usage["prompt_tokens"] += prompt_tokens
+            usage["completion_tokens"] += completion_tokens
+
+def observe_stage(stage: str, seconds: float):
+    """Record a stage duration in analyzer_stage_seconds and the current timings, if any"""
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    timings = _timings.get()
+    if timings is not None:
+        timings[stage] = round(timings.get(stage, 0.0) + seconds, 4)
+
+@contextmanager
+def span(stage: str):
+    """Time the enclosed block as one pipeline stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+def record_extraction(page_count: int, seconds: float):
+    PAGES_EXTRACTED.inc(page_count)
+    if seconds > 0 and page_count:
+        EXTRACT_PAGES_PER_SECOND.observe(page_count / seconds)
+
+def record_crewai_usage(usage: Optional[Dict[str, Any]]):
+    for kind in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        value = (usage or {}).get(kind) or 0
+        if value > 0:
+            CREWAI_TOKENS.labels(kind.replace("_tokens", "")).inc(value)
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """LangChain callback that times every model call and counts its tokens"""
+
+    def __init__(self):
+        self._calls: Dict[Any, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, prompt_chars: int):
+        with self._lock:
+            self._calls[run_id] = (time.perf_counter(), prompt_chars)
+
+    def _finish(self, run_id):
+        with self._lock:
+            return self._calls.pop(run_id, (None, 0))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, sum(len(prompt) for prompt in prompts))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, sum(len(str(message.content)) for batch in messages for message in batch))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started, prompt_chars = self._finish(run_id)
+        if started is not None:
+            LLM_CALL_SECONDS.labels("success").observe(time.perf_counter() - started)
+
+        generations = [g for batch in response.generations for g in batch]
+        if (response.llm_output or {}).get("coalesced") or any((g.generation_info or {}).get("coalesced") for g in generations):
+            # Shared the output of an identical call that was already counted
+            return
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if usage.get("prompt_tokens") or usage.get("completion_tokens"):
+            prompt_tokens, completion_tokens = usage.get("prompt_tokens") or 0, usage.get("completion_tokens") or 0
+            source = "reported"
+        else:
+            prompt_tokens = prompt_chars // 4
+            completion_tokens = sum(len(g.text) for g in generations) // 4
+            source = "estimated"
+        LLM_TOKENS.labels("prompt", source).inc(prompt_tokens)
+        LLM_TOKENS.labels("completion", source).inc(completion_tokens)
+        _add_llm_usage(prompt_tokens, completion_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        started, _ = self._finish(run_id)
+        if started is not None:
+            LLM_CALL_SECONDS.labels("error").observe(time.perf_counter() - started)
+
+llm_metrics_handler = LLMMetricsHandler()
+
+class RuntimeCollector:
+    """Exports the stats() counters of the caches, admission limiter, crew pools and pipeline at scrape time"""
+
+    def describe(self):
+        # Without this the registry calls collect() on register, before the app modules are importable
+        return []
+
+    def collect(self):
+        # Imported here so app.agents can import this module without a cycle
+        from app.cache import result_cache, extraction_cache
+        from app.executors import analysis_slots
+        from app.crew_pool import crew_pool_stats
+        from app.llm_scheduler import llm_scheduler
+        from app.pipeline import analysis_pipeline
+
+        lookups = CounterMetricFamily("analyzer_cache_lookups", "Cache lookups by outcome", labels=["cache", "outcome"])
+        hit_rate = GaugeMetricFamily("analyzer_cache_hit_ratio", "Cache hits / lookups since start", labels=["cache"])
+        entries = GaugeMetricFamily("analyzer_cache_memory_entries", "Entries in the in-memory tier", labels=["cache"])
+        for name, cache in (("results", result_cache), ("extractions", extraction_cache)):
+            stats = cache.stats()
+            for outcome in ("memory_hits", "disk_hits", "misses"):
+                lookups.add_metric([name, outcome], stats[outcome])
+            hit_rate.add_metric([name], stats["hit_rate"])
+            entries.add_metric([name], stats["memory_entries"])
+        yield from (lookups, hit_rate, entries)
+
+        slots = analysis_slots.stats()
+        yield GaugeMetricFamily("analyzer_analyses_in_flight", "Analyses holding an admission slot", value=slots["in_flight"])
+        yield GaugeMetricFamily("analyzer_analyses_limit", "Admission limit for concurrent analyses", value=slots["limit"])
+        yield CounterMetricFamily("analyzer_analyses_rejected", "Analyses refused with 429", value=slots["rejected"])
+
+        crews_in_use = GaugeMetricFamily("analyzer_crews_in_use", "Pooled crews running a kickoff", labels=["pool"])
+        crews_idle = GaugeMetricFamily("analyzer_crews_idle", "Pooled crews ready for use", labels=["pool"])
+        for pool, stats in crew_pool_stats().items():
+            crews_in_use.add_metric([pool], stats["in_use"])
+            crews_idle.add_metric([pool], stats["idle"])
+        yield from (crews_in_use, crews_idle)
+
+        scheduler = llm_scheduler.stats()
+        yield GaugeMetricFamily("analyzer_llm_queued", "Model calls waiting in the LLM scheduler", value=scheduler["queued"])
+        yield GaugeMetricFamily("analyzer_llm_in_flight", "Model calls admitted by the LLM scheduler", value=scheduler["in_flight"])
+        yield GaugeMetricFamily(
+            "analyzer_llm_tokens_last_minute", "Tokens counted against LLM_TPM", value=scheduler["tokens_last_minute"]
+        )
+        yield CounterMetricFamily("analyzer_llm_coalesced", "Model calls served by an identical in-flight call",
+                                  value=scheduler["coalesced"])
+
+        depth = GaugeMetricFamily("analyzer_pipeline_queue_depth", "Jobs queued in front of a pipeline stage", labels=["stage"])
+        busy = GaugeMetricFamily("analyzer_pipeline_busy_workers", "Pipeline stage workers on a job", labels=["stage"])
+        blocked = GaugeMetricFamily(
+            "analyzer_pipeline_blocked_workers", "Pipeline stage workers waiting for room in the next queue", labels=["stage"]
+        )
+        for stage, stats in analysis_pipeline.stats()["stages"].items():
+            depth.add_metric([stage], stats["queue_depth"])
+            busy.add_metric([stage], stats["busy"])
+            blocked.add_metric([stage], stats["blocked"])
+        yield from (depth, busy, blocked)
+
+REGISTRY.register(RuntimeCollector())
+
+def render_metrics():
+    """(body, content type) for a Prometheus scrape"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -1,12 +1,16 @@
 from datetime import datetime
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+from pydantic_core import core_schema
 from typing import Optional, List, Dict, Any
 from bson import ObjectId
 
 class PyObjectId(ObjectId):
     @classmethod
-    def __get_validators__(cls):
-        yield cls.validate
+    def __get_pydantic_core_schema__(cls, source_type, handler):
+        return core_schema.no_info_plain_validator_function(
+            cls.validate,
+            serialization=core_schema.plain_serializer_function_ser_schema(str, when_used="json")
+        )
 
     @classmethod
     def validate(cls, v):
@@ -15,57 +19,84 @@ class PyObjectId(ObjectId):
         return ObjectId(v)
 
     @classmethod
-    def __modify_schema__(cls, field_schema):
-        field_schema.update(type="string")
+    def __get_pydantic_json_schema__(cls, schema, handler):
+        return {"type": "string"}
 
 class DocumentModel(BaseModel):
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    document_id: Optional[str] = None  # SHA-256 of the file, unique
     filename: str
     file_size: int
+    page_count: Optional[int] = None
     upload_date: datetime = Field(default_factory=datetime.now)
     user_id: Optional[str] = None
     status: str = "pending"  # pending, processing, completed, failed
     queue_position: Optional[int] = None
-    
-    class Config:
-        json_encoders = {ObjectId: str}
-        schema_extra = {
+
+    model_config = ConfigDict(
+        populate_by_name=True,
+        json_schema_extra={
             "example": {
                 "filename": "annual_report.pdf",
                 "file_size": 1048576,
                 "status": "completed"
             }
         }
+    )
 
 class AnalysisResultModel(BaseModel):
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
     document_id: str
+    filename: Optional[str] = None
     query: str
-    verification_result: Dict[str, Any]
+    verification_result: Dict[str, Any] = Field(default_factory=dict)
     financial_analysis: str
     risk_assessment: Optional[str] = None
     investment_advice: Optional[str] = None
+    mode: Optional[str] = None  # single, map_reduce, multi_query, stream
     processing_time: float
+    timings: Optional[Dict[str, float]] = None  # seconds per pipeline stage (upload, extract, llm, ...)
     created_at: datetime = Field(default_factory=datetime.now)
     model_used: str = "gemini-2.5-flash"
-    
-    class Config:
-        json_encoders = {ObjectId: str}
-        schema_extra = {
+
+    model_config = ConfigDict(
+        populate_by_name=True,
+        protected_namespaces=(),  # allow the model_used field
+        json_schema_extra={
             "example": {
                 "document_id": "507f1f77bcf86cd799439011",
                 "query": "Analyze financial health",
                 "processing_time": 15.5
             }
         }
+    )
 
 class UserModel(BaseModel):
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
-    email: str
+    # Caller id from the X-User-Id header (see app/quotas.py)
+    user_id: str
+    email: Optional[str] = None
     name: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.now)
+    last_seen: Optional[datetime] = None
     total_analyses: int = 0
     api_calls: int = 0
-    
-    class Config:
-        json_encoders = {ObjectId: str}
\ No newline at end of file
+    pages_processed: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    model_config = ConfigDict(populate_by_name=True)
+
+class UserUsageModel(BaseModel):
+    """One user's counters for one day; the daily limits are checked against these"""
+    id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    user_id: str
+    day: str
+    requests: int = 0
+    analyses: int = 0
+    pages: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    updated_at: Optional[datetime] = None
+
+    model_config = ConfigDict(populate_by_name=True)
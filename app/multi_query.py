@@ -0,0 +1,91 @@
+import os
+import re
+import time
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.crew_pool import multi_query_crews, kickoff
+from app.tasks import ANALYSIS_TASK_DESCRIPTION, MULTI_QUERY_TASK_DESCRIPTION
+from app.mapreduce import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on queries answered by one prompt
+MAX_QUERIES_PER_PROMPT = int(os.getenv("MAX_QUERIES_PER_PROMPT", "10"))
+
+# Report section titles on a line of their own, tolerating markdown decoration ("## ", "**...**"),
+# a parenthesised restatement of the query, or answer text after a colon or dash
+SECTION_PATTERN = re.compile(
+    r"^[#*_ \t]*(EXECUTIVE SUMMARY|DOCUMENT VERIFICATION|KEY FINANCIAL METRICS|FINANCIAL HEALTH ASSESSMENT|"
+    r"ANSWER TO (?:THE )?USER QUERY(?:[ \t]*#?[ \t]*(\d+))?|RECOMMENDATIONS)\b[*_ \t]*"
+    r"(?:\([^\n]*\)[*_: \t]*|[:\-\u2013\u2014][*_ \t]*(.*))?$",
+    re.IGNORECASE | re.MULTILINE
+)
+
+def format_queries(queries: List[str]) -> str:
+    return "\n".join(f"    {number}. {query}" for number, query in enumerate(queries, 1))
+
+def format_answer_sections(queries: List[str]) -> str:
+    return "\n\n".join(
+        f"    ANSWER TO USER QUERY {number}\n    [Specific answer to: {query}]"
+        for number, query in enumerate(queries, 1)
+    )
+
+def split_answers(text: str) -> Dict[Optional[int], str]:
+    """Map query number (None for an unnumbered section) to the body of its ANSWER TO USER QUERY section"""
+    matches = list(SECTION_PATTERN.finditer(text))
+    answers = {}
+    for i, match in enumerate(matches):
+        if not match.group(1).upper().startswith("ANSWER"):
+            continue
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        # Text on the heading line itself ("ANSWER TO USER QUERY 1: Yes, ...") belongs to the answer
+        body = ((match.group(3) or "") + "\n" + text[match.end():end]).strip()
+        number = int(match.group(2)) if match.group(2) else None
+        if body and number not in answers:
+            answers[number] = body
+    return answers
+
+def parse_answers(text: str, count: int) -> List[Optional[str]]:
+    """Per-query answers from a multi-query report, None where a section is missing or empty"""
+    answers = split_answers(text)
+    return [answers.get(number) for number in range(1, count + 1)]
+
+def extract_answer(text: str) -> str:
+    """The ANSWER TO USER QUERY section of a single-query report, or the whole report"""
+    answers = split_answers(text)
+    return answers.get(None) or next(iter(answers.values()), None) or text.strip()
+
+def estimate_prompt_tokens(queries: List[str], document_text: str) -> Dict[str, Any]:
+    """Estimated input tokens for one combined prompt vs one prompt per query"""
+    document_tokens = estimate_tokens(document_text)
+    combined = (
+        estimate_tokens(MULTI_QUERY_TASK_DESCRIPTION)
+        + document_tokens
+        + estimate_tokens(format_queries(queries))
+        + estimate_tokens(format_answer_sections(queries))
+    )
+    per_query = [
+        estimate_tokens(ANALYSIS_TASK_DESCRIPTION) + document_tokens + 2 * estimate_tokens(query)
+        for query in queries
+    ]
+    return {"combined_prompt_tokens": combined, "individual_prompt_tokens": per_query}
+
+def run_multi_query(queries: List[str], document_text: str) -> Dict[str, Any]:
+    """Answer several queries about one document with a single pooled kickoff
+
+    Returns {"analysis", "answers", "usage", "seconds"}; "answers" holds
+    None for every query whose section could not be parsed from the report.
+    """
+    started = time.perf_counter()
+    result, usage = kickoff(multi_query_crews, {
+        "queries": format_queries(queries),
+        "answer_sections": format_answer_sections(queries),
+        "document_text": document_text
+    })
+    analysis = str(result)
+    answers = parse_answers(analysis, len(queries))
+    missing = sum(answer is None for answer in answers)
+    if missing:
+        logger.warning(f"⚠️ {missing} of {len(queries)} answers missing from the combined report")
+    return {"analysis": analysis, "answers": answers, "usage": usage, "seconds": time.perf_counter() - started}
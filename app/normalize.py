@@ -0,0 +1,156 @@
+import os
+import re
+import time
+import math
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+# Normalization settings
+NORMALIZE_PAGES = os.getenv("NORMALIZE_PAGES", "true").lower() in ("1", "true", "yes")
+# Lines this close to the top/bottom of a page that repeat on at least
+# HEADER_FOOTER_MIN_SHARE of the pages are running headers/footers
+HEADER_FOOTER_LINES = int(os.getenv("HEADER_FOOTER_LINES", "3"))
+HEADER_FOOTER_MIN_SHARE = float(os.getenv("HEADER_FOOTER_MIN_SHARE", "0.5"))
+# Only lines at least this long are deduplicated (short ones are labels, not paragraphs)
+DUPLICATE_MIN_CHARS = int(os.getenv("DUPLICATE_MIN_CHARS", "40"))
+# Upper bound on document tokens in a single-pass prompt; 0 disables it
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "0"))
+
+DIGITS = re.compile(r"\d+")
+PAGE_NUMBER_LINE = re.compile(r"^(?:page\s*)?#(?:\s*(?:of|/)\s*#)?$|^[-–]\s*#\s*[-–]$")
+NUMERIC_CELL = re.compile(r"^\(?[-–]?\$?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?%?\)?$|^[-–—]$")
+
+def _tokens(text: str) -> int:
+    # Same chars / 4 estimate as app.mapreduce.estimate_tokens (importing it here would be circular)
+    return (len(text) + 3) // 4
+
+def _signature(line: str) -> str:
+    """Compare lines case-insensitively with numbers masked, so 'Page 3 of 40' matches 'Page 4 of 40'"""
+    return DIGITS.sub("#", " ".join(line.lower().split()))
+
+def _compact_cell(cell: str) -> str:
+    """'$1,234' -> '1234', '(56)' -> '-56', '—' -> '-'"""
+    if cell in ("-", "–", "—"):
+        return "-"
+    negative = cell.startswith("(") and cell.endswith(")")
+    value = cell.strip("()$").replace(",", "").replace("$", "").replace("–", "-")
+    return f"-{value}" if negative and not value.startswith("-") else value
+
+def _table_row(line: str) -> Optional[Tuple[str, List[str]]]:
+    """(label, cells) when a line ends in two or more figures, else None"""
+    tokens = [token for token in line.split() if token != "$"]
+    cells = []
+    while tokens and NUMERIC_CELL.match(tokens[-1]):
+        cells.insert(0, tokens.pop())
+    if len(cells) < 2:
+        return None
+    return " ".join(tokens), cells
+
+def _serialize_tables(lines: List[str]) -> Tuple[List[str], int]:
+    """Rewrite runs of two or more table rows as 'label|v1|v2' with compact figures"""
+    rows = [_table_row(line) for line in lines]
+    output, serialized = [], 0
+    i = 0
+    while i < len(lines):
+        j = i
+        while j < len(lines) and rows[j] is not None:
+            j += 1
+        if j - i >= 2:
+            for label, cells in rows[i:j]:
+                output.append("|".join([label, *map(_compact_cell, cells)]))
+            serialized += j - i
+            i = j
+        else:
+            output.append(lines[i])
+            i += 1
+    return output, serialized
+
+def normalize_pages(pages: List[str]) -> Tuple[List[str], Dict[str, Any]]:
+    """Strip extraction boilerplate from per-page text before it goes into a prompt
+
+    - headers/footers: lines near the top or bottom of a page that repeat
+      (numbers masked) on HEADER_FOOTER_MIN_SHARE of the pages are kept on
+      the first page they appear on and removed elsewhere; bare page numbers
+      are removed everywhere
+    - duplicate paragraphs: repeated lines of DUPLICATE_MIN_CHARS or more
+      (boilerplate disclaimers, repeated risk language) are kept once
+    - tables: runs of rows ending in figures become 'label|2024|2023' lines
+      without currency signs or thousands separators
+
+    Page numbering is unchanged; pages left empty stay as "".
+    """
+    started = time.perf_counter()
+    page_lines = [[line.strip() for line in page.splitlines() if line.strip()] for page in pages]
+
+    edge_counts: Counter = Counter()
+    for lines in page_lines:
+        edges = lines[:HEADER_FOOTER_LINES] + lines[-HEADER_FOOTER_LINES:]
+        edge_counts.update({_signature(line) for line in edges})
+    threshold = max(3, math.ceil(HEADER_FOOTER_MIN_SHARE * len(pages)))
+    repeated = {signature for signature, count in edge_counts.items() if count >= threshold}
+
+    header_footer = duplicates = table_rows = 0
+    seen_edges, seen_lines = set(), set()
+    normalized = []
+    for lines in page_lines:
+        kept = []
+        for position, line in enumerate(lines):
+            signature = _signature(line)
+            at_edge = position < HEADER_FOOTER_LINES or position >= len(lines) - HEADER_FOOTER_LINES
+            if at_edge and (PAGE_NUMBER_LINE.match(signature) or (signature in repeated and signature in seen_edges)):
+                header_footer += 1
+                continue
+            if at_edge and signature in repeated:
+                seen_edges.add(signature)
+            if len(line) >= DUPLICATE_MIN_CHARS and _table_row(line) is None:
+                if signature in seen_lines:
+                    duplicates += 1
+                    continue
+                seen_lines.add(signature)
+            kept.append(line)
+        kept, serialized = _serialize_tables(kept)
+        table_rows += serialized
+        normalized.append("\n".join(kept))
+
+    raw_tokens = sum(_tokens(page) for page in pages)
+    normalized_tokens = sum(_tokens(page) for page in normalized)
+    return normalized, {
+        # Estimated tokens (chars / 4) of the page text
+        "raw_tokens": raw_tokens,
+        "normalized_tokens": normalized_tokens,
+        "tokens_saved": raw_tokens - normalized_tokens,
+        "reduction": round(1 - normalized_tokens / raw_tokens, 4) if raw_tokens else 0.0,
+        "header_footer_lines_removed": header_footer,
+        "duplicate_lines_removed": duplicates,
+        "table_rows_serialized": table_rows,
+        "seconds": round(time.perf_counter() - started, 4),
+    }
+
+def apply_token_budget(pages: List[str], budget: int = PROMPT_TOKEN_BUDGET) -> Tuple[List[str], Optional[Dict[str, Any]]]:
+    """Blank out pages until the text fits in `budget` tokens
+
+    The first page and pages holding tables are kept first, then the rest
+    in document order; a page that does not fit is skipped in favour of
+    smaller later ones. Returns the pages unchanged and None when they fit.
+    """
+    total = sum(_tokens(page) for page in pages)
+    if budget <= 0 or total <= budget:
+        return pages, None
+
+    order = sorted(
+        (i for i, page in enumerate(pages) if page),
+        key=lambda i: (i != 0, "|" not in pages[i], i)
+    )
+    keep, used = set(), 0
+    for i in order:
+        size = _tokens(pages[i])
+        if used + size <= budget:
+            keep.add(i)
+            used += size
+    trimmed = [page if i in keep else "" for i, page in enumerate(pages)]
+    return trimmed, {
+        "budget": budget,
+        "tokens_before": total,
+        "tokens_after": used,
+        "pages_dropped": [i + 1 for i in range(len(pages)) if pages[i] and i not in keep],
+    }
@@ -0,0 +1,193 @@
+import os
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+from pymongo.errors import BulkWriteError
+from starlette.concurrency import run_in_threadpool
+
+from app.database import db, get_documents_collection, get_analysis_collection
+from app.models import DocumentModel
+from app.result_store import RESULT_STORE, analysis_record, to_mongo, insert_results
+
+logger = logging.getLogger(__name__)
+
+# Write-behind settings: records are flushed in batches of up to PERSIST_BATCH_SIZE,
+# at least every PERSIST_FLUSH_INTERVAL seconds; while MongoDB is unreachable up to
+# PERSIST_MAX_BUFFERED records per collection are kept and the oldest are dropped
+PERSIST_BATCH_SIZE = int(os.getenv("PERSIST_BATCH_SIZE", "200"))
+PERSIST_FLUSH_INTERVAL = float(os.getenv("PERSIST_FLUSH_INTERVAL", "0.5"))
+PERSIST_MAX_BUFFERED = int(os.getenv("PERSIST_MAX_BUFFERED", "10000"))
+PERSIST_RETRY_MAX_SECONDS = float(os.getenv("PERSIST_RETRY_MAX_SECONDS", "30"))
+
+DUPLICATE_KEY = 11000
+
+class WriteBehindBuffer:
+    """Collects records in memory and writes them to a collection with insert_many from a background task
+
+    add() never waits on the database, so persistence adds nothing to request
+    latency. Use it from the event loop only. Duplicate key errors are
+    expected (the same document uploaded twice) and ignored. Buffers whose
+    collection is not MongoDB pass tracks_mongo=False so their failures do not
+    mark MongoDB unavailable.
+    """
+
+    def __init__(self, name: str, get_collection: Callable, batch_size: int = PERSIST_BATCH_SIZE,
+                 flush_interval: float = PERSIST_FLUSH_INTERVAL, max_buffered: int = PERSIST_MAX_BUFFERED,
+                 tracks_mongo: bool = True):
+        self.name = name
+        self.get_collection = get_collection
+        self.tracks_mongo = tracks_mongo
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self._records: deque = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._counters = {"written": 0, "duplicates": 0, "dropped": 0, "batches": 0, "failures": 0}
+        self._last_error: Optional[str] = None
+
+    def add(self, record: Dict[str, Any]):
+        if self._task is None:
+            return
+        self._records.append(record)
+        while len(self._records) > self.max_buffered:
+            self._records.popleft()
+            self._counters["dropped"] += 1
+        if len(self._records) >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """Write everything buffered; returns the number of records taken off the buffer"""
+        taken = 0
+        while self._records:
+            batch = [self._records.popleft() for _ in range(min(self.batch_size, len(self._records)))]
+            try:
+                await self.get_collection().insert_many(batch, ordered=False)
+                self._counters["written"] += len(batch)
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                duplicates = sum(1 for error in errors if error.get("code") == DUPLICATE_KEY)
+                self._counters["written"] += e.details.get("nInserted", 0)
+                self._counters["duplicates"] += duplicates
+                if duplicates < len(errors):
+                    self._counters["dropped"] += len(errors) - duplicates
+                    logger.error(f"❌ {self.name}: {len(errors) - duplicates} records rejected: {errors[0]}")
+            except Exception:
+                # Put the batch back in order and let the caller back off
+                self._records.extendleft(reversed(batch))
+                raise
+            self._counters["batches"] += 1
+            taken += len(batch)
+        if self.tracks_mongo:
+            db.available = True
+        return taken
+
+    async def _run(self):
+        delay = self.flush_interval
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+                delay = self.flush_interval
+                self._last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._counters["failures"] += 1
+                if self._last_error is None:
+                    logger.warning(f"⚠️ {self.name}: write failed, {len(self._records)} records buffered: {e}")
+                self._last_error = str(e)
+                if self.tracks_mongo:
+                    db.available = False
+                delay = min(PERSIST_RETRY_MAX_SECONDS, max(delay, self.flush_interval) * 2)
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run(), name=f"write-behind-{self.name}")
+
+    async def stop(self, timeout: float = 5.0):
+        """Stop the background task and make a last attempt at writing what is buffered"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        try:
+            await asyncio.wait_for(self.flush(), timeout=timeout)
+        except Exception as e:
+            logger.warning(f"⚠️ {self.name}: {len(self._records)} buffered records not written at shutdown: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"buffered": len(self._records), **self._counters, "last_error": self._last_error}
+
+class ResultStoreSink:
+    """The configured result store behind the insert_many a WriteBehindBuffer expects"""
+
+    async def insert_many(self, records, ordered=False):
+        await run_in_threadpool(insert_results, records)
+
+result_store_sink = ResultStoreSink()
+
+document_writer = WriteBehindBuffer("documents", get_documents_collection)
+analysis_writer = WriteBehindBuffer("analysis_results", get_analysis_collection)
+result_writer = WriteBehindBuffer("result_store", lambda: result_store_sink, tracks_mongo=False)
+
+def start_writers(mongo: bool = True):
+    """Start the result store writer, and the MongoDB writers if `mongo`"""
+    result_writer.start()
+    if mongo:
+        document_writer.start()
+        analysis_writer.start()
+
+async def stop_writers():
+    await asyncio.gather(document_writer.stop(), analysis_writer.stop(), result_writer.stop())
+
+def persistence_stats() -> Dict[str, Any]:
+    return {
+        "mongo_available": db.available,
+        "documents": document_writer.stats(),
+        "analyses": analysis_writer.stats(),
+        "result_store": result_writer.stats()
+    }
+
+def record_document(extraction: Dict[str, Any], file_size: int):
+    """Queue a documents record for an ingested upload (first upload of a document_id wins)"""
+    document_writer.add(DocumentModel(
+        document_id=extraction["document_id"],
+        filename=extraction["filename"],
+        file_size=file_size,
+        page_count=extraction["page_count"],
+        status="completed"
+    ).model_dump(by_alias=True))
+
+def record_analysis(result: Dict[str, Any], query: str, processing_time: float,
+                    timings: Optional[Dict[str, float]] = None):
+    """Queue a fresh result for the result store (which /results lists) and for MongoDB
+
+    Multi-query results get one record per answer. Celery tasks write the
+    same records (see app/worker.py), so both sources share one schema.
+    Records reach /results within PERSIST_FLUSH_INTERVAL seconds.
+    """
+    answers = result.get("answers") or [{"query": query, "answer": result["analysis"]}]
+    records = [
+        analysis_record(
+            result["document_id"], answer["query"], answer["answer"], processing_time,
+            filename=result.get("filename"), mode=result.get("mode"), timings=timings, model=result.get("model")
+        )
+        for answer in answers
+    ]
+    # With RESULT_STORE=mongo the store already writes analysis_results
+    for record in records:
+        result_writer.add(record)
+        if RESULT_STORE != "mongo":
+            analysis_writer.add(to_mongo(record))
@@ -0,0 +1,222 @@
+import os
+import time
+import asyncio
+import logging
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from app.executors import LLM_POOL_SIZE, PARSE_POOL_SIZE, RETRY_AFTER_SECONDS
+from app.metrics import STAGE_ERRORS
+
+logger = logging.getLogger(__name__)
+
+# Pipeline settings: each stage buffers at most PIPELINE_QUEUE_SIZE jobs; a submit
+# waits up to PIPELINE_SUBMIT_TIMEOUT seconds for room in the first queue, then 429s
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+PIPELINE_SUBMIT_TIMEOUT = float(os.getenv("PIPELINE_SUBMIT_TIMEOUT", "10"))
+PIPELINE_INGEST_WORKERS = int(os.getenv("PIPELINE_INGEST_WORKERS", "4"))
+PIPELINE_EXTRACT_WORKERS = int(os.getenv("PIPELINE_EXTRACT_WORKERS", str(PARSE_POOL_SIZE)))
+PIPELINE_PREPARE_WORKERS = int(os.getenv("PIPELINE_PREPARE_WORKERS", "2"))
+PIPELINE_LLM_CONCURRENCY = int(os.getenv("PIPELINE_LLM_CONCURRENCY", str(LLM_POOL_SIZE)))
+PIPELINE_PERSIST_WORKERS = int(os.getenv("PIPELINE_PERSIST_WORKERS", "2"))
+
+# handler(job) -> whether the job moves on to the next stage
+Handler = Callable[[Dict[str, Any]], Awaitable[bool]]
+
+class Stage:
+    """One pipeline step: `workers` tasks take jobs from a queue holding at most `queue_size`"""
+
+    def __init__(self, name: str, handler: Handler, workers: int, queue_size: int = PIPELINE_QUEUE_SIZE):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.queue: Optional[asyncio.Queue] = None
+        self.busy = 0
+        self.blocked = 0
+        self.counters = {"processed": 0, "failed": 0, "seconds": 0.0, "wait_seconds": 0.0}
+
+    def stats(self) -> Dict[str, Any]:
+        processed = self.counters["processed"] + self.counters["failed"]
+        return {
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "queue_size": self.queue_size,
+            "workers": self.workers,
+            "busy": self.busy,
+            # Workers done with a job but waiting for room in the next stage's queue
+            "blocked": self.blocked,
+            "processed": self.counters["processed"],
+            "failed": self.counters["failed"],
+            "avg_seconds": round(self.counters["seconds"] / processed, 4) if processed else 0.0,
+            "avg_wait_seconds": round(self.counters["wait_seconds"] / processed, 4) if processed else 0.0
+        }
+
+class Pipeline:
+    """Runs jobs through a chain of stages connected by bounded asyncio queues
+
+    Every stage works on a different job at the same time, so one document
+    can be parsed while another waits on the model. A full queue stops the
+    stage in front of it, and so on back to submit(): backpressure reaches
+    the caller instead of piling work up in memory. Jobs are dicts; a stage
+    handler sets job["result"] to answer the caller (later stages such as
+    persistence still run) and returns False to end the job early. Each job
+    runs in a copy of its submitter's context (timings, LLM priority, usage).
+    Use it from the event loop only.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.stages: List[Stage] = []
+        self._workers: List[asyncio.Task] = []
+        self._counters = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "cancelled": 0}
+        self._in_flight = 0
+        self._started_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def start(self, stages: List[Stage]):
+        if self.running:
+            return
+        self.stages = stages
+        for stage in stages:
+            stage.queue = asyncio.Queue(maxsize=stage.queue_size)
+        self._workers = [
+            asyncio.ensure_future(self._work(index))
+            for index, stage in enumerate(stages) for _ in range(stage.workers)
+        ]
+        self._started_at = time.perf_counter()
+        logger.info(f"🚰 {self.name} pipeline started: " + " → ".join(f"{s.name}×{s.workers}" for s in stages))
+
+    async def stop(self):
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        # Fail whatever is still queued so no caller waits forever
+        for stage in self.stages:
+            while stage.queue is not None and not stage.queue.empty():
+                self._fail(stage.queue.get_nowait(), RuntimeError("Pipeline stopped"))
+
+    async def run(self, job: Dict[str, Any], timeout: float = PIPELINE_SUBMIT_TIMEOUT) -> Any:
+        """Submit a job and wait for its result
+
+        Raises asyncio.TimeoutError when the first queue stays full for
+        `timeout` seconds. If the caller goes away the job is dropped at its
+        next stage boundary.
+        """
+        if not self.running:
+            raise RuntimeError(f"{self.name} pipeline is not running")
+        loop = asyncio.get_running_loop()
+        job.update({"future": loop.create_future(), "context": contextvars.copy_context(), "waits": {}})
+        job["enqueued_at"] = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.stages[0].queue.put(job), timeout)
+        except asyncio.TimeoutError:
+            self._counters["rejected"] += 1
+            raise
+        self._counters["submitted"] += 1
+        self._in_flight += 1
+        try:
+            return await job["future"]
+        except asyncio.CancelledError:
+            job["future"].cancel()
+            raise
+
+    async def _work(self, index: int):
+        stage = self.stages[index]
+        following = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            job = await stage.queue.get()
+            # Nobody is waiting for it any more; a job that already has its result still gets persisted
+            if job["future"].cancelled() and "result" not in job:
+                self._counters["cancelled"] += 1
+                self._finish(job)
+                continue
+
+            wait = time.perf_counter() - job["enqueued_at"]
+            job["waits"][stage.name] = round(wait, 4)
+            stage.counters["wait_seconds"] += wait
+            stage.busy += 1
+            started = time.perf_counter()
+            try:
+                # A task created inside the job's context copies it, so spans land in the job's timings
+                proceed = await job["context"].run(asyncio.ensure_future, stage.handler(job))
+            except asyncio.CancelledError:
+                self._fail(job, RuntimeError("Pipeline stopped"))
+                raise
+            except Exception as e:
+                stage.counters["failed"] += 1
+                STAGE_ERRORS.labels(f"pipeline_{stage.name}").inc()
+                logger.error(f"❌ {self.name} pipeline, {stage.name} stage failed: {e}")
+                self._fail(job, e)
+                continue
+            finally:
+                stage.busy -= 1
+                stage.counters["seconds"] += time.perf_counter() - started
+            stage.counters["processed"] += 1
+
+            if "result" in job and not job["future"].done():
+                job["future"].set_result(job["result"])
+            if not proceed or following is None:
+                self._finish(job)
+                continue
+
+            # Blocks while the next stage is full: this is where backpressure starts
+            job["enqueued_at"] = time.perf_counter()
+            stage.blocked += 1
+            try:
+                await following.queue.put(job)
+            except asyncio.CancelledError:
+                self._fail(job, RuntimeError("Pipeline stopped"))
+                raise
+            finally:
+                stage.blocked -= 1
+
+    def _fail(self, job: Dict[str, Any], error: Exception):
+        if not job["future"].done():
+            job["future"].set_exception(error)
+            # Mark it retrieved: a caller that went away will never await it
+            job["future"].exception()
+        self._counters["failed"] += 1
+        self._release(job)
+
+    def _finish(self, job: Dict[str, Any]):
+        if not job["future"].done():
+            self._fail(job, RuntimeError(f"{self.name} pipeline finished a job without a result"))
+            return
+        if "result" in job:
+            self._counters["completed"] += 1
+        self._release(job)
+
+    def _release(self, job: Dict[str, Any]):
+        self._in_flight -= 1
+        path = job.get("path")
+        if path and os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"⚠️ Cleanup failed: {e}")
+        job["path"] = None
+
+    def stats(self) -> Dict[str, Any]:
+        uptime = time.perf_counter() - self._started_at if self._started_at else 0.0
+        return {
+            "running": self.running,
+            "in_flight": self._in_flight,
+            **self._counters,
+            "completed_per_second": round(self._counters["completed"] / uptime, 4) if uptime else 0.0,
+            "stages": {stage.name: stage.stats() for stage in self.stages}
+        }
+
+def pipeline_busy_error(pipeline: Pipeline) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=f"The {pipeline.name} pipeline is full, please retry shortly",
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+    )
+
+analysis_pipeline = Pipeline("analysis")
@@ -0,0 +1,322 @@
+import os
+import re
+import logging
+import time
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException, Request
+from pymongo import UpdateOne
+
+from app.database import MONGO_ENABLED, get_sync_db
+from app.executors import FairShareLimiter, ANONYMOUS_USER
+
+logger = logging.getLogger(__name__)
+
+USER_HEADER = "X-User-Id"
+USER_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.@:-]{1,64}$")
+
+# Daily limits per user (0 = unlimited); usage is counted per calendar day, local time
+USER_DAILY_REQUESTS = int(os.getenv("USER_DAILY_REQUESTS", "0"))
+USER_DAILY_PAGES = int(os.getenv("USER_DAILY_PAGES", "0"))
+USER_DAILY_TOKENS = int(os.getenv("USER_DAILY_TOKENS", "0"))
+# Counters are written to MongoDB in one bulk write every USAGE_FLUSH_INTERVAL seconds
+USAGE_FLUSH_INTERVAL = float(os.getenv("USAGE_FLUSH_INTERVAL", "10"))
+# Queued Celery tasks (not finished yet) across all users, shared fairly like analysis_slots
+MAX_QUEUED_TASKS = int(os.getenv("MAX_QUEUED_TASKS", "200"))
+QUEUE_PRUNE_INTERVAL = float(os.getenv("QUEUE_PRUNE_INTERVAL", "2"))
+QUEUE_PRUNE_BATCH = int(os.getenv("QUEUE_PRUNE_BATCH", "100"))
+# Tasks that never report a result (expired, not stored, worker lost) free their slot after this long
+QUEUE_TASK_TTL = float(os.getenv("QUEUE_TASK_TTL", "3600"))
+
+COUNTERS = ("requests", "analyses", "pages", "prompt_tokens", "completion_tokens")
+# users collection field (see UserModel) for each counter
+USER_FIELDS = {
+    "requests": "api_calls",
+    "analyses": "total_analyses",
+    "pages": "pages_processed",
+    "prompt_tokens": "prompt_tokens",
+    "completion_tokens": "completion_tokens",
+}
+
+def request_user(request: Request) -> str:
+    """The caller's user id from the X-User-Id header; requests without one share the anonymous quota"""
+    user = request.headers.get(USER_HEADER, "").strip()
+    if not user:
+        return ANONYMOUS_USER
+    if not USER_ID_PATTERN.match(user):
+        raise HTTPException(status_code=400, detail=f"Invalid {USER_HEADER} header")
+    return user
+
+def _today() -> str:
+    return datetime.now().date().isoformat()
+
+def _empty() -> Dict[str, int]:
+    return dict.fromkeys(COUNTERS, 0)
+
+def _add(target: Dict[str, int], counts: Dict[str, int]):
+    for key in COUNTERS:
+        target[key] += counts.get(key, 0)
+
+class UsageAccountant:
+    """Per-user request, page and token counters, batched in memory and flushed to MongoDB
+
+    record() only touches in-memory dicts; a background thread turns the
+    counts gathered since the last flush into one bulk write of $inc upserts
+    (lifetime totals in users, per-day totals in user_usage) through the
+    process's shared sync client, so it works the same in the API and in
+    Celery workers. Failed flushes are merged back and retried.
+    """
+
+    def __init__(self, flush_interval: float = USAGE_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[str, str], Dict[str, int]] = {}
+        # Today's usage per user: loaded from user_usage on first sight, then kept current locally
+        self._daily: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._counters = {"flushes": 0, "failures": 0, "users_written": 0}
+        self._last_error: Optional[str] = None
+
+    def record(self, user: str, requests: int = 0, analyses: int = 0, pages: int = 0,
+               llm_usage: Optional[Dict[str, int]] = None):
+        counts = {
+            "requests": requests,
+            "analyses": analyses,
+            "pages": pages,
+            "prompt_tokens": (llm_usage or {}).get("prompt_tokens", 0),
+            "completion_tokens": (llm_usage or {}).get("completion_tokens", 0),
+        }
+        key = (user, _today())
+        with self._lock:
+            _add(self._pending.setdefault(key, _empty()), counts)
+            # Not loaded yet: _load_daily() adds the pending counts when it is
+            if key in self._daily:
+                _add(self._daily[key], counts)
+
+    def _load_daily(self, key: Tuple[str, str]) -> Dict[str, int]:
+        with self._lock:
+            if key in self._daily:
+                return self._daily[key]
+        stored = {}
+        if MONGO_ENABLED:
+            try:
+                stored = get_sync_db().user_usage.find_one({"user_id": key[0], "day": key[1]}) or {}
+            except Exception as e:
+                logger.warning(f"⚠️ Could not load usage for user {key[0]}, counting from zero: {e}")
+        with self._lock:
+            # Flushed counts are in `stored`; the unflushed ones are added on top
+            if key not in self._daily:
+                self._daily[key] = {name: int(stored.get(name, 0)) for name in COUNTERS}
+                _add(self._daily[key], self._pending.get(key, {}))
+            return self._daily[key]
+
+    def usage(self, user: str) -> Dict[str, int]:
+        return dict(self._load_daily((user, _today())))
+
+    def over_limit(self, user: str) -> Optional[str]:
+        """Which daily limit the user has reached, if any (blocking: may read MongoDB once per user and day)"""
+        if not (USER_DAILY_REQUESTS or USER_DAILY_PAGES or USER_DAILY_TOKENS):
+            return None
+        usage = self.usage(user)
+        if USER_DAILY_REQUESTS and usage["requests"] >= USER_DAILY_REQUESTS:
+            return f"daily request limit ({USER_DAILY_REQUESTS})"
+        if USER_DAILY_PAGES and usage["pages"] >= USER_DAILY_PAGES:
+            return f"daily page limit ({USER_DAILY_PAGES})"
+        if USER_DAILY_TOKENS and usage["prompt_tokens"] + usage["completion_tokens"] >= USER_DAILY_TOKENS:
+            return f"daily token limit ({USER_DAILY_TOKENS})"
+        return None
+
+    def flush(self) -> int:
+        """Write the counts gathered since the last flush; returns the number of user-days written"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            today = _today()
+            for key in [key for key in self._daily if key[1] != today]:
+                del self._daily[key]
+        if not pending or not MONGO_ENABLED:
+            return 0
+
+        now = datetime.now()
+        users: Dict[str, Dict[str, int]] = {}
+        for (user, _), counts in pending.items():
+            _add(users.setdefault(user, _empty()), counts)
+        user_ops = [
+            UpdateOne(
+                {"user_id": user},
+                {
+                    "$inc": {USER_FIELDS[name]: value for name, value in counts.items() if value},
+                    "$set": {"last_seen": now},
+                    "$setOnInsert": {"created_at": now},
+                },
+                upsert=True
+            )
+            for user, counts in users.items() if any(counts.values())
+        ]
+        daily_ops = [
+            UpdateOne(
+                {"user_id": user, "day": day},
+                {"$inc": {name: value for name, value in counts.items() if value}, "$set": {"updated_at": now}},
+                upsert=True
+            )
+            for (user, day), counts in pending.items() if any(counts.values())
+        ]
+        if not user_ops:
+            return 0
+        try:
+            database = get_sync_db()
+            database.users.bulk_write(user_ops, ordered=False)
+            database.user_usage.bulk_write(daily_ops, ordered=False)
+        except Exception:
+            # Put the counts back; a partially applied write may be counted twice, never lost
+            with self._lock:
+                for key, counts in pending.items():
+                    _add(self._pending.setdefault(key, _empty()), counts)
+            raise
+        self._counters["flushes"] += 1
+        self._counters["users_written"] += len(users)
+        return len(pending)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                self._last_error = None
+            except Exception as e:
+                self._counters["failures"] += 1
+                if self._last_error is None:
+                    logger.warning(f"⚠️ Usage flush failed, keeping counters in memory: {e}")
+                self._last_error = str(e)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="usage-flush", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the flush thread and make a last attempt at writing pending counts"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=self.flush_interval + 5)
+            self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            logger.warning(f"⚠️ Usage counters for {len(self._pending)} user-days not written at shutdown: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._pending)
+            users_today = len(self._daily)
+        return {"pending_user_days": pending, "users_today": users_today, **self._counters,
+                "last_error": self._last_error}
+
+usage_accountant = UsageAccountant()
+
+def seconds_until_midnight() -> int:
+    now = datetime.now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return int((midnight - now).total_seconds()) + 1
+
+def check_daily_quota(user: str):
+    """Raise 429 if the user has used up a daily limit (blocking; call from a thread)"""
+    reason = usage_accountant.over_limit(user)
+    if reason:
+        raise HTTPException(
+            status_code=429,
+            detail=f"User '{user}' reached the {reason}",
+            headers={"Retry-After": str(seconds_until_midnight())}
+        )
+
+class QueueAdmission:
+    """Fair-share limit on Celery tasks that are queued or running
+
+    The API never hears back from workers, so finished tasks are found by
+    polling the result backend: at most every QUEUE_PRUNE_INTERVAL seconds,
+    for the QUEUE_PRUNE_BATCH tasks checked least recently, in one call.
+    A task still not finished QUEUE_TASK_TTL seconds after it was queued
+    (its result expired, was never stored, or the worker was lost) gives
+    its slot back anyway.
+    """
+
+    def __init__(self, limit: int = MAX_QUEUED_TASKS):
+        self.slots = FairShareLimiter(limit)
+        # user -> {task_id: [queued at, last checked at]}
+        self._tasks: Dict[str, Dict[str, List[float]]] = {}
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self._counters = {"finished": 0, "expired": 0, "polls": 0, "poll_errors": 0}
+
+    def _drop(self, tasks: List[Tuple[str, str]], counter: str):
+        released: Dict[str, int] = {}
+        with self._lock:
+            for user, task_id in tasks:
+                user_tasks = self._tasks.get(user, {})
+                if user_tasks.pop(task_id, None) is not None:
+                    released[user] = released.get(user, 0) + 1
+                if not user_tasks:
+                    self._tasks.pop(user, None)
+            self._counters[counter] += sum(released.values())
+        for user, count in released.items():
+            for _ in range(count):
+                self.slots.release(user)
+
+    def prune(self, finished: Callable[[List[str]], Set[str]]):
+        """Free the slots of finished and expired tasks; finished(task_ids) polls the backend (blocking)"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_prune < QUEUE_PRUNE_INTERVAL:
+                return
+            self._last_prune = now
+            tracked = [
+                (times, user, task_id)
+                for user, user_tasks in self._tasks.items() for task_id, times in user_tasks.items()
+            ]
+        expired = [(user, task_id) for times, user, task_id in tracked if now - times[0] > QUEUE_TASK_TTL]
+        if expired:
+            logger.warning(f"⚠️ {len(expired)} queued tasks never reported a result, releasing their slots")
+            self._drop(expired, "expired")
+
+        batch = sorted(
+            (entry for entry in tracked if now - entry[0][0] <= QUEUE_TASK_TTL), key=lambda entry: entry[0][1]
+        )[:QUEUE_PRUNE_BATCH]
+        if not batch:
+            return
+        for times, _, _ in batch:
+            times[1] = now
+        try:
+            done = finished([task_id for _, _, task_id in batch])
+        except Exception as e:
+            # Backend unreachable: keep counting the tasks as outstanding
+            with self._lock:
+                self._counters["poll_errors"] += 1
+            logger.warning(f"⚠️ Could not check queued tasks: {e}")
+            return
+        with self._lock:
+            self._counters["polls"] += 1
+        self._drop([(user, task_id) for _, user, task_id in batch if task_id in done], "finished")
+
+    def try_acquire(self, user: str, finished: Callable[[List[str]], Set[str]]) -> bool:
+        """Reserve a queue slot for one task of `user` (blocking: may poll the result backend)"""
+        self.prune(finished)
+        return self.slots.try_acquire(user)
+
+    def track(self, user: str, task_id: str):
+        now = time.monotonic()
+        with self._lock:
+            self._tasks.setdefault(user, {})[task_id] = [now, now]
+
+    def release(self, user: str):
+        """Give back a slot whose task was never queued"""
+        self.slots.release(user)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            tracked = sum(len(user_tasks) for user_tasks in self._tasks.values())
+            counters = dict(self._counters)
+        return {**self.slots.stats(), "tracked_tasks": tracked, **counters}
+
+queue_admission = QueueAdmission()
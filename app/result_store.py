@@ -0,0 +1,341 @@
+import os
+import json
+import base64
+import bisect
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from app.models import AnalysisResultModel
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Result store configuration
+RESULT_STORE = os.getenv("RESULT_STORE", "sqlite")  # sqlite, jsonl or mongo
+RESULT_STORE_PATH = os.getenv("RESULT_STORE_PATH", "")
+
+def analysis_record(document_id: str, query: str, analysis: str, processing_time: float,
+                    filename: Optional[str] = None, mode: Optional[str] = None,
+                    timings: Optional[Dict[str, float]] = None, model: Optional[str] = None) -> Dict[str, Any]:
+    """An analysis_results record (AnalysisResultModel fields, JSON types) as every writer stores it"""
+    return AnalysisResultModel(
+        document_id=document_id,
+        filename=filename,
+        query=query,
+        financial_analysis=analysis,
+        mode=mode,
+        processing_time=processing_time,
+        timings=timings,
+        model_used=model or "unknown"
+    ).model_dump(mode="json", by_alias=True)
+
+def to_mongo(record: Dict[str, Any]) -> Dict[str, Any]:
+    """The record with _id and created_at as BSON types, so MongoDB can sort and page on them"""
+    return {**record, "_id": ObjectId(record["_id"]), "created_at": datetime.fromisoformat(record["created_at"])}
+
+def from_mongo(record: Dict[str, Any]) -> Dict[str, Any]:
+    return {**record, "_id": str(record["_id"]), "created_at": record["created_at"].isoformat()}
+
+def page_key(record: Dict[str, Any]) -> Tuple[str, str]:
+    """Where a record sorts in a listing: (created_at, _id), both as strings"""
+    return str(record.get("created_at", "")), str(record.get("_id", ""))
+
+def encode_cursor(record: Dict[str, Any]) -> str:
+    """Opaque cursor for the page that follows `record`"""
+    created_at, record_id = page_key(record)
+    return base64.urlsafe_b64encode(f"{created_at}|{record_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        created_at, record_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        # Either may be empty for records written before they had both
+        if created_at:
+            datetime.fromisoformat(created_at)
+        if record_id:
+            ObjectId(record_id)
+    except (ValueError, InvalidId, UnicodeDecodeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return created_at, record_id
+
+def _next_cursor(records: List[Dict[str, Any]], limit: int) -> Optional[str]:
+    # Stores fetch limit + 1 records: the extra one only tells whether another page exists
+    return encode_cursor(records[limit - 1]) if len(records) > limit else None
+
+class ResultStore:
+    """Interface shared by all result store backends"""
+
+    name = "base"
+
+    def insert(self, record: Dict[str, Any]):
+        raise NotImplementedError
+
+    def insert_many(self, records: List[Dict[str, Any]]):
+        for record in records:
+            self.insert(record)
+
+    def find_by_document(self, document_id: str) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def page(self, limit: int = 50, cursor: Optional[str] = None,
+             document_id: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Return (newest-first page of records, cursor of the next page or None)
+
+        Pages are keyset ranges on (created_at, _id): `cursor` is the
+        next_cursor of the previous page, so deep pages cost no more than the
+        first and inserts made meanwhile never shift records between pages.
+        """
+        raise NotImplementedError
+
+    def count(self, document_id: Optional[str] = None) -> int:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class SqliteResultStore(ResultStore):
+    """SQLite in WAL mode: concurrent readers, serialized O(log n) inserts, indexed lookups"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str = "results.db"):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " document_id TEXT NOT NULL,"
+            " created_at TEXT NOT NULL,"
+            " record_id TEXT NOT NULL DEFAULT '',"
+            " record TEXT NOT NULL)"
+        )
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(results)")]
+        if "record_id" not in columns:
+            # Stores created before keyset paging: copy each record's _id into the new column
+            conn.execute("ALTER TABLE results ADD COLUMN record_id TEXT NOT NULL DEFAULT ''")
+            conn.execute("UPDATE results SET record_id = COALESCE(json_extract(record, '$._id'), '')")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_results_document_id ON results (document_id)")
+        # Keyset pagination sorts on (created_at, record_id), overall and per document
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_results_page ON results (created_at, record_id)")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_results_document_page ON results (document_id, created_at, record_id)"
+        )
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def insert(self, record):
+        self.insert_many([record])
+
+    def insert_many(self, records):
+        # One transaction (one WAL commit) per batch
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT INTO results (document_id, created_at, record_id, record) VALUES (?, ?, ?, ?)",
+                [(record["document_id"], *page_key(record), json.dumps(record)) for record in records]
+            )
+
+    def find_by_document(self, document_id):
+        rows = self._connection().execute(
+            "SELECT record FROM results WHERE document_id = ? ORDER BY id", (document_id,)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def page(self, limit=50, cursor=None, document_id=None):
+        conditions, params = [], []
+        if document_id:
+            conditions.append("document_id = ?")
+            params.append(document_id)
+        if cursor:
+            conditions.append("(created_at, record_id) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        rows = self._connection().execute(
+            f"SELECT record FROM results {where}ORDER BY created_at DESC, record_id DESC LIMIT ?",
+            (*params, limit + 1)
+        ).fetchall()
+        records = [json.loads(row[0]) for row in rows]
+        return records[:limit], _next_cursor(records, limit)
+
+    def count(self, document_id=None):
+        if document_id:
+            row = self._connection().execute(
+                "SELECT COUNT(*) FROM results WHERE document_id = ?", (document_id,)
+            ).fetchone()
+            return row[0]
+        # MAX(id) is O(1) on the rowid b-tree (there are no deletes)
+        row = self._connection().execute("SELECT MAX(id) FROM results").fetchone()
+        return row[0] or 0
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+class JsonlResultStore(ResultStore):
+    """Append-only JSON Lines file with in-memory document_id -> offsets and page-order indexes
+
+    Each insert is a single locked append (no read-modify-write). The indexes
+    are built lazily and caught up incrementally with lines appended by other
+    processes.
+    """
+
+    name = "jsonl"
+
+    def __init__(self, path: str = "results.jsonl"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._offsets: List[int] = []
+        self._by_document: Dict[str, List[int]] = {}
+        # (created_at, _id, offset), sorted: overall and per document
+        self._keys: List[Tuple[str, str, int]] = []
+        self._keys_by_document: Dict[str, List[Tuple[str, str, int]]] = {}
+        self._indexed_size = 0
+
+    def insert(self, record):
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        with self._lock:
+            with open(self.path, "ab") as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.write(line)
+                    f.flush()
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _refresh_index(self):
+        # Caller must hold the lock
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._indexed_size)
+            offset = self._indexed_size
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partially written line, pick it up next time
+                record = json.loads(line)
+                self._offsets.append(offset)
+                self._by_document.setdefault(record["document_id"], []).append(offset)
+                key = (*page_key(record), offset)
+                # Appends arrive almost in created_at order, so these land at or near the end
+                bisect.insort(self._keys, key)
+                bisect.insort(self._keys_by_document.setdefault(record["document_id"], []), key)
+                offset += len(line)
+            self._indexed_size = offset
+
+    def _read_at(self, offsets):
+        records = []
+        with open(self.path, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                records.append(json.loads(f.readline()))
+        return records
+
+    def find_by_document(self, document_id):
+        with self._lock:
+            self._refresh_index()
+            offsets = list(self._by_document.get(document_id, []))
+        return self._read_at(offsets) if offsets else []
+
+    def page(self, limit=50, cursor=None, document_id=None):
+        with self._lock:
+            self._refresh_index()
+            keys = self._keys_by_document.get(document_id, []) if document_id else self._keys
+            end = bisect.bisect_left(keys, decode_cursor(cursor)) if cursor else len(keys)
+            offsets = [key[2] for key in keys[max(end - limit - 1, 0):end][::-1]]
+        records = self._read_at(offsets) if offsets else []
+        return records[:limit], _next_cursor(records, limit)
+
+    def count(self, document_id=None):
+        with self._lock:
+            self._refresh_index()
+            return len(self._by_document.get(document_id, [])) if document_id else len(self._offsets)
+
+class MongoResultStore(ResultStore):
+    """MongoDB analysis_results collection (indexed on document_id and created_at)"""
+
+    name = "mongo"
+
+    def __init__(self, collection=None):
+        if collection is None:
+            from app.database import get_sync_db
+            collection = get_sync_db().analysis_results
+        self.collection = collection
+        self.collection.create_index("document_id")
+        self.collection.create_index("created_at")
+        # Keyset pagination sorts on (created_at, _id), overall and per document
+        self.collection.create_index([("created_at", -1), ("_id", -1)])
+        self.collection.create_index([("document_id", 1), ("created_at", -1), ("_id", -1)])
+
+    def insert(self, record):
+        self.collection.insert_one(to_mongo(record))
+
+    def insert_many(self, records):
+        if records:
+            self.collection.insert_many([to_mongo(record) for record in records], ordered=False)
+
+    def find_by_document(self, document_id):
+        return [from_mongo(r) for r in self.collection.find({"document_id": document_id}).sort("created_at", 1)]
+
+    def page(self, limit=50, cursor=None, document_id=None):
+        query: Dict[str, Any] = {"document_id": document_id} if document_id else {}
+        if cursor:
+            created_at, record_id = decode_cursor(cursor)
+            if not created_at or not record_id:
+                raise ValueError(f"Invalid cursor: {cursor}")
+            created_at, record_id = datetime.fromisoformat(created_at), ObjectId(record_id)
+            query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "_id": {"$lt": record_id}}
+            ]
+        found = self.collection.find(query).sort([("created_at", -1), ("_id", -1)]).limit(limit + 1)
+        records = [from_mongo(r) for r in found]
+        return records[:limit], _next_cursor(records, limit)
+
+    def count(self, document_id=None):
+        if document_id:
+            return self.collection.count_documents({"document_id": document_id})
+        return self.collection.estimated_document_count()
+
+RESULT_STORES = {
+    "sqlite": lambda: SqliteResultStore(RESULT_STORE_PATH or "results.db"),
+    "jsonl": lambda: JsonlResultStore(RESULT_STORE_PATH or "results.jsonl"),
+    "mongo": MongoResultStore,
+}
+
+_store: Optional[ResultStore] = None
+_store_pid: Optional[int] = None
+_store_lock = threading.Lock()
+
+def insert_results(records: List[Dict[str, Any]]):
+    get_result_store().insert_many(records)
+
+def get_result_store() -> ResultStore:
+    """Process-wide result store selected by RESULT_STORE (re-created after fork)"""
+    global _store, _store_pid
+    with _store_lock:
+        if _store is None or _store_pid != os.getpid():
+            if RESULT_STORE not in RESULT_STORES:
+                raise ValueError(f"Unknown RESULT_STORE '{RESULT_STORE}', expected one of {sorted(RESULT_STORES)}")
+            _store = RESULT_STORES[RESULT_STORE]()
+            _store_pid = os.getpid()
+        return _store
\ No newline at end of file
@@ -0,0 +1,131 @@
+import os
+import re
+import time
+import logging
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from app.mapreduce import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Pre-filter configuration
+PREFILTER_TOP_K = int(os.getenv("PREFILTER_TOP_K", "8"))
+# Documents with fewer pages than this are sent whole
+PREFILTER_MIN_PAGES = int(os.getenv("PREFILTER_MIN_PAGES", "12"))
+
+TOKEN_PATTERN = re.compile(r"[a-z][a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were what "
+    "which will with how does did do company companys".split()
+)
+# Pull in the words filings actually use for common query terms
+QUERY_EXPANSIONS = {
+    "debt": ["borrowings", "leverage", "loans", "notes"],
+    "equity": ["shareholders", "stockholders"],
+    "revenue": ["sales", "turnover"],
+    "revenues": ["sales", "turnover"],
+    "profit": ["income", "earnings"],
+    "profitable": ["income", "earnings", "margin"],
+    "cash": ["liquidity"],
+    "liquidity": ["cash", "current"],
+    "growth": ["increase", "decrease"],
+}
+# Pages holding the primary statements are always kept
+STATEMENT_PATTERN = re.compile(
+    r"balance sheets?|statements? of (?:financial position|income|operations|earnings|cash flows?|"
+    r"comprehensive income|changes in (?:shareholders|stockholders)['’]? equity)|income statements?|"
+    r"cash flow statements?",
+    re.IGNORECASE
+)
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+class BM25Index:
+    """Okapi BM25 over pages, stored as term-sorted postings in NumPy arrays"""
+
+    def __init__(self, documents: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary: Dict[str, int] = {}
+        term_ids = [
+            np.array([self.vocabulary.setdefault(t, len(self.vocabulary)) for t in doc], dtype=np.int64)
+            for doc in documents
+        ]
+        self.doc_count = len(documents)
+        self.doc_lengths = np.array([len(doc) for doc in documents], dtype=np.float64)
+        self.avg_length = self.doc_lengths.mean() if self.doc_count and self.doc_lengths.sum() else 1.0
+        vocab_size = max(len(self.vocabulary), 1)
+
+        all_terms = np.concatenate(term_ids) if term_ids else np.array([], dtype=np.int64)
+        all_docs = np.repeat(np.arange(self.doc_count, dtype=np.int64), self.doc_lengths.astype(np.int64))
+        # One (term, doc) key per occurrence; unique() gives term frequencies sorted by term then doc
+        pairs, tf = np.unique(all_terms * self.doc_count + all_docs, return_counts=True)
+        self.post_terms = pairs // max(self.doc_count, 1)
+        self.post_docs = pairs % max(self.doc_count, 1)
+        self.post_tf = tf.astype(np.float64)
+        self.indptr = np.searchsorted(self.post_terms, np.arange(vocab_size + 1))
+
+        df = np.diff(self.indptr).astype(np.float64)
+        self.idf = np.log(1.0 + (self.doc_count - df + 0.5) / (df + 0.5))
+
+    def score(self, query_tokens: List[str]) -> np.ndarray:
+        scores = np.zeros(self.doc_count)
+        ids = sorted({self.vocabulary[t] for t in query_tokens if t in self.vocabulary})
+        if not ids:
+            return scores
+        slices = np.concatenate([np.arange(self.indptr[i], self.indptr[i + 1]) for i in ids])
+        docs = self.post_docs[slices]
+        tf = self.post_tf[slices]
+        idf = self.idf[self.post_terms[slices]]
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[docs] / self.avg_length)
+        np.add.at(scores, docs, idf * tf * (self.k1 + 1) / (tf + norm))
+        return scores
+
+def expand_query(query: str) -> List[str]:
+    tokens = tokenize(query)
+    expanded = list(tokens)
+    for token in tokens:
+        expanded.extend(QUERY_EXPANSIONS.get(token, []))
+    return expanded
+
+def select_pages(pages: List[str], query: str, top_k: int = PREFILTER_TOP_K) -> Tuple[List[int], List[int]]:
+    """Return (selected 1-based page numbers in order, statement page numbers)"""
+    index = BM25Index([tokenize(content) for content in pages])
+    scores = index.score(expand_query(query))
+
+    ranked = [int(i) for i in np.argsort(-scores, kind="stable") if scores[i] > 0][:top_k]
+    statements = [i for i, content in enumerate(pages) if content and STATEMENT_PATTERN.search(content)]
+    selected = sorted(set(ranked) | set(statements))
+    return [i + 1 for i in selected], [i + 1 for i in statements]
+
+def prefilter_pages(pages: List[str], query: str, top_k: int = PREFILTER_TOP_K) -> Tuple[List[str], Dict[str, Any]]:
+    """Blank out pages that are irrelevant to the query, keeping page numbering intact"""
+    started = time.perf_counter()
+    selected, statements = select_pages(pages, query, top_k)
+    keep = set(selected)
+    filtered = [content if page_num in keep else "" for page_num, content in enumerate(pages, 1)]
+
+    # Fall back to the full document if nothing matched at all
+    if not keep:
+        filtered = list(pages)
+
+    tokens_before = sum(estimate_tokens(content) for content in pages)
+    tokens_after = sum(estimate_tokens(content) for content in filtered)
+    stats = {
+        "top_k": top_k,
+        "pages_total": sum(1 for content in pages if content),
+        "pages_selected": selected,
+        "statement_pages": statements,
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "token_reduction": round(1 - tokens_after / tokens_before, 4) if tokens_before else 0.0,
+        "prefilter_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+    logger.info(
+        f"🔎 Pre-filter kept {len(selected)}/{stats['pages_total']} pages, "
+        f"{tokens_before} → {tokens_after} tokens in {stats['prefilter_ms']} ms"
+    )
+    return filtered, stats
\ No newline at end of file
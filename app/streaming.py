@@ -0,0 +1,120 @@
+import os
+import json
+import asyncio
+import logging
+import threading
+import contextvars
+import concurrent.futures
+from typing import Any, AsyncIterator, Callable, List, Optional
+
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from app.agents import get_llm
+from app.tasks import ANALYSIS_TASK_DESCRIPTION
+from app.executors import llm_pool
+from app.multi_query import SECTION_PATTERN
+
+logger = logging.getLogger(__name__)
+
+# Chunks buffered between the LLM thread and a slow client before the thread waits
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "256"))
+
+_DONE = object()
+
+def sse_event(event: str, data: Any) -> str:
+    """One Server-Sent Events frame with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def build_analysis_prompt(query: str, document_text: str) -> str:
+    """The analysis task prompt, filled in the same way crewai interpolates it"""
+    return ANALYSIS_TASK_DESCRIPTION.format(query=query, document_text=document_text)
+
+class EventStreamResponse(StreamingResponse):
+    """A text/event-stream response that calls `cleanup()` however it ends
+
+    The call wraps the whole response, not the body iterator: a generator's
+    finally does not run when the client disconnects or the body is never
+    iterated, so per-request resources must not be released there.
+    """
+
+    def __init__(self, content: AsyncIterator[str], cleanup: Callable[[], None]):
+        # Stop proxies from buffering the stream
+        super().__init__(
+            content, media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+        self.cleanup = cleanup
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.cleanup()
+
+class SectionSplitter:
+    """Spot report section titles (EXECUTIVE SUMMARY, ...) in streamed text as their lines complete"""
+
+    def __init__(self):
+        self._line = ""
+
+    def feed(self, text: str) -> List[str]:
+        *lines, self._line = (self._line + text).split("\n")
+        names = []
+        for line in lines:
+            match = SECTION_PATTERN.match(line)
+            if match:
+                names.append(" ".join(match.group(1).upper().split()))
+        return names
+
+async def stream_llm(prompt: str, llm=None, executor: Optional[concurrent.futures.Executor] = None) -> AsyncIterator[str]:
+    """Yield text chunks from llm.stream(prompt) as the model produces them
+
+    LangChain's stream() is a blocking generator, so it is drained on an LLM
+    pool thread that hands chunks to the event loop through a bounded
+    asyncio.Queue (the thread waits while a slow client catches up). Any
+    LangChain chat model or LLM with stream() works, which is how tests plug
+    in a fake. Closing the iterator, e.g. on client disconnect, stops the
+    thread at its next chunk.
+    """
+    llm = llm or get_llm()
+    loop = asyncio.get_running_loop()
+    chunks: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    stop = threading.Event()
+
+    def put(item):
+        future = asyncio.run_coroutine_threadsafe(chunks.put(item), loop)
+        while True:
+            try:
+                return future.result(timeout=1.0)
+            except concurrent.futures.TimeoutError:
+                if stop.is_set():
+                    future.cancel()
+                    return
+
+    def produce():
+        try:
+            for chunk in llm.stream(prompt):
+                if stop.is_set():
+                    logger.info("🛑 Stream consumer went away, stopping generation")
+                    break
+                text = getattr(chunk, "content", chunk)
+                if text:
+                    put(str(text))
+            put(_DONE)
+        except BaseException as e:
+            put(e)
+
+    loop.run_in_executor(executor or llm_pool, contextvars.copy_context().run, produce)
+    try:
+        while True:
+            item = await chunks.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # Unblock a producer waiting on a full queue
+        while not chunks.empty():
+            chunks.get_nowait()
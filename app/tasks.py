@@ -1,9 +1,11 @@
 from crewai import Task
-from app.agents import financial_analyst
+from app.agents import get_financial_analyst
+
+# Bump whenever the task prompt changes so cached analyses are not reused
+PROMPT_VERSION = "2"
 
 # Financial Analysis Task (Single task approach)
-analyze_financial_document = Task(
-    description="""
+ANALYSIS_TASK_DESCRIPTION = """
     You are a Chartered Financial Analyst with 20 years of experience. Analyze the financial document and answer the user's query.
 
     User query: {query}
@@ -53,9 +55,155 @@ analyze_financial_document = Task(
     [Actionable insights and suggestions]
 
     If the document doesn't contain financial data, clearly state that and explain what the document appears to be instead.
-    """,
-    expected_output="A comprehensive financial analysis report with all required sections",
-    agent=financial_analyst
-)
+    """
+
+def build_analysis_task(agent=None):
+    return Task(
+        description=ANALYSIS_TASK_DESCRIPTION,
+        expected_output="A comprehensive financial analysis report with all required sections",
+        agent=agent or get_financial_analyst()
+    )
+
+# Several queries about one document answered in a single pass; {queries} is a
+# numbered list and {answer_sections} one numbered ANSWER TO USER QUERY section per query
+MULTI_QUERY_TASK_DESCRIPTION = """
+    You are a Chartered Financial Analyst with 20 years of experience. Analyze the financial document and answer each of the user's queries.
+
+    User queries:
+{queries}
+    Document text: {document_text}
+
+    Instructions:
+    1. First, verify if this is a financial document by looking for financial terms like:
+       - revenue, income, profit, loss
+       - balance sheet, assets, liabilities
+       - cash flow, expenses, earnings
+       - financial ratios, margins, growth
+
+    2. If it is a financial document, extract key financial metrics:
+       - Revenue and revenue trends
+       - Profit margins (gross, operating, net)
+       - Key ratios (liquidity, solvency, efficiency)
+       - Growth rates year over year
+
+    3. Analyze the company's financial health:
+       - Is the company profitable?
+       - Are revenues growing or declining?
+       - Is the company carrying too much debt?
+       - What are the key strengths and weaknesses?
+
+    4. Answer every user query specifically and completely, each in its own numbered section.
+
+    5. Provide actionable recommendations based on the analysis.
+
+    Format your response with these clear sections, keeping the section titles exactly as written:
+
+    EXECUTIVE SUMMARY
+    [Brief overview of findings]
+
+    DOCUMENT VERIFICATION
+    [Is this a financial document? What type?]
+
+    KEY FINANCIAL METRICS
+    [Extracted metrics in a structured format]
+
+    FINANCIAL HEALTH ASSESSMENT
+    [Detailed analysis of company's financial position]
+
+{answer_sections}
 
-print("✅ Tasks created successfully")
\ No newline at end of file
+    RECOMMENDATIONS
+    [Actionable insights and suggestions]
+
+    If the document doesn't contain financial data, clearly state that and explain what the document appears to be instead.
+    """
+
+def build_multi_query_task(agent=None):
+    return Task(
+        description=MULTI_QUERY_TASK_DESCRIPTION,
+        expected_output="A comprehensive financial analysis report with one numbered answer section per query",
+        agent=agent or get_financial_analyst()
+    )
+
+# Map step of map-reduce analysis: one task per document chunk
+CHUNK_TASK_DESCRIPTION = """
+    You are reviewing one part ({chunk_label}) of a longer financial document. Other parts are
+    reviewed separately and all notes are combined later, so only report what this part contains.
+
+    User query: {query}
+    Document excerpt: {chunk_text}
+
+    Write concise notes under these headings:
+
+    DOCUMENT TYPE
+    [What kind of document this excerpt appears to come from]
+
+    FINANCIAL FIGURES
+    [Every revenue, profit, margin, ratio, debt, cash flow or growth figure, with its period and page]
+
+    NOTABLE ITEMS
+    [Risks, one-off events, guidance, accounting changes]
+
+    RELEVANCE TO QUERY
+    [Anything in this excerpt that helps answer: {query}. Write "None" if nothing does]
+    """
+
+def build_chunk_task(agent=None):
+    return Task(
+        description=CHUNK_TASK_DESCRIPTION,
+        expected_output="Structured notes on the financial content of this document excerpt",
+        agent=agent or get_financial_analyst()
+    )
+
+# Reduce step of map-reduce analysis: combine chunk notes into the standard report
+REDUCE_TASK_DESCRIPTION = """
+    You are a Chartered Financial Analyst with 20 years of experience. A long financial document was
+    split into {chunk_count} parts and each part was summarized into notes. Combine the notes into a
+    single analysis that answers the user's query. Prefer the most recent period when figures conflict
+    and do not invent figures that are not in the notes.
+
+    User query: {query}
+    Notes from each part: {chunk_notes}
+
+    Format your response with these clear sections:
+
+    EXECUTIVE SUMMARY
+    [Brief overview of findings]
+
+    DOCUMENT VERIFICATION
+    [Is this a financial document? What type?]
+
+    KEY FINANCIAL METRICS
+    [Extracted metrics in a structured format]
+
+    FINANCIAL HEALTH ASSESSMENT
+    [Detailed analysis of company's financial position]
+
+    ANSWER TO USER QUERY
+    [Specific answer to: {query}]
+
+    RECOMMENDATIONS
+    [Actionable insights and suggestions]
+    """
+
+def build_reduce_task(agent=None):
+    return Task(
+        description=REDUCE_TASK_DESCRIPTION,
+        expected_output="A comprehensive financial analysis report with all required sections",
+        agent=agent or get_financial_analyst()
+    )
+
+_analyze_financial_document = None
+
+def get_analysis_task():
+    """Shared analysis task, created on first use"""
+    global _analyze_financial_document
+    if _analyze_financial_document is None:
+        _analyze_financial_document = build_analysis_task()
+    return _analyze_financial_document
+
+def __getattr__(name):
+    # Backwards compatible lazy module attribute: app.tasks.analyze_financial_document
+    if name == "analyze_financial_document":
+        return get_analysis_task()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
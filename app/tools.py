@@ -1,9 +1,144 @@
 ## Importing libraries and files
 import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 load_dotenv()
 
 from pypdf import PdfReader
+from app.cache import extraction_cache
+from app.metrics import span, record_extraction
+from app.metric_store import metric_store
+from app.normalize import normalize_pages, NORMALIZE_PAGES
+
+# Parallel extraction settings
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+# Bumped when the stored extraction changes shape; older cache entries are re-extracted when the file is at hand
+EXTRACTION_FORMAT = 2
+
+def _clean_text(content: Optional[str]) -> str:
+    """Collapse whitespace within lines and drop blank ones; line breaks are kept for normalize_pages()"""
+    if not content:
+        return ""
+    return "\n".join(" ".join(line.split()) for line in content.splitlines() if line.strip())
+
+def _extract_page_range(path: str, start: int, stop: int) -> List[str]:
+    """Extract pages [start, stop) in a worker process (each worker opens its own reader)"""
+    reader = PdfReader(path)
+    return [_clean_text(reader.pages[i].extract_text()) for i in range(start, stop)]
+
+def shard_page_ranges(page_count: int, shards: int) -> List[Tuple[int, int]]:
+    """Split page indexes into contiguous, nearly equal [start, stop) ranges"""
+    shards = max(1, min(shards, page_count))
+    size, extra = divmod(page_count, shards)
+    ranges = []
+    start = 0
+    for i in range(shards):
+        stop = start + size + (1 if i < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+def extract_pages(path: str, workers: Optional[int] = None, executor: Optional[Executor] = None) -> Dict[str, Any]:
+    """Extract cleaned per-page text from a PDF along with page count and timings
+
+    Documents with at least PDF_PARALLEL_MIN_PAGES pages are sharded into page
+    ranges and extracted on a process pool (`executor` if given, otherwise a
+    temporary ProcessPoolExecutor with `workers` processes). When an executor
+    is given, smaller documents are still parsed on it as a single shard.
+    """
+    workers = PDF_EXTRACT_WORKERS if workers is None else workers
+    started = time.perf_counter()
+    reader = PdfReader(path)
+    page_count = len(reader.pages)
+    opened = time.perf_counter()
+
+    parallel = (workers > 1 or executor is not None) and page_count >= PDF_PARALLEL_MIN_PAGES
+    if parallel or (executor is not None and page_count):
+        # A few shards per worker keeps the pool busy when pages vary in cost
+        shard_count = max(workers, 1) * 2 if parallel else 1
+        ranges = shard_page_ranges(page_count, shard_count)
+        if executor is not None:
+            futures = [executor.submit(_extract_page_range, path, start, stop) for start, stop in ranges]
+            shards = [future.result() for future in futures]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_extract_page_range, path, start, stop) for start, stop in ranges]
+                shards = [future.result() for future in futures]
+        pages = [content for shard in shards for content in shard]
+    else:
+        pages = [_clean_text(page.extract_text()) for page in reader.pages]
+
+    finished = time.perf_counter()
+    return {
+        "pages": pages,
+        "page_count": page_count,
+        "timings": {
+            "open_seconds": round(opened - started, 4),
+            "extract_seconds": round(finished - opened, 4),
+            "total_seconds": round(finished - started, 4),
+            "parallel": parallel
+        }
+    }
+
+def format_pages(pages) -> str:
+    """Render per-page text in the '[Page N]' layout the analysis prompt expects"""
+    sections = [f"[Page {page_num}]\n{content}" for page_num, content in enumerate(pages, 1) if content]
+    if not sections:
+        return "No text could be extracted from the document. The file might be scanned or image-based."
+    return "\n\n".join(sections)
+
+def prompt_pages(extraction: Dict[str, Any]) -> List[str]:
+    """Per-page text to put in prompts: the normalized pages when normalization is on"""
+    if NORMALIZE_PAGES and extraction.get("normalized_pages") is not None:
+        return extraction["normalized_pages"]
+    return extraction["pages"]
+
+def _normalize_extraction(extraction: Dict[str, Any], executor: Optional[Executor] = None):
+    # CPU-bound like parsing, so it runs on the same process pool when there is one
+    if executor is not None:
+        normalized, stats = executor.submit(normalize_pages, extraction["pages"]).result()
+    else:
+        normalized, stats = normalize_pages(extraction["pages"])
+    extraction.update({"normalized_pages": normalized, "normalization": stats})
+    print(f"🧹 Normalized pages: {stats['raw_tokens']} -> {stats['normalized_tokens']} tokens")
+
+def get_document_extraction(document_id: str, path: Optional[str] = None, filename: Optional[str] = None,
+                            executor: Optional[Executor] = None) -> Optional[Dict[str, Any]]:
+    """Return the cached extraction for a document, extracting and caching it from `path` on a miss"""
+    extraction = extraction_cache.get(document_id)
+    if extraction is not None and (extraction.get("format") == EXTRACTION_FORMAT or path is None):
+        print(f"⚡ Reusing extraction for document {document_id[:12]}")
+        if NORMALIZE_PAGES and "normalization" not in extraction:
+            _normalize_extraction(extraction, executor)
+            extraction_cache.set(document_id, extraction)
+        # Extracted by another process (e.g. a Celery worker): index it here too
+        metric_store.index(extraction)
+        return extraction
+
+    if path is None:
+        return None
+
+    print(f"📄 Reading document: {path}")
+    started = time.perf_counter()
+    with span("extract"):
+        extraction = extract_pages(path, executor=executor)
+    record_extraction(extraction["page_count"], time.perf_counter() - started)
+    extraction.update({
+        "document_id": document_id,
+        "filename": filename or os.path.basename(path),
+        "extracted_at": datetime.now().isoformat(),
+        "format": EXTRACTION_FORMAT
+    })
+    if NORMALIZE_PAGES:
+        _normalize_extraction(extraction, executor)
+    extraction_cache.set(document_id, extraction)
+    metric_store.index(extraction)
+    print(f"✅ Successfully read {extraction['page_count']} pages")
+    return extraction
 
 def read_financial_document(path: str) -> str:
     """Extract and clean text content from a financial PDF document"""
@@ -11,23 +146,12 @@ def read_financial_document(path: str) -> str:
     try:
         if not os.path.exists(path):
             return f"Error: File not found at path '{path}'"
-            
-        reader = PdfReader(path)
-        full_report = ""
-        
-        for page_num, page in enumerate(reader.pages, 1):
-            content = page.extract_text()
-            if content:
-                # Clean up the text
-                content = ' '.join(content.split())
-                full_report += f"[Page {page_num}]\n{content}\n\n"
-        
-        if not full_report.strip():
-            return "No text could be extracted from the document. The file might be scanned or image-based."
-        
-        print(f"✅ Successfully read {len(reader.pages)} pages")
-        return full_report.strip()
-        
+
+        extraction = extract_pages(path)
+        print(f"✅ Successfully read {extraction['page_count']} pages")
+        pages = normalize_pages(extraction["pages"])[0] if NORMALIZE_PAGES else extraction["pages"]
+        return format_pages(pages)
+
     except Exception as e:
         return f"Error reading PDF: {str(e)}"
 
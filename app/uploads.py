@@ -0,0 +1,84 @@
+import os
+import time
+import hashlib
+import logging
+from typing import Any, Dict
+
+from fastapi import UploadFile, HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from app.metrics import observe_stage
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Upload limits
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "data")
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "250")) * 1024 * 1024
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB (0.0 where unsupported)"""
+    if resource is None:
+        return 0.0
+    # ru_maxrss is in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def too_large_error(size: int, limit: int = MAX_UPLOAD_BYTES) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Upload of {size} bytes exceeds the {limit} byte limit"
+    )
+
+async def save_upload(file: UploadFile, file_path: str, max_bytes: int = MAX_UPLOAD_BYTES) -> Dict[str, Any]:
+    """Stream an upload to disk in fixed-size chunks, hashing it on the way
+
+    Never holds more than UPLOAD_CHUNK_SIZE bytes of the upload in memory and
+    aborts as soon as max_bytes is exceeded. Returns the content hash
+    (the document_id) and transfer statistics.
+    """
+    # Starlette knows the size once the multipart body is spooled
+    if file.size is not None and file.size > max_bytes:
+        raise too_large_error(file.size, max_bytes)
+
+    started = time.perf_counter()
+    hasher = hashlib.sha256()
+    size = 0
+    largest_chunk = 0
+
+    try:
+        with open(file_path, "wb") as out:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise too_large_error(size, max_bytes)
+                largest_chunk = max(largest_chunk, len(chunk))
+                hasher.update(chunk)
+                await run_in_threadpool(out.write, chunk)
+    except BaseException:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+
+    seconds = time.perf_counter() - started
+    observe_stage("upload", seconds)
+    stats = {
+        "document_id": hasher.hexdigest(),
+        "bytes": size,
+        "seconds": round(seconds, 4),
+        "bytes_per_sec": round(size / seconds) if seconds > 0 else None,
+        "buffer_peak_bytes": largest_chunk,
+        "process_peak_rss_mb": peak_rss_mb()
+    }
+    logger.info(
+        f"📥 Streamed {size} bytes in {stats['seconds']}s "
+        f"({stats['bytes_per_sec']} B/s, peak RSS {stats['process_peak_rss_mb']} MB)"
+    )
+    return stats
@@ -1,54 +1,90 @@
 import os
-import json
-from celery import Celery
-from datetime import datetime
-from crewai import Crew, Process
-from app.agents import financial_analyst
-from app.tasks import analyze_financial_document
-from app.tools import read_financial_document
+import time
+from celery import Celery, states
+from celery.signals import worker_process_init, worker_process_shutdown
+from celery.result import AsyncResult
+from celery.backends.base import KeyValueStoreBackend
+from app.crew_pool import analysis_crews, kickoff
+from app.tools import get_document_extraction, format_pages, prompt_pages
+from app.normalize import apply_token_budget
+from app.agents import MODEL_NAME
+from app.result_store import RESULT_STORE, get_result_store, analysis_record, to_mongo
+from app.database import MONGO_ENABLED, init_sync_client, close_sync_client, get_sync_db
+from app.metrics import span, start_timings, start_llm_usage
+from app.llm_scheduler import set_llm_priority
+from app.quotas import usage_accountant
+from app.executors import ANONYMOUS_USER
 
 # Redis connection
-REDIS_URL = "redis://localhost:6379/0"
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", REDIS_URL)
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", REDIS_URL)
+
+# Run tasks inline (no broker or worker needed) - useful for tests and local runs.
+# Pair with CELERY_BROKER_URL=memory:// and CELERY_RESULT_BACKEND=cache+memory://
+CELERY_TASK_ALWAYS_EAGER = os.getenv("CELERY_TASK_ALWAYS_EAGER", "false").lower() in ("1", "true", "yes")
 
 # Create Celery app
 celery_app = Celery(
     "financial_analyzer",
-    broker=REDIS_URL,
-    backend=REDIS_URL
+    broker=CELERY_BROKER_URL,
+    backend=CELERY_RESULT_BACKEND
+)
+celery_app.conf.update(
+    task_track_started=True,
+    task_always_eager=CELERY_TASK_ALWAYS_EAGER,
+    task_store_eager_result=True,
+    result_extended=True
 )
 
-# Simple JSON database
-DB_FILE = "results.json"
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    # Each prefork child gets its own MongoDB client instead of the parent's (or one per task)
+    init_sync_client()
+    usage_accountant.start()
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    # Last usage flush needs the client, so it goes first
+    usage_accountant.stop()
+    close_sync_client()
 
-def save_result(document_id, filename, query, result):
-    """Save result to JSON file"""
+def save_result(document_id, filename, query, result, processing_time=None, timings=None):
+    """Save result to the configured result store (see app/result_store.py), in the API's record schema"""
+    record = analysis_record(
+        document_id, query, str(result), processing_time or 0.0,
+        filename=filename, mode="single", timings=timings, model=MODEL_NAME
+    )
     try:
-        if os.path.exists(DB_FILE):
-            with open(DB_FILE, 'r') as f:
-                data = json.load(f)
-        else:
-            data = []
-        
-        data.append({
-            "document_id": document_id,
-            "filename": filename,
-            "query": query,
-            "result": str(result),
-            "timestamp": datetime.now().isoformat(),
-            "status": "completed"
-        })
-        
-        with open(DB_FILE, 'w') as f:
-            json.dump(data, f, indent=2)
-            print(f"✅ Result saved for {filename}")
+        get_result_store().insert(record)
+        print(f"✅ Result saved for {filename}")
             
     except Exception as e:
         print(f"❌ Save error: {e}")
+    
+    # Keep MongoDB's analysis_results complete too (the API mirrors its results there the same way)
+    if MONGO_ENABLED and RESULT_STORE != "mongo":
+        try:
+            get_sync_db().analysis_results.insert_one(to_mongo(record))
+        except Exception as e:
+            print(f"⚠️ MongoDB copy not saved: {e}")
+
+def load_results(limit=50, cursor=None, document_id=None):
+    """Return (total, newest-first page of saved results, next page's cursor), optionally for one document"""
+    store = get_result_store()
+    results, next_cursor = store.page(limit, cursor, document_id)
+    return store.count(document_id), results, next_cursor
 
 @celery_app.task(bind=True)
-def analyze_document_task(self, document_id, file_path, filename, query):
+def analyze_document_task(self, document_id, file_path, filename, query, user_id=None):
     """Background task for document analysis"""
     
+    started = time.perf_counter()
+    timings = start_timings()
+    # Queued work yields the model to interactive requests
+    set_llm_priority("background")
+    llm_usage = start_llm_usage()
+    page_count = 0
     try:
         print(f"\n🚀 Starting analysis task for {filename}")
         
@@ -56,50 +92,123 @@ def analyze_document_task(self, document_id, file_path, filename, query):
         self.update_state(state="PROGRESS", meta={"progress": 10, "status": "Reading document..."})
         print("📄 Reading document...")
         
-        # Read document
-        document_text = read_financial_document(file_path)
+        # Read document (reuses a cached extraction when the same file was seen before)
+        extraction = get_document_extraction(document_id, file_path, filename)
+        page_count = extraction["page_count"]
+        document_text = format_pages(apply_token_budget(prompt_pages(extraction))[0])
         
         # Update progress
         self.update_state(state="PROGRESS", meta={"progress": 50, "status": "Analyzing with AI..."})
         print("🤖 Analyzing with AI...")
         
-        # Run analysis
-        crew = Crew(
-            agents=[financial_analyst],
-            tasks=[analyze_financial_document],
-            process=Process.sequential,
-            verbose=True
-        )
-        
-        result = crew.kickoff({
-            'query': query,
-            'document_text': document_text
-        })
+        # Run analysis on a pooled crew (worker threads/greenlets never share one)
+        with span("llm"):
+            result, usage = kickoff(analysis_crews, {
+                'query': query,
+                'document_text': document_text
+            })
         
         print("✅ Analysis complete")
         
         # Save result
-        save_result(document_id, filename, query, result)
-        
-        # Clean up
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            print(f"🧹 Cleaned up: {file_path}")
+        self.update_state(state="PROGRESS", meta={"progress": 90, "status": "Saving result..."})
+        with span("persist"):
+            save_result(document_id, filename, query, result, round(time.perf_counter() - started, 4), timings)
         
         return {
             "document_id": document_id,
+            "filename": filename,
+            "query": query,
             "status": "completed",
-            "result": str(result)
+            "result": str(result),
+            "processing_time": round(time.perf_counter() - started, 4),
+            "timings": timings
         }
-        
+    
     except Exception as e:
+        # Re-raise so Celery records the task as FAILURE
         print(f"❌ Error: {e}")
         import traceback
         traceback.print_exc()
-        return {
-            "document_id": document_id,
-            "status": "failed",
-            "error": str(e)
-        }
+        raise
+    
+    finally:
+        # Clean up
+        if os.path.exists(file_path):
+            os.remove(file_path)
+            print(f"🧹 Cleaned up: {file_path}")
+        # The API counted the request when it queued the task; the work is counted here
+        usage_accountant.record(
+            user_id or ANONYMOUS_USER, analyses=1 if page_count else 0, pages=page_count, llm_usage=llm_usage
+        )
+
+def get_task_status(task_id):
+    """Translate Celery task state and metadata into an API response"""
+    result = AsyncResult(task_id, app=celery_app)
+    state = result.state
+    status = {"task_id": task_id, "state": state}
+
+    if state == "PENDING":
+        # Celery cannot tell "queued" from "unknown id"
+        status.update({"progress": 0, "status": "Waiting in queue (or unknown task id)"})
+    elif state == "STARTED":
+        status.update({"progress": 5, "status": "Started"})
+    elif state == "PROGRESS":
+        status.update(result.info or {})
+    elif state == "SUCCESS":
+        status.update({"progress": 100, "status": "Completed", "result": result.result})
+    elif state == "FAILURE":
+        status.update({"progress": 100, "status": "Failed", "error": str(result.result)})
+    else:
+        status.update({"status": state.title()})
+    return status
+
+def finished_tasks(task_ids, backend=None):
+    """The ids among task_ids that have succeeded or failed (blocking: asks the result backend)
+
+    Key-value backends (Redis, memcached, ...) answer for all of them in one
+    MGET; others are asked task by task. `backend` defaults to the app's.
+    """
+    task_ids = list(task_ids)
+    backend = backend or celery_app.backend
+    if not isinstance(backend, KeyValueStoreBackend):
+        return {task_id for task_id in task_ids if AsyncResult(task_id, app=celery_app, backend=backend).ready()}
+
+    keys = [backend.get_key_for_task(task_id) for task_id in task_ids]
+    values = backend.mget(keys)
+    # Redis answers with a list in key order, memcached and the cache backend with a dict by key
+    if hasattr(values, "get"):
+        values = [values.get(key) for key in keys]
+    return {
+        task_id for task_id, value in zip(task_ids, values)
+        if value is not None and backend.decode_result(value)["status"] in states.READY_STATES
+    }
+
+def get_queue_stats(queue_name="celery", timeout=1.0):
+    """Broker queue depth plus active/reserved task counts from live workers"""
+    if celery_app.conf.task_always_eager:
+        return {"mode": "eager", "active_workers": 0, "active_tasks": 0, "reserved_tasks": 0, "queued_tasks": 0}
+
+    stats = {"mode": "broker", "queue": queue_name}
+
+    inspector = celery_app.control.inspect(timeout=timeout)
+    workers = inspector.ping() or {}
+    active = inspector.active() or {}
+    reserved = inspector.reserved() or {}
+    stats["active_workers"] = len(workers)
+    stats["workers"] = sorted(workers)
+    stats["active_tasks"] = sum(len(tasks) for tasks in active.values())
+    stats["reserved_tasks"] = sum(len(tasks) for tasks in reserved.values())
+
+    try:
+        with celery_app.connection_for_read() as conn:
+            declared = conn.default_channel.queue_declare(queue=queue_name, passive=True)
+            stats["queued_tasks"] = declared.message_count
+    except Exception as e:
+        # The queue does not exist until the first task is published
+        stats["queued_tasks"] = 0
+        stats["queue_error"] = str(e)
+
+    return stats
 
 print("✅ Celery worker initialized successfully")
\ No newline at end of file
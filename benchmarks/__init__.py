@@ -0,0 +1 @@
+# Benchmarks for the analysis pipeline (run with: python -m benchmarks.<name>)
\ No newline at end of file
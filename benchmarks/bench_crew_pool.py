@@ -0,0 +1,105 @@
+"""Per-request Crew construction (old behaviour) vs the crew pool
+
+Measures (1) setup overhead per request and (2) throughput with N threads
+issuing analyses concurrently. Crew.kickoff is replaced by a sleep of
+--llm-seconds so only our own setup cost and contention are measured; the
+old path also reuses one shared Task across threads, which is what made
+concurrent kickoffs unsafe.
+
+Usage:
+    python -m benchmarks.bench_crew_pool --requests 200 --concurrency 8 --llm-seconds 0.05
+"""
+import os
+import json
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder-key")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")  # no crewai telemetry calls
+
+from crewai import Crew, Process
+
+from app.agents import get_financial_analyst
+from app.tasks import get_analysis_task, build_analysis_task
+from app.crew_pool import CrewPool, kickoff
+
+def per_request_crew():
+    # What run_crew did before the pool: a new Crew around the shared agent and Task
+    return Crew(
+        agents=[get_financial_analyst()],
+        tasks=[get_analysis_task()],
+        process=Process.sequential,
+        verbose=False
+    )
+
+def measure_setup(pool, requests):
+    old, new = [], []
+    for _ in range(requests):
+        started = time.perf_counter()
+        per_request_crew()
+        old.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        with pool.acquire():
+            pass
+        new.append(time.perf_counter() - started)
+    return {
+        "per_request_setup_ms": round(statistics.median(old) * 1000, 3),
+        "pooled_setup_ms": round(statistics.median(new) * 1000, 3)
+    }
+
+def measure_throughput(run_one, requests, concurrency):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda i: run_one(i), range(requests)))
+    elapsed = time.perf_counter() - started
+    return round(requests / elapsed, 1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-seconds", type=float, default=0.05)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    def fake_kickoff(self, inputs=None):
+        self.tasks[0].interpolate_inputs(inputs or {})
+        time.sleep(args.llm_seconds)
+        return self.tasks[0].description
+
+    Crew.kickoff = fake_kickoff
+
+    pool = CrewPool("benchmark", build_analysis_task, size=args.concurrency, verbose=False)
+    pool.prewarm()
+
+    inputs = lambda i: {"query": f"question {i}", "document_text": f"document {i}"}
+
+    def old_path(i):
+        return per_request_crew().kickoff(inputs(i))
+
+    def pooled_path(i):
+        return kickoff(pool, inputs(i))[0]
+
+    result = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "llm_seconds": args.llm_seconds,
+        **measure_setup(pool, args.requests),
+        "per_request_rps": measure_throughput(old_path, args.requests, args.concurrency),
+        "pooled_rps": measure_throughput(pooled_path, args.requests, args.concurrency),
+        "pool": pool.stats()
+    }
+    print(
+        f"setup per request: {result['per_request_setup_ms']} ms → pooled {result['pooled_setup_ms']} ms\n"
+        f"throughput at concurrency {args.concurrency}: {result['per_request_rps']} → {result['pooled_rps']} req/s"
+    )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
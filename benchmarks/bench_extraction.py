@@ -0,0 +1,66 @@
+"""Serial vs process-pool PDF extraction on synthetic multi-hundred-page PDFs
+
+Usage:
+    python -m benchmarks.bench_extraction --pages 100 300 600 --workers 4
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+from app.tools import extract_pages
+from benchmarks.synthetic_pdf import write_pdf
+
+def _time_extraction(path, workers, repeat):
+    samples = []
+    pages = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        extraction = extract_pages(path, workers=workers)
+        samples.append(time.perf_counter() - started)
+        pages = extraction["pages"]
+    return statistics.median(samples), pages
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 300, 600])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    # Force the parallel path for every size being compared
+    import app.tools
+    app.tools.PDF_PARALLEL_MIN_PAGES = 1
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for page_count in args.pages:
+            path = write_pdf(os.path.join(tmp, f"synthetic_{page_count}.pdf"), page_count)
+            serial_seconds, serial_pages = _time_extraction(path, 1, args.repeat)
+            parallel_seconds, parallel_pages = _time_extraction(path, args.workers, args.repeat)
+            if serial_pages != parallel_pages:
+                raise SystemExit(f"❌ Parallel output differs from serial output for {page_count} pages")
+
+            results.append({
+                "pages": page_count,
+                "workers": args.workers,
+                "serial_seconds": round(serial_seconds, 4),
+                "parallel_seconds": round(parallel_seconds, 4),
+                "speedup": round(serial_seconds / parallel_seconds, 2) if parallel_seconds else None,
+                "serial_pages_per_sec": round(page_count / serial_seconds, 1),
+                "parallel_pages_per_sec": round(page_count / parallel_seconds, 1)
+            })
+
+    print(f"{'pages':>6} {'serial s':>10} {'parallel s':>11} {'speedup':>8}")
+    for row in results:
+        print(f"{row['pages']:>6} {row['serial_seconds']:>10} {row['parallel_seconds']:>11} {row['speedup']:>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Per-stage cost of the /analyze pipeline on synthetic PDFs
+
+Each stage is timed on its own for every document size:
+    upload_write  streaming the upload to disk (save_upload)
+    extract       read_financial_document
+    prompt        format_pages + filling the analysis task prompt
+    prefilter     BM25 page pre-filter (documents of PREFILTER_MIN_PAGES or more)
+    run_crew      one pooled crew kickoff against the fake LLM backend
+    persist       save_result into the configured result store
+
+The fake LLM answers instantly unless --llm-latency is given, so run_crew
+measures CrewAI and our own overhead rather than model time.
+
+Usage:
+    python -m benchmarks.bench_pipeline --pages 1 50 500 --repeat 5 --json pipeline.json
+    python -m benchmarks.bench_pipeline --store mongo
+"""
+import io
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+
+from benchmarks.common import configure_environment, summarize_ms, run_metadata
+from benchmarks.synthetic_pdf import build_pdf
+
+QUERY = "Is the company profitable and how leveraged is it?"
+
+def _timed(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    return summarize_ms(samples), result
+
+async def _time_uploads(pdf_bytes, directory, repeat):
+    from starlette.datastructures import UploadFile
+    from app.uploads import save_upload
+
+    samples = []
+    for i in range(repeat):
+        upload = UploadFile(io.BytesIO(pdf_bytes), filename="bench.pdf")
+        path = os.path.join(directory, f"upload_{i}.pdf")
+        started = time.perf_counter()
+        await save_upload(upload, path)
+        samples.append(time.perf_counter() - started)
+        os.remove(path)
+    return summarize_ms(samples)
+
+def bench_document(page_count, repeat, workdir):
+    from app.tools import read_financial_document, extract_pages, format_pages
+    from app.streaming import build_analysis_prompt
+    from app.retrieval import prefilter_pages, PREFILTER_MIN_PAGES
+    from app.mapreduce import estimate_tokens
+    from app.cache import hash_bytes
+    from app.worker import save_result
+    import app.main
+
+    pdf_bytes = build_pdf(page_count)
+    path = os.path.join(workdir, f"synthetic_{page_count}.pdf")
+    with open(path, "wb") as f:
+        f.write(pdf_bytes)
+    document_id = hash_bytes(pdf_bytes)
+    pages = extract_pages(path)["pages"]
+
+    stages = {"upload_write": asyncio.run(_time_uploads(pdf_bytes, workdir, repeat))}
+    stages["extract"], _ = _timed(lambda: read_financial_document(path), repeat)
+    stages["prompt"], prompt = _timed(lambda: build_analysis_prompt(QUERY, format_pages(pages)), repeat)
+    if page_count >= PREFILTER_MIN_PAGES:
+        stages["prefilter"], _ = _timed(lambda: prefilter_pages(pages, QUERY), repeat)
+    document_text = format_pages(pages)
+    stages["run_crew"], analysis = _timed(lambda: app.main.run_crew(QUERY, document_text), repeat)
+    stages["persist"], _ = _timed(lambda: save_result(document_id, "bench.pdf", QUERY, analysis), repeat)
+
+    return {
+        "pages": page_count,
+        "pdf_bytes": len(pdf_bytes),
+        "prompt_tokens": estimate_tokens(prompt),
+        "extract_pages_per_sec": round(page_count / (stages["extract"]["median_ms"] / 1000), 1),
+        "stages": stages,
+    }
+
+def run(pages, repeat, workdir):
+    return [bench_document(page_count, repeat, workdir) for page_count in pages]
+
+def print_report(results):
+    for row in results:
+        cells = ", ".join(f"{name} {stats['median_ms']} ms" for name, stats in row["stages"].items())
+        print(f"{row['pages']:>4} pages ({row['prompt_tokens']} prompt tokens): {cells}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--store", choices=["sqlite", "jsonl", "mongo"], default="sqlite")
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_environment(workdir, store=args.store, llm_latency=args.llm_latency)
+        results = run(args.pages, args.repeat, workdir)
+    print_report(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"meta": {**run_metadata(), "args": vars(args)}, "pipeline": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
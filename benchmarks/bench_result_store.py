@@ -0,0 +1,94 @@
+"""Insert and lookup cost of the result store backends as the store grows
+
+Reports insert throughput per window of records; constant-time inserts show
+up as a flat rate from the first window to the last.
+
+Usage:
+    python -m benchmarks.bench_result_store --records 1000000 --backends sqlite jsonl
+    python -m benchmarks.bench_result_store --records 100000 --backends mongo
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+
+from app.result_store import SqliteResultStore, JsonlResultStore, MongoResultStore, analysis_record
+
+def _make_store(backend, directory):
+    if backend == "sqlite":
+        return SqliteResultStore(os.path.join(directory, "results.db"))
+    if backend == "jsonl":
+        return JsonlResultStore(os.path.join(directory, "results.jsonl"))
+    if backend == "mongo":
+        return MongoResultStore()
+    raise SystemExit(f"Unknown backend {backend}")
+
+def _record(i, document_count):
+    # The same record schema the API and Celery tasks write
+    return analysis_record(
+        f"doc-{i % document_count:08d}", "Summarize liquidity and leverage", "EXECUTIVE SUMMARY ... " * 10, 1.0,
+        filename=f"report_{i}.pdf", mode="single", model="benchmark"
+    )
+
+def run_backend(backend, records, window, documents, lookups):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = _make_store(backend, tmp)
+        windows = []
+        window_started = time.perf_counter()
+        for i in range(records):
+            store.insert(_record(i, documents))
+            if (i + 1) % window == 0:
+                elapsed = time.perf_counter() - window_started
+                windows.append({
+                    "records": i + 1,
+                    "inserts_per_sec": round(window / elapsed),
+                    "us_per_insert": round(elapsed / window * 1e6, 2)
+                })
+                print(f"  {backend:>6} {i + 1:>9,} records: {windows[-1]['us_per_insert']:>8} µs/insert")
+                window_started = time.perf_counter()
+
+        rng = random.Random(1)
+        started = time.perf_counter()
+        for _ in range(lookups):
+            store.find_by_document(f"doc-{rng.randrange(documents):08d}")
+        lookup_ms = (time.perf_counter() - started) / lookups * 1000
+        store.close()
+
+    first, last = windows[0]["us_per_insert"], windows[-1]["us_per_insert"]
+    return {
+        "backend": backend,
+        "records": records,
+        "windows": windows,
+        "first_window_us_per_insert": first,
+        "last_window_us_per_insert": last,
+        "insert_cost_growth": round(last / first, 2),
+        # The first lookup on a jsonl store also builds its index
+        "lookup_ms": round(lookup_ms, 3)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--window", type=int, default=None, help="Records per measurement window")
+    parser.add_argument("--documents", type=int, default=10_000, help="Distinct document ids")
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--backends", nargs="+", default=["sqlite", "jsonl"])
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+    window = args.window or max(args.records // 10, 1)
+
+    results = [run_backend(b, args.records, window, args.documents, args.lookups) for b in args.backends]
+    for row in results:
+        print(
+            f"{row['backend']:>6}: {row['first_window_us_per_insert']} → {row['last_window_us_per_insert']} µs/insert "
+            f"(x{row['insert_cost_growth']}), lookup by document_id {row['lookup_ms']} ms"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
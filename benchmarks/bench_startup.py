@@ -0,0 +1,76 @@
+"""Cold-start time of `python -c "import app.main"`
+
+Each run is a fresh interpreter. GOOGLE_API_KEY is cleared so any accidental
+model call at import time fails loudly instead of adding a network round trip.
+
+Usage:
+    python -m benchmarks.bench_startup --runs 5 --module app.main app.worker
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+def time_import(module, runs):
+    env = dict(os.environ, GOOGLE_API_KEY="", LLM_WARMUP="false")
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, "-c", f"import {module}"],
+            env=env, capture_output=True, text=True
+        )
+        samples.append(time.perf_counter() - started)
+        if completed.returncode != 0:
+            raise SystemExit(f"❌ import {module} failed:\n{completed.stderr[-2000:]}")
+    return {
+        "module": module,
+        "runs": runs,
+        "median_seconds": round(statistics.median(samples), 3),
+        "min_seconds": round(min(samples), 3),
+        "max_seconds": round(max(samples), 3)
+    }
+
+def slowest_imports(module, top):
+    """Largest cumulative import times reported by -X importtime"""
+    env = dict(os.environ, GOOGLE_API_KEY="", LLM_WARMUP="false")
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env, capture_output=True, text=True
+    )
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time: <self us> | <cumulative us> | <module>"
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), name.strip()))
+    rows.sort(reverse=True)
+    return [{"module": name, "cumulative_ms": round(us / 1000, 1)} for us, name in rows[:top]]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--module", nargs="+", default=["app.main"])
+    parser.add_argument("--top", type=int, default=10, help="Show the N slowest imports")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    for module in args.module:
+        row = time_import(module, args.runs)
+        row["slowest_imports"] = slowest_imports(module, args.top)
+        results.append(row)
+        print(f"import {module}: median {row['median_seconds']}s (min {row['min_seconds']}s, max {row['max_seconds']}s)")
+        for item in row["slowest_imports"]:
+            print(f"    {item['cumulative_ms']:>9} ms  {item['module']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
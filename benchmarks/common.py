@@ -0,0 +1,59 @@
+"""Helpers shared by the end-to-end benchmarks (environment setup, percentiles, run metadata)"""
+import os
+import sys
+import platform
+import subprocess
+from datetime import datetime
+
+def configure_environment(workdir: str, store: str = "sqlite", llm_latency: float = 0.0,
+                          llm_jitter: float = 0.0, tokens_per_sec: float = 0.0):
+    """Point the app at the fake LLM and at scratch directories; call before importing app modules"""
+    os.environ.update({
+        "LLM_BACKEND": "fake",
+        "FAKE_LLM_LATENCY": str(llm_latency),
+        "FAKE_LLM_JITTER": str(llm_jitter),
+        "FAKE_LLM_TOKENS_PER_SEC": str(tokens_per_sec),
+        "LLM_WARMUP": "false",
+        "CREW_VERBOSE": "false",
+        "OTEL_SDK_DISABLED": "true",  # no crewai telemetry calls
+        "UPLOAD_DIR": os.path.join(workdir, "data"),
+        "CACHE_DIR": os.path.join(workdir, "cache"),
+        "RESULT_STORE": store,
+        "MONGO_ENABLED": "true" if store == "mongo" else "false",
+    })
+    if store != "mongo":
+        os.environ["RESULT_STORE_PATH"] = os.path.join(workdir, f"results.{'db' if store == 'sqlite' else store}")
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def summarize_ms(samples):
+    """Latency summary in milliseconds for a list of durations in seconds"""
+    ms = [s * 1000 for s in samples]
+    return {
+        "runs": len(ms),
+        "median_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "min_ms": round(min(ms), 3),
+    }
+
+def _git(*args):
+    try:
+        return subprocess.run(
+            ["git", *args], capture_output=True, text=True, timeout=10, cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+def run_metadata():
+    """Where and on what a benchmark ran, so reports from different commits can be lined up"""
+    return {
+        "commit": _git("rev-parse", "HEAD") or None,
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
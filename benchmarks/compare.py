@@ -0,0 +1,69 @@
+"""Compare two benchmark reports and flag regressions
+
+Works with reports from run_suite, bench_pipeline or load_analyze. Stage
+medians and load-test percentiles are lower-is-better, req/s is
+higher-is-better. A metric regresses when it is worse by more than
+--tolerance (relative) and, for latencies, by more than --min-ms; the exit
+status is 1 if anything regressed, so this can gate CI.
+
+Usage:
+    python -m benchmarks.compare base.json head.json --tolerance 0.10
+"""
+import sys
+import json
+import argparse
+
+def flatten(report):
+    """{metric name: (value, higher_is_better)}"""
+    metrics = {}
+    for row in report.get("pipeline", []):
+        for stage, stats in row["stages"].items():
+            metrics[f"pipeline/{row['pages']}p/{stage}_ms"] = (stats["median_ms"], False)
+        metrics[f"pipeline/{row['pages']}p/extract_pages_per_sec"] = (row["extract_pages_per_sec"], True)
+    load = report.get("load")
+    if load:
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            metrics[f"load/{key}"] = (load[key], False)
+        metrics["load/rps"] = (load["rps"], True)
+    return metrics
+
+def compare(base, head, tolerance, min_ms):
+    base_metrics, head_metrics = flatten(base), flatten(head)
+    rows, regressions = [], []
+    for name in sorted(set(base_metrics) & set(head_metrics)):
+        (old, higher_is_better), (new, _) = base_metrics[name], head_metrics[name]
+        change = (new - old) / old if old else 0.0
+        worse = -change if higher_is_better else change
+        regressed = worse > tolerance and not (name.endswith("_ms") and abs(new - old) < min_ms)
+        rows.append((name, old, new, change, regressed))
+        if regressed:
+            regressions.append(name)
+    return rows, regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    parser.add_argument("--min-ms", type=float, default=1.0, help="Ignore latency changes smaller than this")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    rows, regressions = compare(base, head, args.tolerance, args.min_ms)
+    base_commit = (base.get("meta", {}).get("commit") or "?")[:10]
+    head_commit = (head.get("meta", {}).get("commit") or "?")[:10]
+    print(f"{'metric':<44} {base_commit:>12} {head_commit:>12} {'change':>8}")
+    for name, old, new, change, regressed in rows:
+        print(f"{name:<44} {old:>12.3f} {new:>12.3f} {change:>+8.1%}{'  ❌' if regressed else ''}")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+        sys.exit(1)
+    print(f"\n✅ No regressions beyond {args.tolerance:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""HTTP load test of /analyze against the in-process FastAPI app and the fake LLM
+
+The document is ingested once through /documents, then --requests analyses
+of it (result cache off) are issued with --concurrency in flight. Requests
+rejected by admission control (429) are counted but excluded from the
+latency percentiles.
+
+Usage:
+    python -m benchmarks.load_analyze --requests 200 --concurrency 8 --pages 20 --llm-latency 0.2
+    python -m benchmarks.load_analyze --upload   # send the PDF with every request instead
+"""
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+
+import httpx
+
+from benchmarks.common import configure_environment, percentile, run_metadata
+from benchmarks.synthetic_pdf import build_pdf
+
+async def _load(app, pdf_bytes, requests, concurrency, upload):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        response = await client.post("/documents", files={"file": ("report.pdf", pdf_bytes, "application/pdf")})
+        response.raise_for_status()
+        document_id = response.json()["document_id"]
+
+        slots = asyncio.Semaphore(concurrency)
+        latencies, statuses = [], []
+
+        async def analyze(i):
+            data = {"query": f"Question {i}: is the company profitable?", "use_cache": "false"}
+            files = None
+            if upload:
+                files = {"file": (f"report_{i}.pdf", pdf_bytes, "application/pdf")}
+            else:
+                data["document_id"] = document_id
+            async with slots:
+                started = time.perf_counter()
+                response = await client.post("/analyze", data=data, files=files)
+                elapsed = time.perf_counter() - started
+            statuses.append(response.status_code)
+            if response.status_code == 200:
+                latencies.append(elapsed * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(analyze(i) for i in range(requests)))
+        wall = time.perf_counter() - started
+
+    return latencies, statuses, wall
+
+def run(requests, concurrency, pages, upload=False):
+    import app.main
+
+    latencies, statuses, wall = asyncio.run(_load(app.main.app, build_pdf(pages), requests, concurrency, upload))
+    if not latencies:
+        raise SystemExit(f"❌ No successful requests: {statuses}")
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "pages": pages,
+        "upload": upload,
+        "statuses": {str(code): statuses.count(code) for code in sorted(set(statuses))},
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies), 2),
+        "rps": round(len(latencies) / wall, 1),
+        "wall_seconds": round(wall, 3),
+    }
+
+def print_report(result):
+    print(
+        f"/analyze x{result['requests']} @ {result['concurrency']}: p50 {result['p50_ms']} ms, "
+        f"p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms, {result['rps']} req/s, {result['statuses']}"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--llm-jitter", type=float, default=0.05)
+    parser.add_argument("--upload", action="store_true")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_environment(workdir, llm_latency=args.llm_latency, llm_jitter=args.llm_jitter)
+        result = run(args.requests, args.concurrency, args.pages, args.upload)
+    print_report(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"meta": {**run_metadata(), "args": vars(args)}, "load": result}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
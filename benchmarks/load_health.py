@@ -0,0 +1,94 @@
+"""/health latency while N analyses are in flight
+
+run_crew is replaced by a blocking sleep of --llm-seconds so the test
+measures event-loop responsiveness, not model latency.
+
+Usage:
+    python -m benchmarks.load_health --analyses 0 4 16 --llm-seconds 2
+"""
+import time
+import json
+import asyncio
+import argparse
+import statistics
+
+import httpx
+
+import app.main
+from benchmarks.synthetic_pdf import build_pdf
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def _probe_health(client, stop, samples):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get("/health")
+        samples.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.02)
+
+async def _run_level(in_flight, pdf_bytes, duration):
+    transport = httpx.ASGITransport(app=app.main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        stop = asyncio.Event()
+        samples = []
+        probe = asyncio.create_task(_probe_health(client, stop, samples))
+
+        async def analyze(i):
+            response = await client.post(
+                "/analyze",
+                files={"file": (f"report_{i}.pdf", pdf_bytes, "application/pdf")},
+                data={"query": f"Question {i}", "use_cache": "false"}
+            )
+            return response.status_code
+
+        started = time.perf_counter()
+        statuses = await asyncio.gather(*(analyze(i) for i in range(in_flight)))
+        remaining = duration - (time.perf_counter() - started)
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+        stop.set()
+        await probe
+
+    return {
+        "analyses_in_flight": in_flight,
+        "health_requests": len(samples),
+        "health_p50_ms": round(statistics.median(samples), 2),
+        "health_p95_ms": round(_percentile(samples, 95), 2),
+        "health_max_ms": round(max(samples), 2),
+        "analyze_statuses": {str(code): statuses.count(code) for code in sorted(set(statuses))}
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--analyses", type=int, nargs="+", default=[0, 4, 16])
+    parser.add_argument("--llm-seconds", type=float, default=2.0)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    def fake_run_crew(query, document_text):
+        time.sleep(args.llm_seconds)
+        return f"Analysis of {len(document_text)} characters for: {query}"
+
+    app.main.run_crew = fake_run_crew
+    pdf_bytes = build_pdf(args.pages)
+
+    results = [
+        asyncio.run(_run_level(level, pdf_bytes, duration=args.llm_seconds + 0.5))
+        for level in args.analyses
+    ]
+    for row in results:
+        print(
+            f"in flight {row['analyses_in_flight']:>3}: /health p50 {row['health_p50_ms']} ms, "
+            f"p95 {row['health_p95_ms']} ms, max {row['health_max_ms']} ms, /analyze {row['analyze_statuses']}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
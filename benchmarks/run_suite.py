@@ -0,0 +1,54 @@
+"""Run the pipeline stage benchmark and the HTTP load test into one JSON report
+
+Reports carry the commit they were produced on; compare two of them with
+benchmarks.compare to catch regressions.
+
+Usage:
+    python -m benchmarks.run_suite --json bench-$(git rev-parse --short HEAD).json
+    python -m benchmarks.run_suite --quick --json head.json
+    python -m benchmarks.compare base.json head.json
+"""
+import json
+import argparse
+import tempfile
+
+from benchmarks.common import configure_environment, run_metadata
+from benchmarks import bench_pipeline, load_analyze
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--store", choices=["sqlite", "jsonl", "mongo"], default="sqlite")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--load-pages", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Fake LLM latency for the load test")
+    parser.add_argument("--quick", action="store_true", help="Smaller sizes for a fast smoke run")
+    parser.add_argument("--json", required=True, help="Write the report to this JSON file")
+    args = parser.parse_args()
+
+    if args.quick:
+        args.pages, args.repeat, args.requests = [1, 50], 3, 50
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Stages run against an instant fake LLM; the load test gives it realistic latency
+        configure_environment(workdir, store=args.store, llm_latency=args.llm_latency, llm_jitter=args.llm_latency / 4)
+        import app.agents
+
+        llm = app.agents.get_llm().llm
+        llm.latency, llm.jitter = 0.0, 0.0
+        pipeline = bench_pipeline.run(args.pages, args.repeat, workdir)
+
+        llm.latency, llm.jitter = args.llm_latency, args.llm_latency / 4
+        load = load_analyze.run(args.requests, args.concurrency, args.load_pages)
+
+    bench_pipeline.print_report(pipeline)
+    load_analyze.print_report(load)
+
+    with open(args.json, "w") as f:
+        json.dump({"meta": {**run_metadata(), "args": vars(args)}, "pipeline": pipeline, "load": load}, f, indent=2)
+    print(f"📄 Report written to {args.json}")
+
+if __name__ == "__main__":
+    main()
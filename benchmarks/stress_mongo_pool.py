@@ -0,0 +1,128 @@
+"""Stress the per-process sync MongoDB client the way Celery's prefork pool uses it
+
+Forks --processes children (as the prefork pool does), fires Celery's
+worker_process_init signal in each, then runs --tasks small tasks that each
+call get_sync_db() for an insert and a lookup, --threads at a time per child.
+The server's connection count (serverStatus) is sampled throughout; with one
+client per process it must stay within
+processes x (min(threads, MONGO_SYNC_MAX_POOL_SIZE) + 2 monitor sockets)
+above the baseline. --per-call reproduces the old get_sync_db(), which built
+a new MongoClient per call, for comparison. Needs a running MongoDB at
+MONGODB_URL; exits 1 if the bound is exceeded.
+
+Usage:
+    python -m benchmarks.stress_mongo_pool --tasks 5000 --processes 4 --threads 4
+    python -m benchmarks.stress_mongo_pool --tasks 500 --per-call
+"""
+import os
+import json
+import time
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")  # no crewai telemetry calls
+
+from pymongo import MongoClient
+from celery.signals import worker_process_init
+
+import app.worker  # noqa: F401  registers the worker_process_init handler
+from app.database import MONGODB_URL, DATABASE_NAME, MONGO_SYNC_POOL_OPTIONS, get_sync_db
+
+COLLECTION = "pool_stress"
+
+def _per_call_db():
+    # What get_sync_db() did before: a new client (and pool) per call, never closed
+    return MongoClient(MONGODB_URL)[DATABASE_NAME]
+
+_get_db = get_sync_db
+
+def _init_child(per_call):
+    global _get_db
+    _get_db = _per_call_db if per_call else get_sync_db
+    worker_process_init.send(sender=None)
+
+def _task(i):
+    db = _get_db()
+    db[COLLECTION].insert_one({"task": i, "pid": os.getpid()})
+    db[COLLECTION].find_one({"task": i})
+
+def _run_chunk(args):
+    tasks, threads = args
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(_task, tasks))
+    return len(tasks)
+
+def _connections(client):
+    return client.admin.command("serverStatus")["connections"]["current"]
+
+def run(tasks, processes, threads, per_call=False, chunk=50):
+    monitor = MongoClient(MONGODB_URL, serverSelectionTimeoutMS=2000)
+    monitor[DATABASE_NAME][COLLECTION].drop()
+    baseline = _connections(monitor)
+
+    samples = []
+    stop = threading.Event()
+
+    def sample():
+        while not stop.is_set():
+            samples.append(_connections(monitor))
+            stop.wait(0.1)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    chunks = [(list(range(start, min(start + chunk, tasks))), threads) for start in range(0, tasks, chunk)]
+    started = time.perf_counter()
+    with multiprocessing.get_context("fork").Pool(processes, initializer=_init_child, initargs=(per_call,)) as pool:
+        done = sum(pool.imap_unordered(_run_chunk, chunks))
+    seconds = time.perf_counter() - started
+    stop.set()
+    sampler.join()
+    final = _connections(monitor)
+
+    written = monitor[DATABASE_NAME][COLLECTION].count_documents({})
+    monitor[DATABASE_NAME][COLLECTION].drop()
+    monitor.close()
+
+    bound = processes * (min(threads, MONGO_SYNC_POOL_OPTIONS["maxPoolSize"]) + 2)
+    peak = max(samples + [final]) - baseline
+    return {
+        "tasks": done,
+        "written": written,
+        "processes": processes,
+        "threads": threads,
+        "per_call": per_call,
+        "baseline_connections": baseline,
+        "peak_extra_connections": peak,
+        "final_extra_connections": final - baseline,
+        "bound": bound,
+        "bounded": peak <= bound,
+        "tasks_per_sec": round(done / seconds, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=5000)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4, help="Concurrent tasks per child process")
+    parser.add_argument("--per-call", action="store_true", help="Use a new MongoClient per task (old behaviour)")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    result = run(args.tasks, args.processes, args.threads, args.per_call)
+    print(
+        f"{result['tasks']} tasks on {result['processes']}x{result['threads']}: peak +{result['peak_extra_connections']} "
+        f"connections (bound {result['bound']}), +{result['final_extra_connections']} at the end, "
+        f"{result['tasks_per_sec']} tasks/s"
+    )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+    if not result["bounded"]:
+        print("❌ Connection count exceeded the bound")
+        raise SystemExit(1)
+    print("✅ Connection count stayed bounded")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Dependency-free generator for synthetic multi-page financial PDFs"""
+import random
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def _page_lines(page_num: int, page_count: int, rng: random.Random):
+    year = 2024
+    revenue = rng.randint(800, 5000)
+    lines = [
+        "ACME Holdings Inc. - Annual Report 2024",
+        f"Section {page_num // 25 + 1}: Management Discussion and Analysis",
+        "",
+    ]
+    if page_num % 10 == 1:
+        lines += [
+            "CONSOLIDATED STATEMENTS OF INCOME (in millions)",
+            f"                         {year}      {year - 1}",
+            f"Revenue                  {revenue:,}    {int(revenue * 0.9):,}",
+            f"Cost of revenue          {int(revenue * 0.55):,}    {int(revenue * 0.5):,}",
+            f"Net income               {int(revenue * 0.12):,}    {int(revenue * 0.1):,}",
+            f"Total assets             {revenue * 3:,}    {int(revenue * 2.8):,}",
+            f"Total liabilities        {int(revenue * 1.4):,}    {int(revenue * 1.3):,}",
+            "",
+        ]
+    for _ in range(28):
+        words = rng.choice([
+            "Operating margin improved as pricing actions offset input cost inflation.",
+            "Liquidity remained strong with cash and equivalents covering current liabilities.",
+            "The company continued to invest in capacity expansion across core segments.",
+            "Free cash flow conversion was supported by disciplined working capital management.",
+            "Management expects revenue growth in the mid single digits for the next fiscal year.",
+            "Debt maturities are well laddered and the revolving facility remains undrawn.",
+        ])
+        lines.append(words)
+    lines += ["", "Forward-looking statements involve risks and uncertainties.", f"Page {page_num} of {page_count}"]
+    return lines
+
+def build_pdf(page_count: int, seed: int = 7) -> bytes:
+    """Return the bytes of a text-based PDF with `page_count` pages"""
+    rng = random.Random(seed)
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog_id = add(b"")  # filled in once the page tree exists
+    pages_id = add(b"")
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_ids = []
+    for page_num in range(1, page_count + 1):
+        text_ops = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+        for line in _page_lines(page_num, page_count, rng):
+            text_ops.append(f"({_escape(line)}) Tj T*")
+        text_ops.append("ET")
+        stream = "\n".join(text_ops).encode("latin-1")
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font_id, content_id)
+        ))
+
+    kids = b" ".join(b"%d 0 R" % pid for pid in page_ids)
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % page_count
+    objects[catalog_id - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for obj_id, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % obj_id + body + b"\nendobj\n"
+
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog_id, xref_offset)
+    return bytes(out)
+
+def write_pdf(path: str, page_count: int, seed: int = 7) -> str:
+    with open(path, "wb") as f:
+        f.write(build_pdf(page_count, seed))
+    return path
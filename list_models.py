@@ -1,10 +1,21 @@
 import os
 from dotenv import load_dotenv
-import google.generativeai as genai
 
 # Load environment variables
 load_dotenv()
 
+# Offline backends have nothing to list
+backend = os.getenv('LLM_BACKEND', 'gemini')
+if backend != 'gemini':
+    from app.llm_backends import LLM_BACKENDS, model_name
+    print(f"ℹ️ LLM_BACKEND={backend}: no API calls made")
+    print(f"   Model name used in results and cache keys: {model_name()}")
+    print(f"   Available backends: {', '.join(sorted(LLM_BACKENDS))}")
+    exit(0)
+
+# Imported only now: offline backends must work without the Gemini SDK installed
+import google.generativeai as genai
+
 # Get API key
 api_key = os.getenv('GOOGLE_API_KEY')
 if not api_key:
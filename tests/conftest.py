@@ -0,0 +1,47 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Settings are read at import time, so they have to be in place before any app module loads:
+# an instant offline model, eager Celery with in-memory broker and backend, no MongoDB,
+# and every file the app writes under a scratch directory
+DATA_DIR = tempfile.mkdtemp(prefix="analyzer-tests-")
+os.environ.update({
+    "LLM_BACKEND": "fake",
+    "FAKE_LLM_LATENCY": "0",
+    "FAKE_LLM_JITTER": "0",
+    "FAKE_LLM_TOKENS_PER_SEC": "0",
+    "FAKE_LLM_FAILURE_RATE": "0",
+    "LLM_WARMUP": "false",
+    "CREW_VERBOSE": "false",
+    "CREWAI_TRACING_ENABLED": "false",
+    "OTEL_SDK_DISABLED": "true",
+    "MONGO_ENABLED": "false",
+    "CELERY_TASK_ALWAYS_EAGER": "true",
+    "CELERY_BROKER_URL": "memory://",
+    "CELERY_RESULT_BACKEND": "cache+memory://",
+    "CACHE_DIR": os.path.join(DATA_DIR, "cache"),
+    "UPLOAD_DIR": os.path.join(DATA_DIR, "uploads"),
+    "RESULT_STORE_PATH": os.path.join(DATA_DIR, "results.db"),
+})
+
+from benchmarks.synthetic_pdf import build_pdf
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    import app.main
+
+    # The context manager runs the startup and shutdown handlers
+    with TestClient(app.main.app) as test_client:
+        yield test_client
+
+@pytest.fixture
+def pdf():
+    """A small financial statement PDF: (filename, bytes, content type) for a multipart upload"""
+    return ("statement.pdf", build_pdf(3, 1), "application/pdf")
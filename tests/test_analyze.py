@@ -0,0 +1,56 @@
+from app.llm_scheduler import llm_scheduler
+from benchmarks.synthetic_pdf import build_pdf
+
+def test_analyze_runs_the_crew_on_the_fake_backend(client, pdf):
+    calls = llm_scheduler.stats()["calls"]
+
+    response = client.post("/analyze", data={"query": "Is the company profitable?"}, files={"file": pdf})
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["status"] == "success"
+    assert body["cached"] is False
+    assert body["page_count"] == 3
+    assert body["model"].startswith("fake/")
+    assert "EXECUTIVE SUMMARY" in body["analysis"]
+    # The crew's model call was admitted by the scheduler like any other
+    assert llm_scheduler.stats()["calls"] > calls
+
+def test_analyze_serves_a_repeat_from_the_cache(client, pdf):
+    data = {"query": "What is the outlook?"}
+    first = client.post("/analyze", data=data, files={"file": pdf}).json()
+
+    calls = llm_scheduler.stats()["calls"]
+    second = client.post("/analyze", data={**data, "document_id": first["document_id"]})
+
+    assert second.status_code == 200, second.text
+    assert second.json()["cached"] is True
+    assert second.json()["analysis"] == first["analysis"]
+    assert llm_scheduler.stats()["calls"] == calls
+
+def test_incremental_results_are_cached_per_base_document(client):
+    document_id, base_a, base_b = (
+        client.post("/documents", files={"file": (f"v{seed}.pdf", build_pdf(3, seed), "application/pdf")})
+        .json()["document_id"]
+        for seed in (11, 12, 13)
+    )
+
+    def analyze(base=None):
+        data = {"document_id": document_id, "query": "What changed?", "mode": "incremental"}
+        if base:
+            data["base_document_id"] = base
+        response = client.post("/analyze", data=data)
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    first = analyze(base_a)
+    assert first["incremental"]["base_document_id"] == base_a
+    assert analyze(base_a)["cached"] is True
+
+    # Another base (or none) is another report, not the one diffed against base_a
+    against_b = analyze(base_b)
+    assert against_b["cached"] is False
+    assert against_b["incremental"]["base_document_id"] == base_b
+    without_base = analyze()
+    assert without_base["cached"] is False
+    assert without_base["incremental"]["base_document_id"] is None
@@ -0,0 +1,60 @@
+import io
+import os
+import zipfile
+
+import pytest
+from fastapi import HTTPException
+
+import app.main as main
+from app.batch import expand_zip
+from benchmarks.synthetic_pdf import build_pdf
+
+def uploads():
+    return set(os.listdir(main.UPLOAD_DIR)) if os.path.isdir(main.UPLOAD_DIR) else set()
+
+def write_zip(path, members):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in members:
+            archive.writestr(name, content)
+    return str(path)
+
+def test_expand_zip_writes_each_pdf(tmp_path):
+    members = [(f"filing-{seed}.pdf", build_pdf(2, seed)) for seed in (1, 2)]
+    archive = write_zip(tmp_path / "batch.zip", members + [("notes.txt", b"skip me")])
+
+    documents = expand_zip(archive, str(tmp_path))
+
+    assert [d["filename"] for d in documents] == ["filing-1.pdf", "filing-2.pdf"]
+    assert [d["bytes"] for d in documents] == [len(content) for _, content in members]
+    assert all(os.path.exists(d["path"]) for d in documents)
+
+def test_expand_zip_caps_the_total_inflated_size(tmp_path):
+    # Every member is far below the per-file limit; together they pass the batch's budget
+    content = b"%PDF-1.4\n" + b"0" * 100_000
+    archive = write_zip(tmp_path / "bomb.zip", [(f"copy-{i}.pdf", content) for i in range(10)])
+    out = tmp_path / "out"
+    out.mkdir()
+
+    with pytest.raises(HTTPException) as error:
+        expand_zip(archive, str(out), max_bytes=len(content) * 3 + 10)
+
+    assert error.value.status_code == 413
+    assert os.listdir(out) == []
+
+def test_batch_endpoint_rejects_an_archive_over_the_inflate_budget(client, monkeypatch):
+    pdf = build_pdf(2, 3)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for i in range(3):
+            archive.writestr(f"filing-{i}.pdf", pdf)
+    monkeypatch.setattr(main, "MAX_BATCH_INFLATE_BYTES", len(pdf) * 2)
+    before = uploads()
+
+    response = client.post(
+        "/analyze/batch", data={"queries": "Is it profitable?"},
+        files={"files": ("filings.zip", buffer.getvalue(), "application/zip")}
+    )
+
+    assert response.status_code == 413, response.text
+    assert f"{len(pdf) * 2} byte limit" in response.json()["detail"]
+    assert uploads() <= before
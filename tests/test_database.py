@@ -0,0 +1,102 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from celery.signals import worker_process_init
+
+import app.database as database
+import app.worker  # noqa: F401  registers the worker_process_init handler
+
+class FakeMongoClient:
+    """Stands in for pymongo.MongoClient: records how it was built and whether it was closed"""
+
+    instances = []
+
+    def __init__(self, url, **options):
+        self.url = url
+        self.options = options
+        self.closed = False
+        self.pid = os.getpid()
+        FakeMongoClient.instances.append(self)
+
+    def __getitem__(self, name):
+        return (self, name)
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture(autouse=True)
+def fake_client(monkeypatch):
+    FakeMongoClient.instances = []
+    monkeypatch.setattr(database, "MongoClient", FakeMongoClient)
+    monkeypatch.setattr(database, "_sync_client", None)
+    monkeypatch.setattr(database, "_sync_client_pid", None)
+    return FakeMongoClient
+
+def test_one_lazy_pooled_client_per_process():
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        handles = list(pool.map(lambda _: database.get_sync_db(), range(200)))
+
+    assert len(FakeMongoClient.instances) == 1
+    client = FakeMongoClient.instances[0]
+    assert all(handle == (client, database.DATABASE_NAME) for handle in handles)
+    # No sockets until first use, and a bounded pool
+    assert client.options["connect"] is False
+    assert client.options["maxPoolSize"] == database.MONGO_SYNC_POOL_OPTIONS["maxPoolSize"]
+    assert client.options["minPoolSize"] == 0
+
+def test_worker_process_init_builds_the_client():
+    worker_process_init.send(sender=None)
+
+    assert len(FakeMongoClient.instances) == 1
+    assert database.get_sync_client() is FakeMongoClient.instances[0]
+
+def test_inherited_client_is_replaced_not_closed(monkeypatch):
+    parent = database.get_sync_client()
+
+    # What a forked child sees: the parent's client under another pid
+    monkeypatch.setattr(database.os, "getpid", lambda: parent.pid + 1)
+    child = database.get_sync_client()
+    database.close_sync_client()
+
+    assert child is not parent
+    assert child.closed
+    assert not parent.closed
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork()")
+def test_forked_child_builds_its_own_client():
+    parent = database.get_sync_client()
+    read_end, write_end = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        # Child: report whether it got a fresh client of its own, then leave without running teardown
+        try:
+            child = database.get_sync_client()
+            ok = child is not parent and child.pid == os.getpid() and not parent.closed
+            os.write(write_end, b"1" if ok else b"0")
+        finally:
+            os._exit(0)
+
+    os.close(write_end)
+    answer = os.read(read_end, 1)
+    os.close(read_end)
+    os.waitpid(pid, 0)
+
+    assert answer == b"1"
+    assert database.get_sync_client() is parent
+    assert not parent.closed
+
+def test_concurrent_first_use_builds_one_client():
+    barrier = threading.Barrier(16)
+
+    def first_use(_):
+        barrier.wait()
+        return database.get_sync_client()
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        clients = set(map(id, pool.map(first_use, range(16))))
+
+    assert len(clients) == 1
+    assert len(FakeMongoClient.instances) == 1
@@ -0,0 +1,37 @@
+import pytest
+
+from app.financial_metrics import extract_metrics, page_scales
+
+INCOME_STATEMENT = """Consolidated Statements of Income
+(in millions, except per share data)
+2024 2023
+Total revenue 1,000 800
+Net income 100 80
+Diluted earnings per share 2.50 2.00
+"""
+# Continues the statement above without repeating its scale line
+BALANCE_SHEET = """Consolidated Balance Sheets
+2024 2023
+Total assets 2,000 1,800
+Total liabilities 1,500 1,400
+Total stockholders' equity 500 400
+"""
+
+def test_scale_carries_to_pages_without_a_marker():
+    periods = extract_metrics([INCOME_STATEMENT, BALANCE_SHEET])["periods"]
+
+    assert periods[2024]["net_income"] == 100e6
+    assert periods[2024]["total_equity"] == 500e6
+    assert periods[2024]["return_on_equity"] == pytest.approx(0.2)
+    assert periods[2023]["debt_to_equity"] == pytest.approx(3.5)
+    assert periods[2024]["eps"] == 2.5
+
+def test_pages_before_the_first_marker_take_the_document_scale():
+    periods = extract_metrics([BALANCE_SHEET, INCOME_STATEMENT])["periods"]
+
+    assert periods[2024]["total_equity"] == 500e6
+    assert periods[2024]["return_on_equity"] == pytest.approx(0.2)
+
+def test_later_marker_changes_the_scale():
+    assert page_scales(["cover", "(in thousands)", "notes", "in millions", "more"]) == [1e3, 1e3, 1e3, 1e6, 1e6]
+    assert page_scales(["no units here"]) == [1.0]
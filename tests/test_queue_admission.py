@@ -0,0 +1,88 @@
+import pytest
+from celery import states
+from celery.backends.base import KeyValueStoreBackend
+
+import app.quotas as quotas
+from app.quotas import QueueAdmission
+from app.worker import celery_app, finished_tasks
+
+class ListBackend(KeyValueStoreBackend):
+    """In-memory key-value backend whose mget answers with a list, like Redis MGET"""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.data = {}
+        self.mgets = 0
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def mget(self, keys):
+        self.mgets += 1
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+@pytest.fixture
+def list_backend():
+    return ListBackend(celery_app)
+
+@pytest.fixture(autouse=True)
+def prune_every_call(monkeypatch):
+    monkeypatch.setattr(quotas, "QUEUE_PRUNE_INTERVAL", 0)
+
+def test_finished_tasks_maps_a_list_mget_back_to_task_ids(list_backend):
+    list_backend.store_result("t-done", {"ok": True}, states.SUCCESS)
+    list_backend.store_result("t-failed", ValueError("boom"), states.FAILURE)
+    list_backend.store_result("t-started", None, states.STARTED)
+
+    done = finished_tasks(["t-done", "t-failed", "t-started", "t-unknown"], backend=list_backend)
+
+    assert done == {"t-done", "t-failed"}
+    assert list_backend.mgets == 1
+
+def test_finished_tasks_reads_a_dict_mget():
+    # The test settings use cache+memory://, whose mget answers with a dict keyed by backend key
+    celery_app.backend.store_result("t-cached-done", {"ok": True}, states.SUCCESS)
+
+    assert finished_tasks(["t-cached-done", "t-cached-pending"]) == {"t-cached-done"}
+
+def test_finished_task_frees_its_queue_slot(list_backend):
+    admission = QueueAdmission(limit=1)
+    finished = lambda task_ids: finished_tasks(task_ids, backend=list_backend)
+    assert admission.try_acquire("alice", finished)
+    admission.track("alice", "t1")
+    assert not admission.try_acquire("alice", finished)
+
+    list_backend.store_result("t1", {"ok": True}, states.SUCCESS)
+
+    assert admission.try_acquire("alice", finished)
+    assert admission.stats()["finished"] == 1
+
+def test_task_without_a_result_expires_after_the_ttl(monkeypatch):
+    admission = QueueAdmission(limit=1)
+    never_finished = lambda task_ids: set()
+    assert admission.try_acquire("alice", never_finished)
+    admission.track("alice", "lost")
+    assert not admission.try_acquire("alice", never_finished)
+
+    monkeypatch.setattr(quotas, "QUEUE_TASK_TTL", -1)
+
+    assert admission.try_acquire("alice", never_finished)
+    assert admission.stats()["expired"] == 1
+
+def test_backend_errors_keep_tasks_tracked():
+    def unreachable(task_ids):
+        raise ConnectionError("result backend down")
+
+    admission = QueueAdmission(limit=1)
+    assert admission.try_acquire("alice", unreachable)
+    admission.track("alice", "t1")
+
+    assert not admission.try_acquire("alice", unreachable)
+    assert admission.stats()["tracked_tasks"] == 1
+    assert admission.stats()["poll_errors"] >= 1
@@ -0,0 +1,134 @@
+import time
+
+import mongomock
+import pytest
+
+from app.result_store import (
+    SqliteResultStore, JsonlResultStore, MongoResultStore, analysis_record, decode_cursor, encode_cursor
+)
+
+def make_record(i, document_id="doc-a", created_at="2026-01-01T00:00:00"):
+    record = analysis_record(document_id, f"query {i}", f"analysis {i}", 1.0, filename=f"r{i}.pdf", mode="single")
+    # Millisecond timestamps survive a MongoDB round trip unchanged
+    record["created_at"] = f"{created_at}.{i:03d}000"
+    return record
+
+@pytest.fixture(params=["sqlite", "jsonl", "mongo"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        store = SqliteResultStore(str(tmp_path / "results.db"))
+    elif request.param == "jsonl":
+        store = JsonlResultStore(str(tmp_path / "results.jsonl"))
+    else:
+        store = MongoResultStore(mongomock.MongoClient().analyzer.analysis_results)
+    yield store
+    store.close()
+
+def collect(store, limit, document_id=None):
+    pages, cursor = [], None
+    while True:
+        records, cursor = store.page(limit, cursor, document_id)
+        pages.append([record["query"] for record in records])
+        if cursor is None:
+            return pages
+
+def test_pages_follow_cursors_newest_first(store):
+    store.insert_many([make_record(i) for i in range(7)])
+
+    assert collect(store, 3) == [
+        ["query 6", "query 5", "query 4"], ["query 3", "query 2", "query 1"], ["query 0"]
+    ]
+    assert store.count() == 7
+
+def test_last_full_page_has_no_next_cursor(store):
+    store.insert_many([make_record(i) for i in range(4)])
+
+    records, cursor = store.page(4)
+
+    assert len(records) == 4
+    assert cursor is None
+
+def test_equal_timestamps_are_ordered_by_id(store):
+    records = [make_record(0) for _ in range(5)]
+    store.insert_many(records)
+
+    pages = []
+    cursor = None
+    for _ in range(5):
+        page, cursor = store.page(2, cursor)
+        pages.extend(record["_id"] for record in page)
+        if cursor is None:
+            break
+
+    assert pages == sorted((record["_id"] for record in records), reverse=True)
+
+def test_inserts_between_pages_do_not_shift_records(store):
+    store.insert_many([make_record(i) for i in range(6)])
+    first, cursor = store.page(3)
+
+    # Newer records arriving meanwhile sort before the cursor and do not reach later pages
+    store.insert_many([make_record(i) for i in range(6, 9)])
+    second, cursor = store.page(3, cursor)
+
+    assert [r["query"] for r in first] == ["query 5", "query 4", "query 3"]
+    assert [r["query"] for r in second] == ["query 2", "query 1", "query 0"]
+    assert cursor is None
+
+def test_pages_one_document(store):
+    store.insert_many([make_record(i, document_id="doc-a" if i % 2 else "doc-b") for i in range(8)])
+
+    assert collect(store, 3, "doc-a") == [["query 7", "query 5", "query 3"], ["query 1"]]
+    assert store.count("doc-a") == 4
+    assert store.find_by_document("doc-b")[0]["query"] == "query 0"
+
+def test_cursor_round_trip():
+    record = make_record(1)
+
+    assert decode_cursor(encode_cursor(record)) == (record["created_at"], record["_id"])
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor({"created_at": "yesterday", "_id": "x"})])
+def test_invalid_cursor_is_rejected(store, cursor):
+    with pytest.raises(ValueError):
+        store.page(10, cursor)
+
+def test_sqlite_store_migrates_tables_without_record_ids(tmp_path):
+    import json
+    import sqlite3
+
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE results (id INTEGER PRIMARY KEY AUTOINCREMENT, document_id TEXT NOT NULL,"
+        " created_at TEXT NOT NULL, record TEXT NOT NULL)"
+    )
+    records = [make_record(i) for i in range(3)]
+    conn.executemany(
+        "INSERT INTO results (document_id, created_at, record) VALUES (?, ?, ?)",
+        [(r["document_id"], r["created_at"], json.dumps(r)) for r in records]
+    )
+    conn.commit()
+    conn.close()
+
+    store = SqliteResultStore(path)
+
+    assert collect(store, 2) == [["query 2", "query 1"], ["query 0"]]
+
+def test_results_endpoint_lists_analyses_with_cursors(client, pdf):
+    document_id = None
+    for query in ("first question?", "second question?", "third question?"):
+        response = client.post("/analyze", data={"query": query}, files={"file": pdf})
+        assert response.status_code == 200, response.text
+        document_id = response.json()["document_id"]
+
+    # Results are written behind the response; wait for the buffer's flush
+    deadline = time.monotonic() + 5
+    while client.get("/results", params={"document_id": document_id}).json()["total"] < 3:
+        assert time.monotonic() < deadline, "results were not written"
+        time.sleep(0.1)
+
+    first = client.get("/results", params={"document_id": document_id, "limit": 2}).json()
+    second = client.get("/results", params={"document_id": document_id, "limit": 2, "cursor": first["next_cursor"]})
+
+    queries = [r["query"] for r in first["results"] + second.json()["results"]]
+    assert queries[:3] == ["third question?", "second question?", "first question?"]
+    assert client.get("/results", params={"cursor": "garbage"}).status_code == 400
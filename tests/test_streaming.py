@@ -0,0 +1,125 @@
+import os
+import json
+import asyncio
+
+import httpx
+import pytest
+
+from app.executors import analysis_slots
+from app.quotas import usage_accountant
+from app.streaming import SectionSplitter, sse_event
+
+UPLOAD_DIR = os.environ["UPLOAD_DIR"]
+
+def read_events(lines):
+    events, name = [], None
+    for line in lines:
+        if line.startswith("event: "):
+            name = line[len("event: "):]
+        elif line.startswith("data: "):
+            events.append((name, json.loads(line[len("data: "):])))
+    return events
+
+def uploads():
+    return set(os.listdir(UPLOAD_DIR)) if os.path.isdir(UPLOAD_DIR) else set()
+
+async def call_until(app, request: httpx.Request, fail_on: str, spec_version: str = "2.4"):
+    """Drive the ASGI app directly; the client goes away at the first message of type `fail_on`"""
+    body = request.read()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": spec_version},
+        "http_version": "1.1",
+        "method": request.method,
+        "scheme": "http",
+        "path": request.url.path,
+        "raw_path": request.url.raw_path,
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(key.lower(), value) for key, value in request.headers.raw],
+        "client": ("testclient", 50000),
+        "server": ("testserver", 80),
+    }
+    sent, gone = [], False
+
+    async def receive():
+        nonlocal body
+        if gone:
+            return {"type": "http.disconnect"}
+        if body is not None:
+            chunk, body = body, None
+            return {"type": "http.request", "body": chunk, "more_body": False}
+        # Nothing more to send: wait until the response is underway, then hang up
+        while not gone:
+            await asyncio.sleep(0.01)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal gone
+        sent.append(message)
+        if message["type"] == fail_on:
+            gone = True
+            raise OSError("client disconnected")
+
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        pass
+    return sent
+
+def stream_request(pdf, user):
+    return httpx.Request(
+        "POST", "http://testserver/analyze/stream", data={"query": f"Stream for {user}?"},
+        files={"file": pdf}, headers={"X-User-Id": user}
+    )
+
+def test_stream_sends_progress_sections_tokens_and_done(client, pdf):
+    with client.stream(
+        "POST", "/analyze/stream", data={"query": "Is revenue growing?"}, files={"file": pdf},
+        headers={"X-User-Id": "stream-reader"}
+    ) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = read_events(response.iter_lines())
+
+    kinds = [name for name, _ in events]
+    stages = [data["stage"] for name, data in events if name == "progress"]
+    assert stages[0] == "accepted" and "extracted" in stages and stages[-1] == "prompt"
+    assert "EXECUTIVE SUMMARY" in [data["name"] for name, data in events if name == "section"]
+    assert kinds[-1] == "done"
+    done = events[-1][1]
+    assert done["cached"] is False
+    assert done["chunks"] == kinds.count("token")
+    text = "".join(data["text"] for name, data in events if name == "token")
+    assert done["characters"] == len(text)
+
+    assert analysis_slots.held("stream-reader") == 0
+    assert usage_accountant.usage("stream-reader")["requests"] == 1
+
+@pytest.mark.parametrize("fail_on, spec_version", [
+    # Client gone after the first event (ASGI 2.4 servers raise from send)
+    ("http.response.body", "2.4"),
+    # Older servers report the disconnect through receive()
+    ("http.response.body", "2.0"),
+    # Response dropped before the body iterator ever started
+    ("http.response.start", "2.4"),
+])
+def test_disconnect_releases_the_slot_and_the_upload(client, pdf, fail_on, spec_version):
+    user = f"stream-gone-{fail_on.replace('.', '-')}-{spec_version}"
+    before = uploads()
+
+    sent = client.portal.call(call_until, client.app, stream_request(pdf, user), fail_on, spec_version)
+
+    assert sent[0]["type"] == "http.response.start"
+    assert analysis_slots.held(user) == 0
+    assert uploads() <= before
+    assert usage_accountant.usage(user)["requests"] == 1
+
+def test_sse_event_frames_json():
+    assert sse_event("token", {"text": "a\nb"}) == 'event: token\ndata: {"text": "a\\nb"}\n\n'
+
+def test_section_splitter_reports_titles_once_their_line_completes():
+    splitter = SectionSplitter()
+
+    assert splitter.feed("EXECUTIVE SUMM") == []
+    assert splitter.feed("ARY\nRevenue grew.\nKey financial metrics\n") == ["EXECUTIVE SUMMARY", "KEY FINANCIAL METRICS"]
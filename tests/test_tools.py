@@ -0,0 +1,28 @@
+from concurrent.futures import Executor, Future
+
+from app.normalize import normalize_pages
+from app.tools import _extract_page_range, get_document_extraction
+from benchmarks.synthetic_pdf import build_pdf
+
+class RecordingExecutor(Executor):
+    """Runs submissions inline and remembers which functions were sent to the pool"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args, **kwargs):
+        self.submitted.append(fn)
+        future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+def test_parse_and_normalize_run_on_the_parse_pool(tmp_path):
+    path = tmp_path / "statement.pdf"
+    path.write_bytes(build_pdf(3, 7))
+    pool = RecordingExecutor()
+
+    extraction = get_document_extraction("doc-tools-1", str(path), "statement.pdf", executor=pool)
+
+    assert pool.submitted == [_extract_page_range, normalize_pages]
+    assert extraction["page_count"] == 3
+    assert extraction["normalized_pages"] == normalize_pages(extraction["pages"])[0]
@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from app.result_store import get_result_store
+from app.worker import analyze_document_task, celery_app, get_task_status
+
+@pytest.fixture
+def spooled_pdf(tmp_path, pdf):
+    filename, content, _ = pdf
+    path = tmp_path / filename
+    path.write_bytes(content)
+    return str(path)
+
+@pytest.fixture
+def progress(monkeypatch):
+    """Every update_state the task makes, in order"""
+    updates = []
+    update_state = analyze_document_task.update_state
+
+    def record(*args, **kwargs):
+        updates.append((kwargs.get("state"), kwargs.get("meta", {}).get("progress")))
+        return update_state(*args, **kwargs)
+
+    monkeypatch.setattr(analyze_document_task, "update_state", record)
+    return updates
+
+def test_tests_run_tasks_eagerly():
+    assert celery_app.conf.task_always_eager
+    assert celery_app.conf.task_store_eager_result
+
+def test_task_reports_progress_and_stores_its_result(spooled_pdf, progress):
+    task = analyze_document_task.apply_async(args=["doc-celery-1", spooled_pdf, "statement.pdf", "Is it solvent?"])
+
+    assert task.successful(), task.traceback
+    assert progress == [("PROGRESS", 10), ("PROGRESS", 50), ("PROGRESS", 90)]
+
+    status = get_task_status(task.id)
+    assert status["state"] == "SUCCESS"
+    assert status["progress"] == 100
+    assert status["result"]["status"] == "completed"
+    assert "EXECUTIVE SUMMARY" in status["result"]["result"]
+
+    # Saved in the API's record schema and the upload cleaned up
+    saved = get_result_store().find_by_document("doc-celery-1")
+    assert [record["query"] for record in saved] == ["Is it solvent?"]
+    assert saved[0]["financial_analysis"] == status["result"]["result"]
+    assert not os.path.exists(spooled_pdf)
+
+def test_failed_task_is_reported_as_failed(tmp_path, progress):
+    missing = str(tmp_path / "missing.pdf")
+
+    task = analyze_document_task.apply_async(args=["doc-celery-missing", missing, "missing.pdf", "Anything?"])
+
+    assert task.failed()
+    assert progress == [("PROGRESS", 10)]
+    status = get_task_status(task.id)
+    assert status["state"] == "FAILURE"
+    assert status["status"] == "Failed"
+
+def test_queue_endpoint_runs_the_task_inline(client, pdf):
+    response = client.post("/analyze/queue", data={"query": "How leveraged is it?"}, files={"file": pdf})
+    assert response.status_code == 200, response.text
+
+    status = client.get(response.json()["status_url"]).json()
+
+    assert status["state"] == "SUCCESS"
+    assert status["result"]["document_id"] == response.json()["document_id"]